@@ -1,33 +1,41 @@
-from openai import OpenAI
 import streamlit as st
 import os
-from dotenv import load_dotenv
-import pandas as pd
-import datetime
+import time
+import threading
+import metrics
 from image_base64 import img_base64, openai_logo_base64
-import re
-import json
 import urllib.parse
-import base64
-from email.message import EmailMessage
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from collections import defaultdict
-from prompts import get_prompt
 from firebase_auth import init_firebase, login_ui
-from memory import load_vector_data, append_vector_entry, save_vector_data
-from utils import render_output, send_email_with_attachment
+from utils import render_parsed, render_stream, get_mail_queue, render_mail_status, MAIL_PENDING
+from project_store import ProjectShards
+from response_cache import ResponseCache
+from batch import call_with_backoff, load_stories, run_batch
+from chunking import generate_chunked, needs_chunking
+import exports
+from core import STORY_FIELDS, build_prompt, get_client, generate, stream_complete, story_cache_key, make_project, save_project
+
+# --- Rerun timing and optional cProfile dump (toggle under Diagnostics in the sidebar) ---
+rerun_started = time.perf_counter()
+stale_profiler = st.session_state.pop("profiler", None)
+if stale_profiler is not None:
+    # The previous rerun was cut short by st.rerun()/st.stop(); keep its profile anyway
+    st.session_state.last_profile = metrics.stop_profile(stale_profiler)
+if st.session_state.get("profile_reruns"):
+    st.session_state.profiler = metrics.start_profile()
 
 # --- Session State Init ---
-for key in ["user", "login_error", "export_ready", "send_email_triggered"]:
+for key in ["user", "login_error", "export_ready"]:
     if key not in st.session_state:
         st.session_state[key] = False if key != "user" else None
 
 # --- Firebase Auth ---
-auth = init_firebase()
+with metrics.span("firebase_init"):
+    auth = init_firebase()
+# Reads the shared session record (kept fresh in the background); no network call
+st.session_state.user = auth.current(st.session_state.user)
 if not st.session_state.user:
-    login_ui(auth)
+    with metrics.span("firebase_login"):
+        login_ui(auth)
     if st.session_state.login_error:
         st.error("Login failed. Check credentials.")
     st.stop()
@@ -35,136 +43,22 @@ if st.session_state.user and not st.session_state.get("just_logged_in_shown", Fa
     st.success("Logged in successfully!")
     st.session_state.just_logged_in_shown = True
 
-# --- Inlined Prompt Generator ---
-def get_prompt(user_story, test_type, format_type, expected_result, severity, category, framework, style):
-    prompt = f"""You are an expert software tester.
-
-Generate {test_type.lower()} test cases for the following feature.
-
-Feature/User Story:
-{user_story}
-
-Output Format:
-{format_type}
-"""
-
-    if format_type != "Manual Only":
-        prompt += f"""
-Preferred Automation Framework:
-{framework}
-
-Preferred Automation Style:
-{style}
-"""
-
-    if expected_result:
-        prompt += f"\nExpected Result:\n{expected_result}"
-    if severity:
-        prompt += f"\nSeverity: {severity}"
-    if category:
-        prompt += f"\nCategory: {category}"
-
-    prompt += """
-
-Respond with clearly labeled sections.
-If format is 'Manual Only', do not include any code.
-If automation is included, use code blocks with appropriate labels.
-"""
-
-    return prompt
-
-
-# --- Utilities ---
-def render_output(output):
-    pattern = re.compile(r"```(\w+)?\n(.*?)```", re.DOTALL)
-    for match in pattern.finditer(output):
-        lang = match.group(1) or "text"
-        code = match.group(2).strip()
-        st.code(code, language=lang)
+# --- LLM backend (one router per process, so identical requests from different sessions coalesce) ---
+@st.cache_resource
+def get_llm_client():
+    from dotenv import load_dotenv
+    load_dotenv()
+    return get_client()
 
-# --- Gmail API ---
-SCOPES = ['https://www.googleapis.com/auth/gmail.send']
-
-def send_email_with_attachment(to_email, subject, body_text, file_path):
-    creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    else:
-        flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-        creds = flow.run_local_server(port=0)
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-    service = build('gmail', 'v1', credentials=creds)
-    message = EmailMessage()
-    message.set_content(body_text)
-    message['To'] = to_email
-    message['From'] = "me"
-    message['Subject'] = subject
-    with open(file_path, 'rb') as f:
-        file_data = f.read()
-        file_name = os.path.basename(file_path)
-    message.add_attachment(file_data, maintype='application', subtype='octet-stream', filename=file_name)
-    encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    create_message = {'raw': encoded_message}
-    service.users().messages().send(userId='me', body=create_message).execute()
-
-# --- Firebase Auth ---
-firebase_config = {
-    "apiKey": st.secrets["FIREBASE_API_KEY"],
-    "authDomain": st.secrets["FIREBASE_AUTH_DOMAIN"],
-    "projectId": st.secrets["FIREBASE_PROJECT_ID"],
-    "storageBucket": st.secrets["FIREBASE_STORAGE_BUCKET"],
-    "messagingSenderId": st.secrets["FIREBASE_MESSAGING_SENDER_ID"],
-    "appId": st.secrets["FIREBASE_APP_ID"],
-    "measurementId": st.secrets["FIREBASE_MEASUREMENT_ID"],
-    "databaseURL": ""
-}
-
-firebase = init_firebase()  # ✅ Replace direct call to pyrebase here
-auth = firebase.auth()
-
-# --- Session State Init ---
-for key in ["user", "login_error", "export_ready"]:
-    if key not in st.session_state:
-        st.session_state[key] = None if key == "user" else False
-
-# --- Login UI ---
-def login_ui():
-    st.title("🔑 Login to AI Test Case Generator")
-    choice = st.selectbox("Login or Signup", ["Login", "Sign up"])
-    email = st.text_input("Email")
-    password = st.text_input("Password", type="password")
-    if choice == "Login":
-        if st.button("Login"):
-            try:
-                user = auth.sign_in_with_email_and_password(email, password)
-                st.session_state.user = user
-                st.session_state.login_error = False
-                st.rerun()
-            except:
-                st.session_state.login_error = True
-                st.rerun()
-    else:
-        if st.button("Sign up"):
-            try:
-                user = auth.create_user_with_email_and_password(email, password)
-                st.success("Account created. Now log in.")
-            except:
-                st.error("Signup failed. Try different email or stronger password.")
-
-if not st.session_state.user:
-    login_ui()
-    if st.session_state.login_error:
-        st.error("Login failed. Check credentials.")
-    st.stop()
+client = get_llm_client()
 
-if st.session_state.user and not st.session_state.get("just_logged_in_shown", False):
-    st.success("Logged in successfully!")
-    st.session_state.just_logged_in_shown = True
+# --- Metrics endpoint (set METRICS_PORT to serve /metrics and /metrics.jsonl) ---
+@st.cache_resource
+def get_metrics_server():
+    port = os.getenv("METRICS_PORT")
+    return metrics.start_server(int(port)) if port else None
 
-# --- Load API ---
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+get_metrics_server()
 
 # --- UI Layout ---
 st.set_page_config(page_title="AI Test Case Generator")
@@ -173,33 +67,127 @@ st.title("🧪 AI Test Case Generator")
 # --- Sidebar History ---
 st.sidebar.header("📂 Project History")
 st.sidebar.write(f"Logged in as: {st.session_state.user['email']}")
+if st.sidebar.button("🚪 Log out", key="logout"):
+    auth.sign_out(st.session_state.user)
+    st.session_state.user = None
+    st.session_state.just_logged_in_shown = False
+    st.rerun()
 if st.sidebar.button("🔄 Refresh History"):
     st.rerun()
 
-project_groups = defaultdict(list)
+with st.sidebar.expander("🩺 Diagnostics", expanded=False):
+    st.toggle("Profile each rerun (cProfile)", key="profile_reruns")
+    if st.session_state.get("last_profile"):
+        st.caption(f"Last profile: {st.session_state.last_profile}")
+    st.download_button("⬇️ Metrics (Prometheus text)", metrics.prometheus_text(), file_name="metrics.txt", key="download_metrics")
 
-st.markdown("### 🔎 Search & Filter Your Projects")
+# --- Project Store (one shard per author; legacy data is routed once per process) ---
+@st.cache_resource
+def get_project_shards():
+    shards = ProjectShards()
+    with metrics.span("legacy_migration"):
+        shards.migrate_legacy()
+    return shards
+
+shards = get_project_shards()
+store = shards.for_author(st.session_state.user["email"])
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache()
+
+response_cache = get_response_cache()
+
+VIEWER_PAGE_SIZES = [5, 10, 20]
+VIEWER_MAX_CHARS = 6000
+SEARCH_PAGE_SIZE = 10
+
+def focus_project(key):
+    # Jump the viewer to the page holding this project and open it
+    position = store.position(st.session_state.user["email"], key) or 0
+    page_size = st.session_state.get("viewer_page_size", VIEWER_PAGE_SIZES[1])
+    st.session_state.viewer_page = position // page_size + 1
+    st.session_state[f"viewer_open_{key}"] = True
 
-search_query = st.text_input("🔍 Search by keywords (story or test case)")
-filter_title = st.text_input("📌 Filter by Project Title")
-filter_type = st.selectbox("🎯 Filter by Test Type", ["", "Functional", "Negative", "BDD (Gherkin)"])
+def reset_search_page():
+    st.session_state.search_page = 1
 
-if os.path.exists("saved_projects"):
-    for filename in os.listdir("saved_projects"):
-        if filename.endswith(".json"):
-            with open(f"saved_projects/{filename}", encoding="utf-8") as f:
-                data = json.load(f)
-            if data.get("author_email") == st.session_state.user["email"]:
-                project_groups[data["title"]].append((data["timestamp"], filename, data))
+# --- Search & Filter (keyword index + title/test type facets, independent of Generate) ---
+st.markdown("### 🔎 Search & Filter Your Projects")
 
-for title, versions in sorted(project_groups.items()):
+facets = store.facets(st.session_state.user["email"])
+facet_counts = {field: dict(values) for field, values in facets.items()}
+search_query = st.text_input("🔍 Search by keywords (story or test case)", key="search_query", on_change=reset_search_page)
+filter_title = st.selectbox(
+    "📌 Filter by Project Title", [""] + list(facet_counts["title"]), key="filter_title", on_change=reset_search_page,
+    format_func=lambda t: f"{t} ({facet_counts['title'][t]})" if t else "All titles",
+)
+filter_type = st.selectbox(
+    "🎯 Filter by Test Type", [""] + list(facet_counts["test_type"]), key="filter_type", on_change=reset_search_page,
+    format_func=lambda t: f"{t} ({facet_counts['test_type'][t]})" if t else "All test types",
+)
+
+if search_query or filter_title or filter_type:
+    def run_search(page):
+        with metrics.span("search"):
+            return store.search(st.session_state.user["email"], search_query, filter_title, filter_type,
+                                limit=SEARCH_PAGE_SIZE, offset=(page - 1) * SEARCH_PAGE_SIZE)
+
+    search_page = max(st.session_state.get("search_page", 1), 1)
+    total_hits, hits = run_search(search_page)
+    search_pages = max(1, -(-total_hits // SEARCH_PAGE_SIZE))
+    if search_page > search_pages:
+        search_page = search_pages
+        total_hits, hits = run_search(search_page)
+    st.session_state.search_page = search_page
+
+    st.markdown(f"### 🎯 Filtered Results ({total_hits})")
+    if not hits and search_query:
+        # No keyword hit (typo, different wording): fall back to embedding similarity
+        from memory import search_vector_entries
+
+        vector_data = shards.load_memory(st.session_state.user["email"])
+        candidates = [
+            i for i, entry in enumerate(vector_data)
+            if (not filter_title or entry.get("title") == filter_title)
+            and (not filter_type or entry.get("test_type") == filter_type)
+        ]
+        similar = search_vector_entries(vector_data, search_query, top_k=5, candidates=candidates)
+        if similar:
+            st.caption("No keyword matches. Closest projects by similarity:")
+        # The memory log can hold several writes of one project; keep its best score
+        hits = list({
+            f"{entry['title']}_{entry['timestamp']}": {
+                "key": f"{entry['title']}_{entry['timestamp']}", "title": entry["title"],
+                "timestamp": entry["timestamp"], "test_type": entry.get("test_type", ""), "score": score,
+            }
+            for entry, score in reversed(similar)
+        }.values())[::-1]
+    for hit in hits:
+        relevance = f" · relevance {hit['score']:.2f}" if hit["score"] is not None else ""
+        cols = st.columns([5, 1])
+        cols[0].markdown(f"📝 **{hit['title']}** @ {hit['timestamp']} · {hit['test_type'] or '-'}{relevance}")
+        cols[1].button("📌 View", key=f"search_hit_{hit['key']}", on_click=focus_project, args=(hit["key"],))
+    if search_pages > 1:
+        st.number_input(f"Results page (of {search_pages})", min_value=1, max_value=search_pages, step=1, key="search_page")
+
+with metrics.span("history_listing"):
+    project_groups = store.group_by_title(st.session_state.user["email"])
+
+for title, versions in project_groups.items():
     with st.sidebar.expander(f"📂 {title} ({len(versions)} versions)", expanded=False):
-        for timestamp, filename, data in sorted(versions, reverse=True):
-            st.markdown(f"- 🕒 {timestamp}")
+        for data in versions:
+            st.markdown(f"- 🕒 {data['timestamp']}")
             st.markdown(f"  - 🧪 **Type**: {data['format_type']}, {data['test_type']}")
-            st.markdown(f"  - 🧱 **Framework**: {data.get('framework', '-')}")
-            anchor_id = f"id_{filename.replace('.', '')}"
-            st.markdown(f"  - 📌 [View Output](#{anchor_id})")
+            st.markdown(f"  - 🧱 **Framework**: {data.get('framework') or '-'}")
+            if data["content_hash"]:
+                if data["prev_key"] is None:
+                    st.markdown("  - 🆕 First version")
+                elif not data["lines_added"] and not data["lines_removed"]:
+                    st.markdown("  - 🟰 Identical to the previous version")
+                else:
+                    st.markdown(f"  - ✏️ +{data['lines_added']} / −{data['lines_removed']} lines vs previous version")
+            st.button("📌 View Output", key=f"focus_{data['key']}", on_click=focus_project, args=(data["key"],))
 
 # --- Inputs ---
 project_title = st.text_input("📌 Project Title")
@@ -216,6 +204,9 @@ if format_type != "Manual Only":
 expected_result = st.text_input("✅ Expected Result (optional)")
 severity = st.selectbox("⚠️ Severity", ["", "Low", "Medium", "High", "Critical"])
 category = st.selectbox("🧩 Test Category", ["", "Regression", "Smoke", "Integration", "System", "Exploratory"])
+stream_output = st.checkbox("⚡ Stream output as it is generated", value=True)
+use_cache = st.checkbox("♻️ Reuse cached output for identical inputs", value=True)
+split_long = st.checkbox("🧩 Split long stories into scenarios generated in parallel", value=True)
 
 # --- Generate Output ---
 if st.button("Generate"):
@@ -223,72 +214,99 @@ if st.button("Generate"):
         st.warning("Please complete all required fields.")
     else:
         with st.spinner("Generating test assets..."):
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            prompt = get_prompt(
-                user_story, test_type, format_type,
-                expected_result, severity, category,
-                framework, style
-            )
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.4
-            )
-            output = response.choices[0].message.content
-            render_output(output)
-            st.markdown(f"### ✨ Output for {format_type}")
+            story = {
+                "title": project_title, "user_story": user_story, "test_type": test_type,
+                "format_type": format_type, "framework": framework, "style": style,
+                "expected_result": expected_result, "severity": severity, "category": category
+            }
+            key = story_cache_key(story)
+            output = response_cache.get(key) if use_cache else None
+            cached = output is not None
+            chunked = not cached and split_long and needs_chunking(story)
+            streamed = not cached and not chunked and stream_output
+
+            if streamed:
+                st.markdown(f"### ✨ Output for {format_type}")
+                output = render_stream(stream_complete(client, build_prompt(story)))
+                response_cache.put(key, output)
+            elif chunked:
+                # Parts are cached individually; the merged result is cached under the whole story
+                output, chunk_info = generate_chunked(story, client, cache=response_cache, use_cache=use_cache)
+                response_cache.put(key, output)
+            elif not cached:
+                output, _ = generate(story, client, cache=response_cache, use_cache=False)
+
+            # --- Parse once, then save project to the indexed store and vector memory
+            project_data = make_project(story, output, author_name, st.session_state.user["email"])
+            vector_data = shards.load_memory(st.session_state.user["email"])
+            st.session_state.project_key = save_project(store, project_data, vector_data)
+
+            if not streamed:
+                render_parsed(project_data["parsed"])
+                st.markdown(f"### ✨ Output for {format_type}")
+            if cached:
+                st.caption("♻️ Served from cache. Untick the cache option to regenerate.")
+            if chunked:
+                st.caption(f"🧩 Generated in {chunk_info['parts']} parts; {chunk_info['duplicates']} duplicate test case(s) removed.")
 
             # --- Store current project in session state
             st.session_state.output = output
+            st.session_state.parsed = project_data["parsed"]
             st.session_state.project_title = project_title
-            st.session_state.timestamp = timestamp
+            st.session_state.timestamp = project_data["timestamp"]
             st.session_state.format_type = format_type
+            st.session_state.test_type = test_type
             st.session_state.export_ready = True
 
-            # --- Save project as .json file
-            os.makedirs("saved_projects", exist_ok=True)
-            project_data = {
-                "title": project_title,
-                "author": author_name,
-                "author_email": st.session_state.user["email"],
-                "timestamp": timestamp,
-                "test_type": test_type,
-                "format_type": format_type,
-                "framework": framework,
-                "style": style,
-                "expected_result": expected_result,
-                "severity": severity,
-                "category": category,
-                "user_story": user_story,
-                "output": output
-            }
-            with open(f"saved_projects/{project_title}_{timestamp}.json", "w", encoding="utf-8") as f:
-                json.dump(project_data, f, indent=2)
-
             st.success("✅ Project saved.")
 
-            # --- Load existing vector_data for filtering
-            vector_data = []
-            if os.path.exists("vector_data.json"):
-                with open("vector_data.json", "r", encoding="utf-8") as f:
-                    vector_data = json.load(f)
-
-            # --- Filter/Search Results
-            filtered_results = []
-
-            for entry in vector_data:
-                if filter_title and filter_title.lower() not in entry['title'].lower():
-                    continue
-                if filter_type and entry.get("test_type", "").lower() != filter_type.lower():
-                    continue
-                if search_query and search_query.lower() not in (entry['output'] + entry['title']).lower():
-                    continue
-                filtered_results.append(entry)
-
-            st.markdown(f"### 🎯 Filtered Results ({len(filtered_results)})")
-            for data in filtered_results:
-                st.markdown(f"📝 **{data['title']}** @ {data['timestamp']}")
-                st.code(data["output"][:400] + "...")
+# --- Batch Generation ---
+with st.expander("📦 Batch generation from a CSV / JSONL of user stories", expanded=False):
+    st.caption("Columns: " + ", ".join(STORY_FIELDS) + ". Only user_story is required.")
+    batch_file = st.file_uploader("Stories file", type=["csv", "jsonl", "ndjson"], key="batch_file")
+    batch_concurrency = st.number_input("Concurrent requests", min_value=1, max_value=16, value=4, key="batch_concurrency")
+
+    if batch_file is not None and st.button("🚀 Run batch", key="run_batch"):
+        stories = load_stories(batch_file.getvalue(), batch_file.name)
+        if not stories:
+            st.warning("No rows with a user_story were found.")
+        else:
+            batch_status = [{"Title": story["title"], "Status": "⏳ queued"} for story in stories]
+            batch_progress = st.progress(0.0, text=f"0 / {len(stories)} done")
+            batch_table = st.empty()
+            batch_table.dataframe(batch_status, use_container_width=True)
+            batch_vector_data = shards.load_memory(st.session_state.user["email"])
+
+            # Each request retries on its own and holds a slot only while running, so
+            # stories and their parts together stay within the concurrency setting
+            batch_limit = threading.BoundedSemaphore(int(batch_concurrency))
+
+            def generate_story(story):
+                if split_long:
+                    output, _ = generate_chunked(story, client, cache=response_cache, use_cache=use_cache,
+                                                 max_workers=int(batch_concurrency), limit=batch_limit)
+                else:
+                    output, _ = call_with_backoff(lambda: generate(story, client, cache=response_cache, use_cache=use_cache),
+                                                  limit=batch_limit)
+                return output
+
+            def save_story_result(index, story, output, error):
+                if error is not None:
+                    batch_status[index]["Status"] = f"❌ {error}"
+                else:
+                    project = make_project(story, output, author_name or st.session_state.user["email"], st.session_state.user["email"])
+                    save_project(store, project, batch_vector_data)
+                    batch_status[index]["Status"] = "✅ saved"
+                finished = sum(row["Status"] != "⏳ queued" for row in batch_status)
+                batch_progress.progress(finished / len(stories), text=f"{finished} / {len(stories)} done")
+                batch_table.dataframe(batch_status, use_container_width=True)
+
+            run_batch(stories, generate_story, save_story_result, max_workers=int(batch_concurrency), max_retries=0)
+            failed = sum(row["Status"].startswith("❌") for row in batch_status)
+            if failed:
+                st.warning(f"Batch finished with {failed} failed item(s).")
+            else:
+                st.success(f"✅ Batch finished: {len(stories)} project(s) saved.")
 
 # --- Export Section (always rendered if available) ---
 if st.session_state.get("export_ready", False):
@@ -296,76 +314,120 @@ if st.session_state.get("export_ready", False):
     with st.expander("📧 Preview Email Body", expanded=False):
         st.code("See the test output below:\n\n" + st.session_state.output[:1500], language="text")
 
-    mailto = f"mailto:?subject=Test Cases Generated&body={urllib.parse.quote('See the test output below:\n\n' + st.session_state.output[:1500])}"
+    email_body = "See the test output below:\n\n" + st.session_state.output[:1500]
+    mailto = f"mailto:?subject=Test Cases Generated&body={urllib.parse.quote(email_body)}"
     st.code(mailto, language="text")
     st.markdown("Click or copy the link above to share via email.")
     st.markdown(f'<a href="{mailto}" target="_blank">🔗 Share via Email</a>', unsafe_allow_html=True)
 
-    # --- Handle button-triggered email send across rerun ---
+    # --- Gmail sends are queued and delivered in the background ---
     recipient_email = st.text_input("📧 Recipient Email", value=st.session_state.user["email"])
-
-    if "send_email_triggered" not in st.session_state:
-        st.session_state.send_email_triggered = False
-
     if st.button("📤 Send via Gmail", key="send_gmail_button"):
-        st.session_state.recipient_email = recipient_email
-        st.session_state.send_email_triggered = True
-        st.rerun()
-
-    if st.session_state.send_email_triggered:
-        try:
-            filename = f"{st.session_state.project_title}_{st.session_state.timestamp}.txt"
-            filepath = os.path.join("saved_projects", filename)
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(st.session_state.output)
-
-            send_email_with_attachment(
-                to_email=st.session_state.recipient_email,
-                subject="Your Test Cases",
-                body_text="Attached is your generated test output.",
-                file_path=filepath
-            )
-            st.success("📧 Email sent successfully!")
-        except Exception as e:
-            st.error(f"❌ Failed to send email: {e}")
-        st.session_state.send_email_triggered = False
-
-    filename_base = f"testcases_{st.session_state.format_type.lower()}_{st.session_state.timestamp}"
+        job_id = get_mail_queue().submit(
+            recipient_email,
+            "Your Test Cases",
+            "Attached is your generated test output.",
+            [(f"{st.session_state.project_title}_{st.session_state.timestamp}.txt", st.session_state.output.encode("utf-8"))]
+        )
+        st.session_state.mail_jobs = st.session_state.get("mail_jobs", []) + [job_id]
+
     st.download_button("⬇️ Download Output", st.session_state.output, file_name=f"{st.session_state.project_title}.txt", key="download_txt")
-    rows = [line for line in st.session_state.output.strip().split("\n") if line.strip() and line[0].isdigit()]
-    if rows:
-        df = pd.DataFrame({"Test Case": rows})
-        st.download_button("⬇️ Download CSV", df.to_csv(index=False), file_name=f"{st.session_state.project_title}.csv", key="download_csv")
-
-# --- Saved Projects Viewer ---
-if os.path.exists("saved_projects"):
-    for filename in sorted(os.listdir("saved_projects"), reverse=True):
-        if filename.endswith(".json"):
-            with open(f"saved_projects/{filename}", encoding="utf-8") as f:
-                data = json.load(f)
-            if data.get("author_email") == st.session_state.user["email"]:
-                st.markdown(f"<div id='id_{filename.replace('.', '')}'></div>", unsafe_allow_html=True)
-                st.markdown(f"""💡
-                <div style="font-size: 16px; margin-top: 1em;">
-                    <strong>{data['title']}</strong><br>
-                    by <span style="color:#00AEEF;">{data['author'].split('@')[0].capitalize()}</span>
-                    <span style="font-size: 12px; color:gray;">({data['timestamp']})</span>
-                </div>
-                """, unsafe_allow_html=True)
-                st.markdown(f"**Test Type**: {data['test_type']} | **Framework**: {data.get('framework', '-')} | **Style**: {data.get('style', '-')}")
-                st.markdown(f"**User Story:**\n> {data['user_story']}")
-                st.code(data['output'], language="robotframework")
-                st.download_button("⬇️ Download Output", data['output'], file_name=f"{data['title']}_{data['timestamp']}.txt", key=f"download_{filename}")
-                # Share link generation
-                share_path = f"saved_projects/share_{st.session_state.project_title}_{st.session_state.timestamp}.txt"
-                with open(share_path, "w", encoding="utf-8") as f:
-                    f.write(st.session_state.output)
-
-                share_link = f"file://{os.path.abspath(share_path)}"
-                st.markdown("📤 Copyable Share Link:")
-                st.code(share_link, language="text")
-
-                st.divider()
+    # Exports are built from the saved project only when a download is clicked
+    def export_download(label, fmt, project_key=st.session_state.get("project_key")):
+        _, _, extension, mime = exports.FORMATS[fmt]
+
+        def build():
+            with metrics.span("export", format=fmt):
+                return exports.export_bytes(fmt, exports.iter_projects(store, [project_key]))
+        st.download_button(label, build, file_name=f"{st.session_state.project_title}.{extension}", mime=mime, key=f"download_{fmt}")
+
+    if (st.session_state.parsed or {}).get("test_cases"):
+        export_download("⬇️ Download CSV", "csv")
+        export_download("⬇️ Download JUnit XML", "junit")
+        if exports.excel_available():
+            export_download("⬇️ Download Excel", "xlsx")
+    if (st.session_state.parsed or {}).get("code_blocks") or st.session_state.get("test_type") == "BDD (Gherkin)":
+        export_download("⬇️ Download framework files (.zip)", "frameworks")
+
+# --- Saved Projects Viewer (paginated; bodies load only when opened, nothing is written) ---
+st.markdown("### 📚 Saved Projects")
+with metrics.span("viewer_listing"):
+    total_projects = store.count(st.session_state.user["email"])
+page_size = st.selectbox("Projects per page", VIEWER_PAGE_SIZES, index=1, key="viewer_page_size")
+page_count = max(1, -(-total_projects // page_size))
+st.session_state.viewer_page = min(max(st.session_state.get("viewer_page", 1), 1), page_count)
+page = st.number_input(f"Page (of {page_count}, {total_projects} projects)", min_value=1, max_value=page_count, step=1, key="viewer_page")
+
+with metrics.span("viewer_listing"):
+    page_metas = store.list_projects(st.session_state.user["email"], limit=page_size, offset=(page - 1) * page_size)
+for meta in page_metas:
+    st.markdown(f"<div id='id_{meta['key'].replace('.', '')}'></div>", unsafe_allow_html=True)
+    st.markdown(f"""💡
+    <div style="font-size: 16px; margin-top: 1em;">
+        <strong>{meta['title']}</strong><br>
+        by <span style="color:#00AEEF;">{meta['author'].split('@')[0].capitalize()}</span>
+        <span style="font-size: 12px; color:gray;">({meta['timestamp']})</span>
+    </div>
+    """, unsafe_allow_html=True)
+    st.markdown(f"**Test Type**: {meta['test_type']} | **Framework**: {meta['framework'] or '-'} | **Style**: {meta['style'] or '-'}")
+
+    if st.toggle("Show story and output", key=f"viewer_open_{meta['key']}"):
+        data = store.get_project(meta["key"])
+        st.markdown(f"**User Story:**\n> {data['user_story']}")
+        st.code(data['output'][:VIEWER_MAX_CHARS], language="robotframework")
+        if len(data['output']) > VIEWER_MAX_CHARS:
+            st.caption(f"Showing the first {VIEWER_MAX_CHARS:,} of {len(data['output']):,} characters. Download for the full output.")
+        st.download_button("⬇️ Download Output", data['output'], file_name=f"{data['title']}_{data['timestamp']}.txt", key=f"download_{data['key']}")
+
+    st.divider()
+
+with st.expander("📬 Email projects from this page", expanded=False):
+    page_projects = {meta["key"]: meta for meta in page_metas}
+    bulk_keys = st.multiselect("Projects", list(page_projects), format_func=lambda k: f"{page_projects[k]['title']} ({page_projects[k]['timestamp']})", key="bulk_mail_keys")
+    bulk_recipient = st.text_input("📧 Recipient Email", value=st.session_state.user["email"], key="bulk_mail_recipient")
+    if st.button("📤 Queue emails", key="bulk_mail_button", disabled=not bulk_keys):
+        job_ids = get_mail_queue().submit_many(
+            {
+                "to_email": bulk_recipient,
+                "subject": f"Test Cases: {page_projects[key]['title']}",
+                "body_text": "Attached is your generated test output.",
+                "attachments": [(f"{key}.txt", (store.get_output(key) or "").encode("utf-8"))]
+            }
+            for key in bulk_keys
+        )
+        st.session_state.mail_jobs = st.session_state.get("mail_jobs", []) + job_ids
+
+with st.expander("📦 Export projects", expanded=False):
+    export_formats = {"bundle": "Zip bundle (output, CSV, JUnit, framework files per project)", "csv": "Combined CSV", "junit": "JUnit XML"}
+    if exports.excel_available():
+        export_formats["xlsx"] = "Excel workbook"
+    export_scope = st.radio("Projects", ["Selected on this page", "All my projects"], horizontal=True, key="export_scope")
+    if export_scope == "Selected on this page":
+        export_keys = st.multiselect("Select projects", list(page_projects), format_func=lambda k: f"{page_projects[k]['title']} ({page_projects[k]['timestamp']})", key="export_keys")
+    else:
+        export_keys = [meta["key"] for meta in store.list_projects(st.session_state.user["email"])]
+    export_format = st.selectbox("Format", list(export_formats), format_func=export_formats.get, key="export_format")
+    _, _, export_extension, export_mime = exports.FORMATS[export_format]
+
+    def build_export(fmt=export_format, keys=tuple(export_keys)):
+        options = {"with_project": True} if fmt == "csv" else {}
+        with metrics.span("export", format=fmt):
+            return exports.export_bytes(fmt, exports.iter_projects(store, keys), **options)
+    st.download_button(f"⬇️ Download {len(export_keys)} project(s)", build_export, file_name=f"test_cases.{export_extension}",
+                       mime=export_mime, key="download_export", disabled=not export_keys)
+
+# --- Email delivery status (polls while anything is still queued) ---
+if st.session_state.get("mail_jobs"):
+    mail_pending = any(job["status"] in MAIL_PENDING for job in get_mail_queue().statuses(st.session_state.mail_jobs[-20:]))
+
+    @st.fragment(run_every=2 if mail_pending else None)
+    def mail_status_panel():
+        st.markdown("### 📬 Email Delivery")
+        jobs = render_mail_status(st.session_state.mail_jobs[-20:])
+        if mail_pending and not any(job["status"] in MAIL_PENDING for job in jobs):
+            st.rerun()
+
+    mail_status_panel()
 
 # --- Footer ---
 st.markdown(f'''
@@ -387,5 +449,11 @@ st.markdown(f'''
     </div>
 </div>
 ''', unsafe_allow_html=True)
+
+# --- Rerun timing / profile dump ---
+metrics.observe("stage_seconds", time.perf_counter() - rerun_started, stage="rerun")
+rerun_profiler = st.session_state.pop("profiler", None)
+if rerun_profiler is not None:
+    st.session_state.last_profile = metrics.stop_profile(rerun_profiler)
 # --- End of app.py --- 
 
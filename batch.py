@@ -0,0 +1,95 @@
+import contextlib
+import csv
+import io
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from core import STORY_FIELDS
+
+STORY_DEFAULTS = {
+    "test_type": "Functional",
+    "format_type": "Manual Only",
+}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+# --- Input parsing ---
+def load_stories(data, filename=""):
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    if filename.lower().endswith((".jsonl", ".ndjson")) or data.lstrip().startswith("{"):
+        rows = [json.loads(line) for line in data.splitlines() if line.strip()]
+    else:
+        rows = list(csv.DictReader(io.StringIO(data)))
+
+    stories = []
+    seen_titles = {}
+    for n, row in enumerate(rows, start=1):
+        row = {(k or "").strip(): (v or "").strip() if isinstance(v, str) else v for k, v in row.items()}
+        if not row.get("user_story"):
+            continue
+        story = {field: row.get(field) or STORY_DEFAULTS.get(field, "") for field in STORY_FIELDS}
+        if story["format_type"] == "Manual Only":
+            story["framework"] = story["style"] = ""
+        title = story["title"] or f"Batch story {n}"
+        seen_titles[title] = seen_titles.get(title, 0) + 1
+        if seen_titles[title] > 1:
+            title = f"{title} ({seen_titles[title]})"
+        story["title"] = title
+        stories.append(story)
+    return stories
+
+
+# --- Retry / backoff ---
+def _status_code(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+def is_retryable(exc):
+    if _status_code(exc) in RETRYABLE_STATUS:
+        return True
+    return type(exc).__name__ in {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+
+def retry_after(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def call_with_backoff(fn, max_retries=5, base_delay=1.0, max_delay=30.0, sleep=time.sleep, limit=None):
+    # limit (a semaphore) is held only while fn runs, not while waiting to retry
+    for attempt in range(max_retries + 1):
+        try:
+            with limit or contextlib.nullcontext():
+                return fn()
+        except Exception as exc:
+            if attempt == max_retries or not is_retryable(exc):
+                raise
+            delay = retry_after(exc)
+            if delay is None:
+                delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+            sleep(delay)
+
+
+# --- Fan-out ---
+def run_batch(stories, generate, on_result, max_workers=4, max_retries=5, base_delay=1.0):
+    # generate(story) runs on worker threads; on_result(index, story, output, error)
+    # runs on the calling thread as each item finishes, so it may touch the UI.
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            pool.submit(call_with_backoff, lambda s=story: generate(s), max_retries, base_delay): i
+            for i, story in enumerate(stories)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                output, error = future.result(), None
+            except Exception as exc:
+                output, error = None, exc
+            on_result(index, stories[index], output, error)
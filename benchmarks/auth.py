@@ -0,0 +1,66 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_auth import FakeAuthBackend, start_server  # noqa: E402
+from firebase_auth import AuthSessions, RestAuth  # noqa: E402
+
+# Drives firebase_auth.AuthSessions against the emulator stand-in with short-lived
+# tokens: signs users in, then "reruns" each session for several token lifetimes.
+# Fails (exit 1) if a rerun made an auth request or a session was lost because its
+# token expired before the background refresher renewed it.
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check per-rerun auth cost and background token refresh.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--token-lifetime", type=int, default=4, help="seconds")
+    parser.add_argument("--lifetimes", type=int, default=3, help="how many token lifetimes to keep rerunning")
+    parser.add_argument("--rerun-interval", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    backend = FakeAuthBackend(args.token_lifetime)
+    server, host = start_server(backend)
+    sessions = AuthSessions(RestAuth("fake-key", host), refresh_margin=args.token_lifetime / 2,
+                            poll=args.token_lifetime / 8)
+    try:
+        users = []
+        for n in range(args.users):
+            email = f"user{n}@example.com"
+            sessions.sign_up(email, "password123")
+            users.append(sessions.sign_in(email, "password123"))
+        signed_in = dict(backend.calls)
+        print(f"{args.users} users signed in with {sum(signed_in.values())} auth requests ({signed_in})")
+
+        latencies, lost = [], 0
+        deadline = time.time() + args.token_lifetime * args.lifetimes
+        while time.time() < deadline:
+            for i, user in enumerate(users):
+                start = time.perf_counter()
+                live = sessions.current(user)
+                latencies.append((time.perf_counter() - start) * 1e6)
+                if live is None:
+                    lost += 1
+                else:
+                    users[i] = live
+            time.sleep(args.rerun_interval)
+
+        calls = {op: count - signed_in.get(op, 0) for op, count in backend.calls.items()}
+        rerun_calls = sum(count for op, count in calls.items() if op != "token")
+        latencies.sort()
+        print(f"{len(latencies)} reruns: p50 {statistics.median(latencies):.1f} us, "
+              f"p99 {latencies[int(len(latencies) * 0.99)]:.1f} us, auth requests {rerun_calls}")
+        print(f"background refreshes {calls.get('token', 0)}, sessions lost {lost}")
+        return 1 if rerun_calls or lost else 0
+    finally:
+        sessions.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
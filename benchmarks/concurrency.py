@@ -0,0 +1,97 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core import make_project, save_project  # noqa: E402
+from project_store import ProjectShards, ProjectStore  # noqa: E402
+
+OUTPUT = "### Test Case 1: Login\nSteps:\n1. Open the page\nExpected Result: Dashboard is shown\n" * 4
+
+
+def author_email(n):
+    return f"user{n}@example.com"
+
+def write_projects(layout, root, authors, per_author, with_memory):
+    # One process = one Streamlit session saving for each author in turn
+    if layout == "shared":
+        store = ProjectStore(os.path.join(root, "projects.db"))
+    else:
+        shards = ProjectShards(os.path.join(root, "authors"))
+    waits = []
+    for i in range(per_author):
+        for n in authors:
+            email = author_email(n)
+            project = make_project({"title": f"Story {n}-{i}", "user_story": "As a user I log in"}, OUTPUT, "bench", email,
+                                   timestamp=f"2024-01-01_00-00-{i:05d}")
+            target = store if layout == "shared" else shards.for_author(email)
+            vector_data = shards.load_memory(email) if with_memory and layout != "shared" else None
+            t = time.perf_counter()
+            save_project(target, project, vector_data)
+            waits.append((time.perf_counter() - t) * 1000)
+    return waits
+
+def list_ms(layout, root, email, repeats=20):
+    if layout == "shared":
+        store = ProjectStore(os.path.join(root, "projects.db"))
+    else:
+        store = ProjectShards(os.path.join(root, "authors")).for_author(email)
+    t = time.perf_counter()
+    for _ in range(repeats):
+        store.count(email)
+        store.list_projects(email, limit=10)
+    return (time.perf_counter() - t) * 1000 / repeats, store
+
+def run(layout, processes, authors, per_author, with_memory):
+    root = tempfile.mkdtemp(prefix=f"bench-{layout}-")
+    try:
+        # Each process writes for its own slice of authors, all at the same time
+        slices = [list(range(p, authors, processes)) for p in range(processes)]
+        t = time.perf_counter()
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(write_projects, [(layout, root, s, per_author, with_memory) for s in slices])
+        elapsed = time.perf_counter() - t
+        waits = sorted(w for result in results for w in result)
+
+        lost = 0
+        for n in range(authors):
+            _, store = list_ms(layout, root, author_email(n), repeats=1)
+            lost += per_author - store.count(author_email(n))
+        listing, _ = list_ms(layout, root, author_email(0))
+        return {
+            "saves_per_s": len(waits) / elapsed,
+            "p50": statistics.median(waits),
+            "p99": waits[min(len(waits) - 1, int(len(waits) * 0.99))],
+            "list_ms": listing,
+            "lost": lost,
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent writers: one shared projects.db vs per-author shards.")
+    parser.add_argument("--processes", type=int, default=8, help="concurrent writer processes (sessions)")
+    parser.add_argument("--authors", type=int, default=32)
+    parser.add_argument("--per-author", type=int, default=25, help="projects saved per author")
+    parser.add_argument("--memory", action="store_true", help="also append to each author's vector memory")
+    args = parser.parse_args(argv)
+
+    total = args.authors * args.per_author
+    print(f"{args.processes} processes, {args.authors} authors, {total} saves")
+    for layout in ("shared", "sharded"):
+        r = run(layout, args.processes, args.authors, args.per_author, args.memory and layout == "sharded")
+        print(f"{layout:8}: {r['saves_per_s']:7.0f} saves/s  save p50 {r['p50']:6.2f} ms  p99 {r['p99']:7.2f} ms  "
+              f"list page {r['list_ms']:5.2f} ms  lost writes {r['lost']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
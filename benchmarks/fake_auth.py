@@ -0,0 +1,134 @@
+import argparse
+import base64
+import json
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Stand-in for the Firebase Auth emulator: the Identity Toolkit v1 and Secure
+# Token endpoints firebase_auth.RestAuth uses, with a configurable token lifetime
+# so background refresh can be exercised in seconds. Point the app at it with
+# FIREBASE_AUTH_EMULATOR_HOST=127.0.0.1:<port>. Tokens are unsigned JWTs.
+
+
+class FakeAuthBackend:
+    def __init__(self, token_lifetime=3600):
+        self.token_lifetime = token_lifetime
+        self.accounts = {}        # email -> {"localId", "password"}
+        self.refresh_tokens = {}  # refresh token -> localId
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _id_token(self, local_id, email):
+        now = int(time.time())
+        claims = {"sub": local_id, "user_id": local_id, "email": email, "iat": now,
+                  "exp": now + self.token_lifetime, "nonce": secrets.token_hex(4)}
+        encode = lambda data: base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")  # noqa: E731
+        return f"{encode({'alg': 'none', 'typ': 'JWT'})}.{encode(claims)}."
+
+    def _claims(self, id_token):
+        try:
+            payload = id_token.split(".")[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        except (IndexError, ValueError):
+            return None
+        return claims if claims.get("exp", 0) > time.time() else None
+
+    def _tokens(self, local_id, email):
+        refresh_token = secrets.token_urlsafe(24)
+        self.refresh_tokens[refresh_token] = local_id
+        return {"idToken": self._id_token(local_id, email), "refreshToken": refresh_token,
+                "expiresIn": str(self.token_lifetime), "localId": local_id, "email": email}
+
+    def handle(self, op, body):
+        # Returns (status, payload)
+        with self._lock:
+            self.calls[op] += 1
+            if op == "signUp":
+                if body.get("email") in self.accounts or len(body.get("password", "")) < 6:
+                    return 400, {"error": {"message": "EMAIL_EXISTS"}}
+                account = self.accounts[body["email"]] = {"localId": secrets.token_hex(14), "password": body["password"]}
+                return 200, self._tokens(account["localId"], body["email"])
+            if op == "signInWithPassword":
+                account = self.accounts.get(body.get("email"))
+                if account is None or account["password"] != body.get("password"):
+                    return 400, {"error": {"message": "INVALID_LOGIN_CREDENTIALS"}}
+                return 200, {**self._tokens(account["localId"], body["email"]), "registered": True}
+            if op == "lookup":
+                claims = self._claims(body.get("idToken", ""))
+                if claims is None:
+                    return 400, {"error": {"message": "INVALID_ID_TOKEN"}}
+                return 200, {"users": [{"localId": claims["sub"], "email": claims["email"], "emailVerified": False}]}
+            if op == "token":
+                local_id = self.refresh_tokens.pop(body.get("refreshToken") or body.get("refresh_token"), None)
+                if local_id is None:
+                    return 400, {"error": {"message": "INVALID_REFRESH_TOKEN"}}
+                email = next(e for e, a in self.accounts.items() if a["localId"] == local_id)
+                tokens = self._tokens(local_id, email)
+                return 200, {"id_token": tokens["idToken"], "refresh_token": tokens["refreshToken"],
+                             "expires_in": tokens["expiresIn"], "user_id": local_id, "token_type": "Bearer"}
+        return 404, {"error": {"message": "NOT_FOUND"}}
+
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+
+def make_handler(backend):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            path = urlsplit(self.path).path
+            raw = self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}"
+            if "json" in self.headers.get("Content-Type", "json"):
+                body = json.loads(raw)
+            else:
+                body = {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+            if path.startswith("/identitytoolkit.googleapis.com/v1/accounts:"):
+                op = path.rsplit(":", 1)[1]
+            elif path == "/securetoken.googleapis.com/v1/token":
+                op = "token"
+            else:
+                op = ""
+            status, payload = backend.handle(op, body)
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+def start_server(backend=None, host="127.0.0.1", port=0):
+    # Returns (server, "host:port" for FIREBASE_AUTH_EMULATOR_HOST)
+    server = ThreadingHTTPServer((host, port), make_handler(backend or FakeAuthBackend()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-auth", daemon=True).start()
+    return server, f"{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Firebase Auth emulator stand-in.")
+    parser.add_argument("--port", type=int, default=9099)
+    parser.add_argument("--token-lifetime", type=int, default=3600, help="ID token lifetime in seconds")
+    args = parser.parse_args(argv)
+
+    server, host = start_server(FakeAuthBackend(args.token_lifetime), port=args.port)
+    print(f"Fake auth listening; run the app with FIREBASE_AUTH_EMULATOR_HOST={host}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+# Stand-ins for the OpenAI backend with configurable latency and output size.
+# FakeLLMClient plugs into core.generate()/stream_complete() in-process; the stub
+# server speaks /v1/chat/completions (plain and SSE) so the real app can be pointed
+# at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+STEPS = ["Open the login page", "Enter a valid email", "Enter the password", "Click Sign in",
+         "Open the profile menu", "Submit the form", "Reload the page", "Navigate back"]
+EXPECTED = ["The dashboard is shown", "An error message is displayed", "The session is kept",
+            "The form is rejected", "A confirmation email is sent"]
+
+
+def fake_output(cases=5, seed=0):
+    # Markdown shaped like real completions (headers, steps, expected, code), ~350 chars per case
+    rng = random.Random(seed)
+    parts = []
+    for n in range(1, cases + 1):
+        steps = "\n".join(f"{i}. {step}" for i, step in enumerate(rng.sample(STEPS, 4), start=1))
+        parts.append(
+            f"### Test Case {n}: Scenario {n} for story {seed}\n"
+            f"**Preconditions:** User account exists\n**Steps:**\n{steps}\n"
+            f"**Expected Result:** {rng.choice(EXPECTED)}\n"
+        )
+    parts.append("```gherkin\nFeature: Login\n  Scenario: Valid login\n    Given I am on the login page\n"
+                 "    When I sign in\n    Then I see the dashboard\n```\n")
+    return "\n".join(parts)
+
+
+class FakeLLM:
+    def __init__(self, latency=0.5, jitter=0.2, cases=5, chunk_chars=16, first_token=0.1, slow_rate=0.0, slow_factor=10):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate      # fraction of calls that straggle (tail latency)
+        self.slow_factor = slow_factor
+        self.cases = cases
+        self.chunk_chars = chunk_chars
+        self.first_token = first_token
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            self.calls += 1
+            seed = self.calls
+        delay = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter) * self.latency)
+        slow = random.random() < self.slow_rate
+        if slow:
+            delay *= self.slow_factor
+        return fake_output(self.cases, seed), delay, slow
+
+    def complete(self):
+        text, delay, _ = self._next()
+        time.sleep(delay)
+        return text
+
+    def stream(self):
+        text, delay, slow = self._next()
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+        # Stragglers are slow to start, as with a queued or overloaded upstream
+        first_token = self.first_token + (delay - self.latency if slow else 0.0)
+        time.sleep(min(first_token, delay))
+        per_chunk = max(0.0, delay - first_token) / max(len(chunks), 1)
+        for chunk in chunks:
+            time.sleep(per_chunk)
+            yield chunk
+
+
+# --- In-process client (same surface as openai.OpenAI for what core.py uses) ---
+class FakeLLMClient:
+    def __init__(self, llm=None, **options):
+        self.llm = llm or FakeLLM(**options)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, temperature=None, stream=False, **kwargs):
+        if not stream:
+            message = SimpleNamespace(content=self.llm.complete())
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        return (
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=chunk))])
+            for chunk in self.llm.stream()
+        )
+
+
+# --- Stub HTTP server (OpenAI-compatible) ---
+def make_handler(llm):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            model = request.get("model", "fake")
+            if not request.get("stream"):
+                text = llm.complete()
+                body = json.dumps({
+                    "id": f"fake-{llm.calls}", "object": "chat.completion", "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": text}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(text) // 4,
+                              "total_tokens": len(text) // 4},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            sent = 0
+            for chunk in llm.stream():
+                sent += len(chunk)
+                event = {"id": "fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                         "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            if (request.get("stream_options") or {}).get("include_usage"):
+                event = {"id": "fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                         "choices": [], "usage": {"prompt_tokens": 0, "completion_tokens": sent // 4,
+                                                  "total_tokens": sent // 4}}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    return Handler
+
+def start_server(llm=None, host="127.0.0.1", port=0):
+    # Returns (server, base_url); the server runs on a daemon thread until shutdown()
+    server = ThreadingHTTPServer((host, port), make_handler(llm or FakeLLM()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-llm", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server for load tests.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction of latency")
+    parser.add_argument("--cases", type=int, default=5, help="test cases per completion (output size)")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_server(FakeLLM(args.latency, args.jitter, args.cases), port=args.port)
+    print(f"Fake LLM listening; run the app with OPENAI_BASE_URL={base_url} OPENAI_API_KEY=sk-fake")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_llm import FakeLLM, FakeLLMClient  # noqa: E402
+from core import complete, stream_complete  # noqa: E402
+from llm import LLMRouter, parse_routes  # noqa: E402
+
+# The LLM router against the fake backend: identical concurrent requests
+# (coalescing), a straggling upstream with and without hedging, and size routing.
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+def run(client, prompts, stream, workers):
+    def one(prompt):
+        start = time.perf_counter()
+        if stream:
+            "".join(stream_complete(client, prompt))
+        else:
+            complete(client, prompt)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(one, prompts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Coalescing, hedging and routing with a fake LLM backend.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent callers")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="fraction of upstream calls that straggle")
+    parser.add_argument("--slow-factor", type=float, default=15)
+    parser.add_argument("--hedge-after", type=float, default=0.6, help="hedge delay until p95 latency is known")
+    args = parser.parse_args(argv)
+
+    # --- Coalescing: every session asks for the same story at once ---
+    for label, wrap in (("direct", False), ("router", True)):
+        llm = FakeLLM(args.latency, jitter=0.1)
+        client = LLMRouter(FakeLLMClient(llm), routes=[], hedge_after=0) if wrap else FakeLLMClient(llm)
+        run(client, ["Same story"] * args.sessions, stream=False, workers=args.sessions)
+        run(client, ["Same streamed story"] * args.sessions, stream=True, workers=args.sessions)
+        print(f"coalescing {label:7} {args.sessions} identical plain + {args.sessions} identical streamed "
+              f"requests -> {llm.calls} upstream calls")
+
+    # --- Hedging: distinct prompts, a few upstream calls straggle ---
+    print(f"{'tail latency':22} {'p50 s':>7} {'p99 s':>7} {'max s':>7} {'upstream':>9}")
+    for stream in (False, True):
+        for hedge_after in (0, args.hedge_after):
+            llm = FakeLLM(args.latency, jitter=0.1, slow_rate=args.slow_rate, slow_factor=args.slow_factor)
+            client = LLMRouter(FakeLLMClient(llm), routes=[], hedge_after=hedge_after)
+            times = run(client, [f"story {i}" for i in range(args.requests)], stream, args.sessions)
+            label = f"{'stream' if stream else 'plain'} {'hedged' if hedge_after else 'no hedge'}"
+            print(f"{label:22} {statistics.median(times):7.2f} {percentile(times, 0.99):7.2f} "
+                  f"{max(times):7.2f} {llm.calls:9}")
+
+    # --- Routing by prompt size ---
+    router = LLMRouter(FakeLLMClient(FakeLLM(0)), routes=parse_routes("small-model:500,large-model"))
+    for words in (50, 2000):
+        prompt = "word " * words
+        print(f"routing {words:5} words -> {router.route([{'role': 'user', 'content': prompt}], 'default')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_llm import FakeLLM, FakeLLMClient, fake_output, start_server  # noqa: E402
+from core import generate, get_client, make_project, save_project  # noqa: E402
+from exports import export_bytes, iter_projects  # noqa: E402
+from memory import load_vectors, save_vector_data, search_vector_entries  # noqa: E402
+from project_store import ProjectShards  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Drives the same calls app.py makes on each hot path, with 100 sessions as
+# threads in one process (how Streamlit serves them), against a seeded store.
+OPS = ["list", "generate", "save", "search", "similar", "export"]
+TEST_TYPES = ["Functional", "Negative", "BDD (Gherkin)"]
+QUERIES = ["login dashboard", "error message", "password reset", "session", "profile menu"]
+
+
+def author_email(n):
+    return f"user{n}@example.com"
+
+def story_for(n, i):
+    return {
+        "title": f"Story {i % 50}", "user_story": f"As user {n} I want feature {i}",
+        "test_type": TEST_TYPES[i % len(TEST_TYPES)], "format_type": "Both", "framework": "Cucumber",
+    }
+
+def seed(shards, projects, authors):
+    # Bulk seed: one store write per project, memory written in a single pass per
+    # author and embedded up front so the run measures steady state, not backfill
+    for n in range(authors):
+        email = author_email(n)
+        store = shards.for_author(email)
+        entries = []
+        for i in range(n, projects, authors):
+            project = make_project(story_for(n, i), fake_output(5, i), f"user{n}", email,
+                                   timestamp=f"2024-01-01_{i:08d}")
+            store.save(project)
+            entries.append({"title": project["title"], "timestamp": project["timestamp"],
+                            "test_type": project["test_type"], "author_email": email, "output": project["output"]})
+        save_vector_data(entries, *shards.memory_paths(email))
+        load_vectors(shards.load_memory(email))
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class Session:
+    def __init__(self, n, shards, client, timings, lock):
+        self.n = n
+        self.email = author_email(n)
+        self.shards = shards
+        self.client = client
+        self.timings = timings
+        self.lock = lock
+        self.page_size = 10
+
+    def timed(self, op, fn, *args):
+        t = time.perf_counter()
+        result = fn(*args)
+        elapsed = (time.perf_counter() - t) * 1000
+        with self.lock:
+            self.timings[op].append(elapsed)
+        return result
+
+    # --- One rerun cycle: sidebar + viewer listing, Generate, save, search, export ---
+    def listing(self):
+        store = self.shards.for_author(self.email)
+        store.group_by_title(self.email)
+        store.count(self.email)
+        return store.list_projects(self.email, limit=self.page_size, offset=0)
+
+    def search(self, i):
+        store = self.shards.for_author(self.email)
+        return store.search(self.email, QUERIES[i % len(QUERIES)], test_type=TEST_TYPES[i % len(TEST_TYPES)], limit=10)
+
+    def similar(self, i):
+        # Fallback the panel uses when a query has no keyword hits
+        vector_data = self.shards.load_memory(self.email)
+        test_type = TEST_TYPES[i % len(TEST_TYPES)]
+        candidates = [j for j, entry in enumerate(vector_data) if entry.get("test_type") == test_type]
+        return search_vector_entries(vector_data, QUERIES[i % len(QUERIES)], top_k=5, candidates=candidates)
+
+    def export(self, key):
+        store = self.shards.for_author(self.email)
+        return len(export_bytes("csv", iter_projects(store, [key])))
+
+    def run(self, iterations):
+        for i in range(iterations):
+            page = self.timed("list", self.listing)
+            story = story_for(self.n, 10_000_000 + self.n * 1000 + i)
+            output, _ = self.timed("generate", generate, story, self.client)
+            project = make_project(story, output, f"user{self.n}", self.email,
+                                   timestamp=f"2099-01-01_{self.n:04d}{i:04d}")
+            self.timed("save", lambda: save_project(self.shards.for_author(self.email), project,
+                                                    self.shards.load_memory(self.email)))
+            self.timed("search", self.search, i)
+            self.timed("similar", self.similar, i)
+            if page:
+                self.timed("export", self.export, page[i % len(page)]["key"])
+
+
+def run(args):
+    root = tempfile.mkdtemp(prefix="bench-load-")
+    server = None
+    try:
+        shards = ProjectShards(os.path.join(root, "authors"))
+        t = time.perf_counter()
+        seed(shards, args.projects, args.authors)
+        print(f"seeded {args.projects} projects for {args.authors} authors in {time.perf_counter() - t:.1f} s")
+
+        llm = FakeLLM(latency=args.latency, jitter=args.jitter, cases=args.cases)
+        if args.http:
+            server, base_url = start_server(llm)
+            os.environ["OPENAI_BASE_URL"] = base_url
+            client = get_client("sk-fake")
+        else:
+            client = FakeLLMClient(llm)
+
+        timings = {op: [] for op in OPS}
+        lock = threading.Lock()
+        rss_before = rss_mb()
+        t = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            sessions = [Session(s % args.authors, shards, client, timings, lock) for s in range(args.sessions)]
+            for future in [pool.submit(session.run, args.iterations) for session in sessions]:
+                future.result()
+        wall = time.perf_counter() - t
+
+        results = {
+            "config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+            "wall_s": wall,
+            "rss_mb": rss_mb(),
+            "rss_growth_mb": (rss_mb() - rss_before) if rss_before is not None else None,
+            "peak_rss_mb": peak_rss_mb(),
+            "ops": {
+                op: {"count": len(samples), "p50_ms": percentile(samples, 0.5), "p99_ms": percentile(samples, 0.99)}
+                for op, samples in timings.items()
+            },
+        }
+        return results
+    finally:
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+
+def report(results):
+    print(f"{'op':10} {'count':>7} {'p50 ms':>10} {'p99 ms':>10}")
+    for op, stats in results["ops"].items():
+        print(f"{op:10} {stats['count']:7d} {stats['p50_ms']:10.2f} {stats['p99_ms']:10.2f}")
+    print(f"wall {results['wall_s']:.1f} s", end="")
+    if results["rss_mb"] is not None:
+        print(f", rss {results['rss_mb']:.0f} MB (+{results['rss_growth_mb']:.0f} MB during load)", end="")
+    if results["peak_rss_mb"] is not None:
+        print(f", peak {results['peak_rss_mb']:.0f} MB", end="")
+    print()
+
+def regressions(results, baseline, tolerance):
+    # Only non-LLM ops are compared; generate latency is whatever the fake was told to be
+    failed = []
+    for op, stats in results["ops"].items():
+        before = baseline.get("ops", {}).get(op)
+        if op == "generate" or not before or not before["p99_ms"]:
+            continue
+        if stats["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            failed.append(f"{op}: p99 {stats['p99_ms']:.2f} ms vs baseline {before['p99_ms']:.2f} ms")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the generate/save/search/list/export paths with a fake LLM.")
+    parser.add_argument("--projects", type=int, default=10_000, help="projects seeded before the run")
+    parser.add_argument("--authors", type=int, default=100)
+    parser.add_argument("--sessions", type=int, default=100, help="concurrent sessions (threads)")
+    parser.add_argument("--iterations", type=int, default=5, help="rerun cycles per session")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake completion latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--cases", type=int, default=5, help="test cases per fake completion")
+    parser.add_argument("--http", action="store_true", help="go through the stub HTTP server and the openai client")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file to compare against; exit 1 on p99 regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p99 slowdown vs baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failed = regressions(results, json.load(f), args.tolerance)
+        for line in failed:
+            print(f"REGRESSION {line}")
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What app.py imported eagerly before lazy loading (prompts.py also pulled in playwright)
+EAGER_IMPORTS = [
+    "streamlit", "openai", "dotenv", "pandas",
+    "google.oauth2.credentials", "google_auth_oauthlib.flow", "googleapiclient.discovery",
+    "pyrebase", "playwright.sync_api",
+]
+# What app.py imports at module level now; the rest loads on the path that needs it
+LAZY_IMPORTS = [
+    "streamlit", "firebase_auth", "utils", "project_store", "response_cache", "batch", "core", "exports",
+]
+
+RERUN_SETUP = """
+import os, time
+from dotenv import load_dotenv
+from openai import OpenAI
+import pyrebase
+config = {key: "x" for key in ["apiKey", "authDomain", "projectId", "storageBucket",
+                               "messagingSenderId", "appId", "measurementId"]}
+config["databaseURL"] = ""
+
+def build_resources():
+    load_dotenv()
+    OpenAI(api_key="sk-benchmark")
+    pyrebase.initialize_app(config).auth()
+
+cache = {}
+def cached_resources():
+    if "resources" not in cache:
+        cache["resources"] = build_resources()
+    return cache["resources"]
+"""
+
+
+def available(modules):
+    code = "import importlib.util, sys\n" + "".join(
+        f"print({m!r}) if importlib.util.find_spec({m!r}.split('.')[0]) else None\n" for m in modules
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    return out.stdout.split()
+
+def cold_import_ms(modules, runs):
+    code = "import time; t = time.perf_counter()\n" + "".join(f"import {m}\n" for m in modules)
+    code += "print((time.perf_counter() - t) * 1000)"
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+def rerun_ms(reruns):
+    code = RERUN_SETUP + f"""
+t = time.perf_counter()
+for _ in range({reruns}):
+    build_resources()
+uncached = (time.perf_counter() - t) * 1000 / {reruns}
+cached_resources()
+t = time.perf_counter()
+for _ in range({reruns}):
+    cached_resources()
+cached = (time.perf_counter() - t) * 1000 / {reruns}
+print(uncached, cached)
+"""
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [float(x) for x in out.stdout.split()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start and per-rerun cost of app.py resources.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per import measurement")
+    parser.add_argument("--reruns", type=int, default=50, help="simulated reruns for resource setup")
+    args = parser.parse_args(argv)
+
+    eager = available(EAGER_IMPORTS)
+    missing = sorted(set(EAGER_IMPORTS) - set(eager))
+    print(f"cold import, eager module-level imports : {cold_import_ms(eager, args.runs):8.1f} ms")
+    print(f"cold import, lazy module-level imports  : {cold_import_ms(LAZY_IMPORTS, args.runs):8.1f} ms")
+    if missing:
+        print(f"  (not installed, excluded from eager set: {', '.join(missing)})")
+    try:
+        uncached, cached = rerun_ms(args.reruns)
+    except subprocess.CalledProcessError:
+        print("per-rerun resources: skipped (openai, pyrebase and python-dotenv are required)")
+        return 0
+    print(f"per-rerun dotenv+OpenAI+Firebase setup  : {uncached:8.2f} ms uncached, {cached:.4f} ms cached")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
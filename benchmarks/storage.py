@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import codec  # noqa: E402
+from benchmarks.fake_llm import fake_output  # noqa: E402
+from core import make_project  # noqa: E402
+from project_store import ProjectShards  # noqa: E402
+
+# Disk size and load time of the original layout (one indent=2 JSON file per
+# project + vector_data.json) against the SQLite store with each storage codec.
+
+
+def write_legacy(directory, projects, authors, versions):
+    # Same shape the app used to write: saved_projects/<title>_<timestamp>.json
+    os.makedirs(directory, exist_ok=True)
+    memory = []
+    for i in range(projects):
+        story = {"title": f"Story {i // versions}", "user_story": f"As a user I want feature {i // versions}. " * 8,
+                 "test_type": "Functional"}
+        # Regenerations of one story share most of their output
+        project = make_project(story, fake_output(6, (i // versions) * 1000 + (i % versions) % 3),
+                               f"user{i % authors}", f"user{i % authors}@example.com",
+                               timestamp=f"2024-01-01_{i:08d}")
+        with open(os.path.join(directory, f"{project['title']}_{project['timestamp']}.json"), "w", encoding="utf-8") as f:
+            json.dump(project, f, indent=2)
+        memory.append({"title": project["title"], "timestamp": project["timestamp"],
+                       "test_type": project["test_type"], "output": project["output"]})
+    return memory
+
+DERIVED_SUFFIXES = ("-shm", "-wal", ".lock", ".vec")  # transient, or rebuilt from the log
+
+
+def tree_bytes(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files
+               if not f.endswith(DERIVED_SUFFIXES))
+
+def timed(fn):
+    t = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - t) * 1000, result
+
+def load_legacy(directory):
+    projects = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                projects.append(json.load(f))
+    return projects
+
+def measure_store(shards, emails):
+    def listing():
+        return sum(len(shards.for_author(email).list_projects(email)) for email in emails)
+
+    def bodies():
+        total = 0
+        for email in emails:
+            store = shards.for_author(email)
+            for meta in store.list_projects(email):
+                total += len(store.get_project(meta["key"])["output"])
+        return total
+
+    def memory():
+        return sum(len(shards.load_memory(email)) for email in emails)
+
+    return timed(listing)[0], timed(bodies)[0], timed(memory)[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Storage size and load time: legacy JSON files vs the compressed store.")
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--authors", type=int, default=10)
+    parser.add_argument("--versions", type=int, default=5, help="regenerations per story")
+    args = parser.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix="bench-storage-")
+    try:
+        legacy_dir = os.path.join(root, "saved_projects")
+        memory = write_legacy(legacy_dir, args.projects, args.authors, args.versions)
+        legacy_memory = os.path.join(root, "vector_data.json")
+        with open(legacy_memory, "w", encoding="utf-8") as f:
+            json.dump(memory, f)
+
+        print(f"{args.projects} projects, {args.authors} authors, {args.versions} versions per story")
+        print(f"{'format':22} {'disk MB':>9} {'list ms':>9} {'bodies ms':>10} {'memory ms':>10}")
+        load_ms, _ = timed(lambda: load_legacy(legacy_dir))
+        memory_ms, _ = timed(lambda: json.load(open(legacy_memory, encoding="utf-8")))
+        disk = tree_bytes(legacy_dir) + tree_bytes(legacy_memory)
+        # The old viewer had to json.load every file just to list titles
+        print(f"{'legacy json files':22} {disk / 1e6:9.2f} {load_ms:9.1f} {load_ms:10.1f} {memory_ms:10.1f}")
+
+        # Convert once (the same path the app and `cli.py convert` use), then re-encode per codec
+        shards = ProjectShards(os.path.join(legacy_dir, "authors"))
+        shared_log = os.path.join(root, "vector_data.jsonl")
+        shards.migrate_legacy(legacy_dir, legacy_memory=shared_log, legacy_json=legacy_memory)
+        emails = [f"user{n}@example.com" for n in range(args.authors)]
+        for name in ["none", "gzip", "zstd"]:
+            if codec.resolve(name) != name:
+                print(f"{'store + ' + name:22} (skipped: pip install zstandard)")
+                continue
+            shards.recompress(name)
+            disk = tree_bytes(shards.root)
+            list_ms, bodies_ms, memory_ms = measure_store(shards, emails)
+            print(f"{'store + ' + name:22} {disk / 1e6:9.2f} {list_ms:9.1f} {bodies_ms:10.1f} {memory_ms:10.1f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import re
+
+from batch import call_with_backoff, run_batch
+from core import DEFAULT_MODEL, DEFAULT_TEMPERATURE, generate
+from prompts import count_tokens, template_for
+from testcases import parse_output
+
+# Long stories and epics are split into scenario-sized parts that each fit one
+# request's token budget, generated concurrently, then merged back into a single
+# output with duplicate test cases removed.
+
+MODEL_CONTEXT = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+DEFAULT_CONTEXT = 4096
+OUTPUT_TOKENS = 2048      # completion budget reserved per request
+CHUNK_TOKENS = 1200       # story tokens per part; more scenarios per part means fewer cases each
+SAFETY_TOKENS = 256
+
+_BOUNDARY_RE = re.compile(
+    r"^\s*(?:#{1,6}\s|(?:Scenario|Feature|Rule|Background)(?: Outline)?:|AC\s*\d+|Acceptance criteria|"
+    r"[-*+]\s|\d+[.)]\s)",
+    re.IGNORECASE,
+)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_NORMALIZE_RE = re.compile(r"[^a-z0-9]+")
+
+
+# --- Token budgeting ---
+def request_budget(story, model=DEFAULT_MODEL, variant="simple", output_tokens=OUTPUT_TOKENS):
+    # Story tokens one request can carry next to the prompt template and the reserved output
+    context = MODEL_CONTEXT.get(model, DEFAULT_CONTEXT)
+    template = template_for(story, variant).tokens({**story, "user_story": ""}, model)
+    output_tokens = min(output_tokens, context // 2)
+    return max(context - template - output_tokens - SAFETY_TOKENS, 64), output_tokens
+
+
+# --- Splitting ---
+def story_units(text):
+    # Paragraphs, headings, scenarios and list items (acceptance criteria) are the
+    # smallest pieces a story is split on
+    units, current = [], []
+    for line in text.splitlines():
+        if not line.strip() or (_BOUNDARY_RE.match(line) and current):
+            if current:
+                units.append("\n".join(current))
+            current = [line] if line.strip() else []
+            continue
+        current.append(line)
+    if current:
+        units.append("\n".join(current))
+    return units
+
+def _split_oversized(unit, max_tokens, model):
+    pieces, current = [], ""
+    for sentence in _SENTENCE_RE.split(unit):
+        while count_tokens(sentence, model) > max_tokens:
+            # A single run-on sentence: cut on words
+            words = sentence.split()
+            cut = max(1, len(words) * max_tokens // count_tokens(sentence, model))
+            pieces.append(" ".join(words[:cut]))
+            sentence = " ".join(words[cut:])
+        candidate = f"{current} {sentence}".strip()
+        if current and count_tokens(candidate, model) > max_tokens:
+            pieces.append(current)
+            candidate = sentence
+        current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_story(text, max_tokens=CHUNK_TOKENS, model=DEFAULT_MODEL):
+    # Returns (preamble, parts). The opening paragraph ("As a ... I want ...") is
+    # repeated as context in every part; the rest is packed greedily into parts.
+    if count_tokens(text, model) <= max_tokens:
+        return "", [text]
+    units = story_units(text)
+    preamble = ""
+    if len(units) > 1 and count_tokens(units[0], model) <= max_tokens // 3:
+        preamble = units.pop(0)
+    budget = max_tokens - count_tokens(preamble, model)
+
+    parts, current, used = [], [], 0
+    for unit in units:
+        for piece in ([unit] if count_tokens(unit, model) <= budget else _split_oversized(unit, budget, model)):
+            tokens = count_tokens(piece, model)
+            if current and used + tokens > budget:
+                parts.append("\n".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += tokens
+    if current:
+        parts.append("\n".join(current))
+    return preamble, parts
+
+def needs_chunking(story, model=DEFAULT_MODEL, variant="simple", chunk_tokens=CHUNK_TOKENS):
+    input_budget, _ = request_budget(story, model, variant)
+    return count_tokens(story.get("user_story", ""), model) > min(chunk_tokens, input_budget)
+
+def part_story(story, preamble, part, index, total):
+    text = f"{preamble}\n\n" if preamble else ""
+    text += f"Scenarios to cover (part {index} of {total}; other parts are covered separately):\n{part}"
+    return {**story, "title": f"{story.get('title', '')} (part {index}/{total})", "user_story": text}
+
+
+# --- Merging ---
+def _normalize(text):
+    return _NORMALIZE_RE.sub(" ", text.lower()).strip()
+
+def _case_markdown(number, case, blocks):
+    lines = [f"### Test Case {number}: {case.title}"]
+    if case.preconditions:
+        lines.append("**Preconditions:** " + "; ".join(case.preconditions))
+    if case.steps:
+        lines.append("**Steps:**")
+        lines += [f"{n}. {step}" for n, step in enumerate(case.steps, start=1)]
+    if case.expected_results:
+        lines.append("**Expected Result:** " + "; ".join(case.expected_results))
+    for block in blocks:
+        lines.append(f"```{block.language}\n{block.code}\n```")
+    return "\n".join(lines)
+
+def merge_outputs(outputs, default_framework=""):
+    # Returns (merged_markdown, duplicates_removed). Cases are renumbered in part
+    # order; a case is a duplicate if its title matches an earlier one with the same
+    # (or no) steps, or its steps match exactly. Code blocks are kept once.
+    seen_titles, seen_steps, seen_code = {}, set(), set()
+    sections, trailing, duplicates = [], [], 0
+    for output in outputs:
+        parsed = parse_output(output, default_framework)
+        owned = set()
+        for case in parsed.test_cases:
+            owned.update(case.code_blocks)
+            title = _normalize(case.title)
+            steps = tuple(_normalize(step) for step in case.steps)
+            earlier = seen_titles.get(title)
+            if (steps and steps in seen_steps) or (
+                title and earlier is not None and (not steps or not earlier or earlier == steps)
+            ):
+                duplicates += 1
+                continue
+            seen_titles.setdefault(title, steps)
+            if steps:
+                seen_steps.add(steps)
+            blocks = []
+            for index in case.code_blocks:
+                block = parsed.code_blocks[index]
+                if block.code not in seen_code:
+                    seen_code.add(block.code)
+                    blocks.append(block)
+            sections.append((case, blocks))
+        for index, block in enumerate(parsed.code_blocks):
+            if index not in owned and block.code not in seen_code:
+                seen_code.add(block.code)
+                trailing.append(f"```{block.language}\n{block.code}\n```")
+    merged = [_case_markdown(n, case, blocks) for n, (case, blocks) in enumerate(sections, start=1)]
+    if not sections:
+        # Nothing parsed as test cases (free-form output): keep the parts verbatim
+        return "\n\n".join(output.strip() for output in outputs), 0
+    return "\n\n".join(merged + trailing) + "\n", duplicates
+
+
+# --- Pipeline ---
+def generate_chunked(story, client, cache=None, use_cache=True, model=DEFAULT_MODEL,
+                     temperature=DEFAULT_TEMPERATURE, variant="simple", max_workers=4,
+                     chunk_tokens=CHUNK_TOKENS, output_tokens=OUTPUT_TOKENS, limit=None, max_retries=5):
+    # Returns (output, info) with info = {"parts", "duplicates", "cached"}. Stories
+    # that fit one part go through core.generate() unchanged. Each request is
+    # retried on its own, so callers must not retry the whole story again; limit
+    # (a semaphore shared with the caller) caps requests in flight across stories.
+    input_budget, output_tokens = request_budget(story, model, variant, output_tokens)
+    preamble, parts = split_story(story.get("user_story", ""), min(chunk_tokens, input_budget), model)
+
+    def request(part):
+        return call_with_backoff(
+            lambda: generate(part, client, cache=cache, use_cache=use_cache, model=model,
+                             temperature=temperature, variant=variant, max_tokens=output_tokens),
+            max_retries, limit=limit,
+        )
+
+    if len(parts) == 1:
+        output, cached = request(story)
+        return output, {"parts": 1, "duplicates": 0, "cached": cached}
+
+    stories = [part_story(story, preamble, part, i, len(parts)) for i, part in enumerate(parts, start=1)]
+    outputs, cached, errors = [None] * len(stories), [], []
+
+    def generate_part(part):
+        output, hit = request(part)
+        cached.append(hit)
+        return output
+
+    def collect(index, part, output, error):
+        if error is not None:
+            errors.append(error)
+        outputs[index] = output
+
+    run_batch(stories, generate_part, collect, max_workers=max_workers, max_retries=0)
+    if errors:
+        raise errors[0]
+    output, duplicates = merge_outputs(outputs, story.get("framework", ""))
+    return output, {"parts": len(parts), "duplicates": duplicates, "cached": all(cached)}
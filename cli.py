@@ -0,0 +1,202 @@
+import argparse
+import os
+import sys
+import threading
+
+from batch import call_with_backoff, load_stories, run_batch
+from chunking import CHUNK_TOKENS, generate_chunked
+from core import DEFAULT_MODEL, PROMPT_VARIANTS, build_prompt, generate, get_client, make_project, new_timestamp, save_project
+
+STORY_FILE_EXTENSIONS = (".txt", ".md")
+BATCH_FILE_EXTENSIONS = (".csv", ".jsonl", ".ndjson")
+
+
+# --- Story discovery ---
+def read_stories(path, defaults):
+    paths = [path]
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+
+    stories = []
+    for file_path in paths:
+        name = os.path.basename(file_path)
+        if name.lower().endswith(BATCH_FILE_EXTENSIONS):
+            with open(file_path, "rb") as f:
+                rows = load_stories(f.read(), name)
+        elif name.lower().endswith(STORY_FILE_EXTENSIONS):
+            with open(file_path, encoding="utf-8") as f:
+                text = f.read().strip()
+            rows = [{"title": os.path.splitext(name)[0], "user_story": text}] if text else []
+        else:
+            continue
+        for row in rows:
+            stories.append({**defaults, **{k: v for k, v in row.items() if v}})
+    return stories
+
+def story_defaults(args):
+    manual = args.format_type == "Manual Only"
+    return {
+        "test_type": args.test_type,
+        "format_type": args.format_type,
+        "framework": "" if manual else args.framework,
+        "style": "" if manual else args.style,
+        "expected_result": "",
+        "severity": args.severity,
+        "category": args.category,
+    }
+
+def safe_filename(title):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in title).strip("_") or "story"
+
+
+# --- Commands ---
+def cmd_prompt(args):
+    for story in read_stories(args.stories, story_defaults(args)):
+        print(f"===== {story['title']} =====")
+        print(build_prompt(story, args.variant))
+    return 0
+
+def cmd_generate(args):
+    stories = read_stories(args.stories, story_defaults(args))
+    if not stories:
+        print(f"No stories found in {args.stories}", file=sys.stderr)
+        return 1
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    client = get_client()
+    cache = None
+    if not args.no_cache:
+        from response_cache import ResponseCache
+        cache = ResponseCache()
+    store = vector_data = None
+    if args.save:
+        from project_store import ProjectShards
+        shards = ProjectShards()
+        store = shards.for_author(args.author_email)
+        vector_data = shards.load_memory(args.author_email)
+
+    os.makedirs(args.out, exist_ok=True)
+    failures = 0
+
+    def on_result(index, story, output, error):
+        nonlocal failures
+        if error is not None:
+            failures += 1
+            print(f"[{index + 1}/{len(stories)}] FAILED {story['title']}: {error}", file=sys.stderr)
+            return
+        out_path = os.path.join(args.out, safe_filename(story["title"]) + ".md")
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(output)
+        if store is not None:
+            project = make_project(story, output, args.author, args.author_email, new_timestamp(precise=True))
+            save_project(store, project, vector_data)
+        print(f"[{index + 1}/{len(stories)}] {story['title']} -> {out_path}")
+
+    # Requests are retried one at a time (here and per part in generate_chunked),
+    # and the semaphore keeps stories and their parts to --concurrency in flight
+    limit = threading.BoundedSemaphore(args.concurrency)
+
+    def generate_story(story):
+        if args.chunk_tokens:
+            return generate_chunked(story, client, cache=cache, model=args.model, variant=args.variant,
+                                    max_workers=args.concurrency, chunk_tokens=args.chunk_tokens, limit=limit)[0]
+        return call_with_backoff(lambda: generate(story, client, cache=cache, model=args.model, variant=args.variant),
+                                 limit=limit)[0]
+
+    run_batch(stories, generate_story, on_result, max_workers=args.concurrency, max_retries=0)
+    return 1 if failures else 0
+
+def cmd_export(args):
+    # Streams every project (or --key ones) of an author straight to disk
+    import exports
+    from project_store import ProjectShards
+
+    store = ProjectShards(os.path.join(args.directory, "authors")).for_author(args.author_email)
+    keys = args.key or [meta["key"] for meta in store.list_projects(args.author_email)]
+    if args.format == "xlsx" and not exports.excel_available():
+        print("Excel export needs openpyxl (pip install openpyxl)", file=sys.stderr)
+        return 1
+    write, text, _, _ = exports.FORMATS[args.format]
+    options = {"with_project": True} if args.format == "csv" else {}
+    with open(args.out, "w" if text else "wb", **({"encoding": "utf-8", "newline": ""} if text else {})) as f:
+        write(f, exports.iter_projects(store, keys), **options)
+    print(f"Exported {len(keys)} project(s) to {args.out}")
+    return 0
+
+def cmd_convert(args):
+    # Imports the legacy layout, then re-encodes every shard and memory log with --codec
+    import codec
+    from project_store import ProjectShards
+
+    name = codec.resolve(args.codec)
+    if args.codec and name != args.codec:
+        print(f"{args.codec} is not available (pip install zstandard); using {name}", file=sys.stderr)
+    shards = ProjectShards(os.path.join(args.directory, "authors"))
+    print(f"Imported {shards.migrate_legacy(args.directory, args.legacy_memory, args.legacy_json)} legacy project(s)")
+    shards.dedupe()
+    before, after, entries = shards.recompress(name)
+    print(f"{len(shards.existing_shards())} shard(s) and {entries} memory entries stored with {name}: "
+          f"{before:,} -> {after:,} bytes")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Generate test cases from user stories without the web UI.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_story_args(p):
+        p.add_argument("stories", help="a story file (.txt/.md/.csv/.jsonl) or a directory of them")
+        p.add_argument("--test-type", default="Functional", choices=["Functional", "Negative", "BDD (Gherkin)"])
+        p.add_argument("--format-type", default="Manual Only", choices=["Manual Only", "Automation Only", "Both"])
+        p.add_argument("--framework", default="Robot Framework")
+        p.add_argument("--style", default="BDD")
+        p.add_argument("--severity", default="")
+        p.add_argument("--category", default="")
+        p.add_argument("--variant", default="simple", choices=sorted(PROMPT_VARIANTS))
+
+    p = sub.add_parser("prompt", help="print the prompts that would be sent")
+    add_story_args(p)
+    p.set_defaults(func=cmd_prompt)
+
+    p = sub.add_parser("generate", help="generate test cases for every story")
+    add_story_args(p)
+    p.add_argument("--out", default="generated", help="directory for <title>.md outputs")
+    p.add_argument("--model", default=DEFAULT_MODEL)
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--chunk-tokens", type=int, default=CHUNK_TOKENS,
+                   help="split longer stories into parts of about this many tokens (0 disables splitting)")
+    p.add_argument("--no-cache", action="store_true", help="bypass the response cache")
+    p.add_argument("--save", action="store_true", help="also save projects to saved_projects/")
+    p.add_argument("--author", default="cli")
+    p.add_argument("--author-email", default="cli@localhost")
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser("export", help="export saved projects as a zip bundle, CSV, JUnit XML or Excel")
+    p.add_argument("out", help="output file")
+    p.add_argument("--format", default="bundle", choices=["bundle", "csv", "junit", "xlsx", "frameworks"])
+    p.add_argument("--key", action="append", help="project key (repeatable; default: all of the author's projects)")
+    p.add_argument("--author-email", default="cli@localhost")
+    p.add_argument("--directory", default="saved_projects")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("convert", help="import saved_projects/ into author shards and re-encode stored bodies")
+    p.add_argument("--codec", default=None, choices=["none", "gzip", "zstd"],
+                   help="storage codec (default: STORAGE_CODEC or gzip)")
+    p.add_argument("--directory", default="saved_projects")
+    p.add_argument("--legacy-memory", default="vector_data.jsonl")
+    p.add_argument("--legacy-json", default="vector_data.json", help="original memory file, converted to --legacy-memory first")
+    p.set_defaults(func=cmd_convert)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
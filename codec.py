@@ -0,0 +1,80 @@
+import base64
+import gzip
+import os
+
+# Compressed record format for stored bodies (outputs, stories, parsed JSON) and
+# memory entries. A record is MAGIC + one codec byte + payload; anything without
+# the header is a plain record written before compression (or with codec "none"),
+# so readers handle old and new rows alike and the codec can change at any time.
+
+MAGIC = b"TC1"
+CODEC_IDS = {"gzip": b"g", "zstd": b"z"}
+CODECS = ["none"] + list(CODEC_IDS)
+DEFAULT_CODEC = os.getenv("STORAGE_CODEC", "gzip")
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 6
+MIN_SIZE = 64  # shorter texts are stored plain; the header would outweigh the savings
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+def resolve(codec=None):
+    # zstd is optional; fall back to gzip when the zstandard package is missing
+    codec = codec or DEFAULT_CODEC
+    if codec not in CODECS:
+        raise ValueError(f"Unknown storage codec {codec!r} (choose from {', '.join(CODECS)})")
+    if codec == "zstd" and _zstd() is None:
+        return "gzip"
+    return codec
+
+def encode(text, codec=None):
+    # Returns str for plain records and bytes for compressed ones (SQLite stores either)
+    if text is None:
+        return None
+    codec = resolve(codec)
+    raw = text.encode("utf-8")
+    if codec == "none" or len(raw) < MIN_SIZE:
+        return text
+    if codec == "zstd":
+        payload = _zstd().ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    else:
+        payload = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    return MAGIC + CODEC_IDS[codec] + payload
+
+def decode(value):
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if not value.startswith(MAGIC):
+        return value.decode("utf-8")
+    codec_id, payload = value[len(MAGIC):len(MAGIC) + 1], value[len(MAGIC) + 1:]
+    if codec_id == CODEC_IDS["gzip"]:
+        return gzip.decompress(payload).decode("utf-8")
+    if codec_id == CODEC_IDS["zstd"]:
+        zstd = _zstd()
+        if zstd is None:
+            raise RuntimeError("This record is zstd-compressed; install the zstandard package to read it")
+        return zstd.ZstdDecompressor().decompress(payload).decode("utf-8")
+    raise ValueError(f"Unknown codec byte {codec_id!r} in stored record")
+
+def codec_of(value):
+    if isinstance(value, (bytes, memoryview)) and bytes(value[:len(MAGIC)]) == MAGIC:
+        codec_id = bytes(value[len(MAGIC):len(MAGIC) + 1])
+        return next((name for name, cid in CODEC_IDS.items() if cid == codec_id), "unknown")
+    return "none"
+
+
+# --- Text form for JSON records (memory log) ---
+def encode_text(text, codec=None):
+    value = encode(text, codec)
+    if isinstance(value, str):
+        return None
+    return base64.b64encode(value).decode("ascii")
+
+def decode_text(value):
+    return decode(base64.b64decode(value))
@@ -0,0 +1,170 @@
+import datetime
+import os
+import re
+
+import metrics
+from prompts import PROMPT_VERSION, VARIANTS as PROMPT_VARIANTS, template_for
+from testcases import parse_output
+
+# Pure-Python generation core shared by app.py and cli.py. Nothing here imports
+# streamlit, and openai/numpy are only imported on the code paths that need them.
+
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+DEFAULT_TEMPERATURE = 0.4
+
+STORY_FIELDS = [
+    "title", "user_story", "test_type", "format_type", "framework",
+    "style", "expected_result", "severity", "category",
+]
+
+_CODE_BLOCK_RE = re.compile(r"```(\w+)?\n(.*?)```", re.DOTALL)
+
+
+# --- Prompt building ---
+def build_prompt(story, variant="simple"):
+    return template_for(story, variant).render(story)
+
+
+# --- Generation ---
+def get_client(api_key=None):
+    # Backend, model routing, coalescing and hedging are configured in llm.py
+    from llm import LLMRouter, make_backend
+
+    return LLMRouter(make_backend(api_key))
+
+def complete(client, prompt, model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, max_tokens=None):
+    metrics.inc("llm_requests_total", model=model, stream="false")
+    options = {"max_tokens": max_tokens} if max_tokens else {}
+    with metrics.span("llm_completion", model=model):
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            **options
+        )
+    metrics.record_usage(getattr(response, "usage", None), model)
+    return response.choices[0].message.content
+
+def stream_complete(client, prompt, model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE):
+    metrics.inc("llm_requests_total", model=model, stream="true")
+    stream = client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    return metrics.timed_iter("llm_stream", iter_stream_content(stream, model), model=model)
+
+def iter_stream_content(stream, model=DEFAULT_MODEL):
+    for chunk in stream:
+        # With include_usage the last chunk has no choices, only token counts
+        metrics.record_usage(getattr(chunk, "usage", None), model)
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def story_cache_key(story, model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, variant="simple"):
+    from response_cache import cache_key
+
+    return cache_key(story, model=model, temperature=temperature, prompt=f"{variant}/{PROMPT_VERSION}")
+
+def generate(story, client, cache=None, use_cache=True, model=DEFAULT_MODEL,
+             temperature=DEFAULT_TEMPERATURE, variant="simple", max_tokens=None):
+    # Returns (output, served_from_cache)
+    key = None
+    if cache is not None:
+        key = story_cache_key(story, model, temperature, variant)
+        if use_cache:
+            output = cache.get(key)
+            metrics.inc("response_cache_total", result="hit" if output is not None else "miss")
+            if output is not None:
+                return output, True
+    output = complete(client, build_prompt(story, variant), model, temperature, max_tokens)
+    if cache is not None:
+        cache.put(key, output)
+    return output, False
+
+
+# --- Parsing ---
+def extract_code_blocks(output):
+    return [(m.group(1) or "text", m.group(2).strip()) for m in _CODE_BLOCK_RE.finditer(output)]
+
+class FencedBlockParser:
+    # Splits streamed markdown into text/code blocks one completed line at a time,
+    # so each token only touches the block it lands in.
+    def __init__(self):
+        self.blocks = []
+        self.pending = ""
+        self.in_code = False
+
+    def feed(self, chunk):
+        lines = (self.pending + chunk).split("\n")
+        self.pending = lines.pop()
+        return {self._consume(line) for line in lines}
+
+    def close(self):
+        touched = set()
+        if self.pending:
+            touched.add(self._consume(self.pending))
+            self.pending = ""
+        return touched
+
+    def _consume(self, line):
+        fence = line.strip()
+        if fence.startswith("```"):
+            if not self.in_code:
+                self.in_code = True
+                lang = fence[3:].split()
+                self.blocks.append({"kind": "code", "lang": lang[0] if lang else "text", "lines": []})
+                return len(self.blocks) - 1
+            if fence == "```":
+                self.in_code = False
+                return len(self.blocks) - 1
+        kind = "code" if self.in_code else "text"
+        if not self.blocks or self.blocks[-1]["kind"] != kind:
+            self.blocks.append({"kind": kind, "lang": None, "lines": []})
+        self.blocks[-1]["lines"].append(line)
+        return len(self.blocks) - 1
+
+    def block_text(self, index):
+        lines = self.blocks[index]["lines"]
+        if index == len(self.blocks) - 1 and self.pending and not self.pending.lstrip().startswith("`"):
+            lines = lines + [self.pending]
+        return "\n".join(lines).strip("\n")
+
+
+# --- Persistence ---
+def new_timestamp(precise=False):
+    # precise adds microseconds, for callers that save many projects per second
+    # (the project key is title + timestamp, and saving an existing key overwrites it)
+    return datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S.%f" if precise else "%Y-%m-%d_%H-%M-%S")
+
+def make_project(story, output, author, author_email, timestamp=None):
+    project = {field: story.get(field, "") for field in STORY_FIELDS}
+    project.update({
+        "author": author,
+        "author_email": author_email,
+        "timestamp": timestamp or new_timestamp(),
+        "output": output,
+    })
+    with metrics.span("parse_output"):
+        project["parsed"] = parse_output(output, story.get("framework", "")).to_dict()
+    return project
+
+@metrics.timed("save_project")
+def save_project(store, project, vector_data=None):
+    key = store.save(project)
+    version = store.version_info(key) or {}
+    repeated = version.get("prev_key") and version.get("lines_added") == 0 and version.get("lines_removed") == 0
+    # An unchanged regeneration is already in memory under the previous version
+    if vector_data is not None and not repeated:
+        from memory import append_vector_entry
+
+        append_vector_entry(vector_data, {
+            "title": project["title"],
+            "timestamp": project["timestamp"],
+            "test_type": project["test_type"],
+            "author_email": project.get("author_email", ""),
+            "output": project["output"]
+        })
+    return key
@@ -0,0 +1,193 @@
+import csv
+import io
+import re
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from testcases import CSV_HEADER, ParsedOutput, csv_rows, parse_output
+
+# Export writers for one project or many. Each writer takes an open file and an
+# iterable of project dicts (as returned by ProjectStore.get_project) and writes
+# as it goes, so a bundle of many projects only holds one project in memory at a
+# time. export_file() spools to a temporary file that moves to disk past
+# SPOOL_BYTES; the app calls it only when a download is clicked.
+
+SPOOL_BYTES = 8 * 1024 * 1024
+GHERKIN_KEYWORDS = ("Given ", "When ", "Then ", "And ", "But ")
+
+_SLUG_RE = re.compile(r"[^A-Za-z0-9.-]+")
+
+
+def slug(text):
+    return _SLUG_RE.sub("_", text or "").strip("_.") or "project"
+
+def project_name(project):
+    return slug(f"{project.get('title', '')}_{project.get('timestamp', '')}")
+
+def project_parsed(project):
+    parsed = project.get("parsed")
+    if parsed:
+        return ParsedOutput.from_dict(parsed)
+    return parse_output(project.get("output") or "", project.get("framework") or "")
+
+def iter_projects(store, keys):
+    # Bodies are loaded one key at a time, only as the writer consumes them
+    for key in keys:
+        project = store.get_project(key)
+        if project is not None:
+            yield project
+
+
+# --- Tabular ---
+def write_csv(f, projects, with_project=False):
+    writer = csv.writer(f)
+    writer.writerow((["Project", "Timestamp"] if with_project else []) + CSV_HEADER)
+    for project in projects:
+        prefix = [project.get("title", ""), project.get("timestamp", "")] if with_project else []
+        for row in csv_rows(project_parsed(project)):
+            writer.writerow(prefix + row)
+
+def write_junit(f, projects):
+    # One <testsuite> per project; cases carry their steps as system-out so CI
+    # dashboards that import JUnit show the manual procedure
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n')
+    for project in projects:
+        parsed = project_parsed(project)
+        f.write(f"  <testsuite name={quoteattr(project.get('title', ''))} tests=\"{len(parsed.test_cases)}\" "
+                f"timestamp={quoteattr(project.get('timestamp', ''))}>\n")
+        for case in parsed.test_cases:
+            body = []
+            if case.preconditions:
+                body.append("Preconditions:\n" + "\n".join(case.preconditions))
+            if case.steps:
+                body.append("Steps:\n" + "\n".join(f"{n}. {step}" for n, step in enumerate(case.steps, start=1)))
+            if case.expected_results:
+                body.append("Expected:\n" + "\n".join(case.expected_results))
+            f.write(f"    <testcase classname={quoteattr(project_name(project))} "
+                    f"name={quoteattr(f'{case.id}: {case.title}')}>\n")
+            if body:
+                f.write(f"      <system-out>{escape(chr(10).join(body))}</system-out>\n")
+            f.write("    </testcase>\n")
+        f.write("  </testsuite>\n")
+    f.write("</testsuites>\n")
+
+def excel_available():
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def write_xlsx(f, projects):
+    # Write-only workbooks stream rows to disk instead of building the sheet in memory
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Test cases")
+    sheet.append(["Project", "Timestamp"] + CSV_HEADER)
+    for project in projects:
+        for row in csv_rows(project_parsed(project)):
+            sheet.append([project.get("title", ""), project.get("timestamp", "")] + row)
+    workbook.save(f)
+
+
+# --- Framework files ---
+def artifact_name(block, base):
+    language = (block.language or "").lower()
+    if block.framework == "Robot Framework":
+        return f"{base}.robot"
+    if block.framework == "Cucumber":
+        return f"{base}.feature"
+    if block.framework == "Cypress":
+        return f"{base}.cy.ts" if language in ("ts", "typescript") else f"{base}.cy.js"
+    if block.framework == "Playwright":
+        if language in ("python", "py"):
+            return f"test_{base}.py"
+        return f"{base}.spec.ts" if language in ("ts", "typescript") else f"{base}.spec.js"
+    return None
+
+def feature_from_cases(title, parsed):
+    lines = [f"Feature: {title}", ""]
+    for case in parsed.test_cases:
+        lines.append(f"  Scenario: {case.title or case.id}")
+        for keyword, items in (("Given", case.preconditions), ("When", case.steps), ("Then", case.expected_results)):
+            for n, item in enumerate(items):
+                # Cases parsed from Gherkin code already carry their keywords
+                step = item if item.startswith(GHERKIN_KEYWORDS) else f"{keyword if n == 0 else 'And'} {item}"
+                lines.append(f"    {step}")
+        lines.append("")
+    return "\n".join(lines)
+
+def framework_files(project):
+    # (filename, text) for each automation block; BDD projects without a .feature
+    # block get one derived from their test cases
+    parsed = project_parsed(project)
+    base = slug(project.get("title", ""))
+    names = {}
+    for block in parsed.code_blocks:
+        name = artifact_name(block, base)
+        if name is None:
+            continue
+        count = names[name] = names.get(name, 0) + 1
+        if count > 1:
+            name = artifact_name(block, f"{base}_{count}")
+        yield name, block.code + "\n"
+    if project.get("test_type") == "BDD (Gherkin)" and f"{base}.feature" not in names and parsed.test_cases:
+        yield f"{base}.feature", feature_from_cases(project.get("title", ""), parsed)
+
+
+# --- Bundles ---
+def _zip_text(bundle, name, write, *args):
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    with bundle.open(info, "w") as raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+        write(f, *args)
+
+def write_bundle(f, projects):
+    # One folder per project: output.md, test_cases.csv, junit.xml and framework files
+    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for project in projects:
+            folder = project_name(project)
+            _zip_text(bundle, f"{folder}/output.md", lambda out: out.write(project.get("output") or ""))
+            _zip_text(bundle, f"{folder}/test_cases.csv", write_csv, [project])
+            _zip_text(bundle, f"{folder}/junit.xml", write_junit, [project])
+            for name, text in framework_files(project):
+                _zip_text(bundle, f"{folder}/{name}", lambda out, text=text: out.write(text))
+
+def write_framework_zip(f, projects):
+    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for project in projects:
+            folder = project_name(project)
+            for name, text in framework_files(project):
+                bundle.writestr(f"{folder}/{name}", text)
+
+
+FORMATS = {
+    # name: (writer, text mode, extension, mime)
+    "csv": (write_csv, True, "csv", "text/csv"),
+    "junit": (write_junit, True, "xml", "application/xml"),
+    "xlsx": (write_xlsx, False, "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "frameworks": (write_framework_zip, False, "zip", "application/zip"),
+    "bundle": (write_bundle, False, "zip", "application/zip"),
+}
+
+def export_file(fmt, projects, **options):
+    # Returns a spooled binary file positioned at the start
+    write, text, _, _ = FORMATS[fmt]
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    if text:
+        wrapper = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+        write(wrapper, projects, **options)
+        wrapper.flush()
+        wrapper.detach()
+    else:
+        write(spool, projects, **options)
+    spool.seek(0)
+    return spool
+
+def export_bytes(fmt, projects, **options):
+    # st.download_button needs the whole payload; this runs only on click
+    with export_file(fmt, projects, **options) as f:
+        return f.read()
@@ -1,40 +1,215 @@
+import base64
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
 import streamlit as st
-import pyrebase
 
+import metrics
+
+# Process-wide auth layer. Firebase is initialised once (st.cache_resource), and
+# each signed-in session is a shared record whose ID token is refreshed on a
+# background thread before it expires. Reruns only read that record, so they make
+# no auth network calls. Set FIREBASE_AUTH_EMULATOR_HOST (host:port) to talk to
+# the Firebase Auth emulator or benchmarks/fake_auth.py instead of Google.
+
+SECRET_KEYS = {
+    "apiKey": "FIREBASE_API_KEY",
+    "authDomain": "FIREBASE_AUTH_DOMAIN",
+    "projectId": "FIREBASE_PROJECT_ID",
+    "storageBucket": "FIREBASE_STORAGE_BUCKET",
+    "messagingSenderId": "FIREBASE_MESSAGING_SENDER_ID",
+    "appId": "FIREBASE_APP_ID",
+    "measurementId": "FIREBASE_MEASUREMENT_ID",
+}
+REFRESH_MARGIN = 300      # refresh tokens this many seconds before they expire
+REFRESH_POLL = 30         # how often the refresher looks for expiring tokens
+SESSION_IDLE = 12 * 3600  # stop refreshing sessions not seen for this long
+TOKEN_LIFETIME = 3600     # Firebase ID tokens last an hour
+
+
+def token_expiry(id_token, default=None):
+    # exp claim of the (unverified) JWT payload; Google already vouched for tokens we receive
+    try:
+        payload = id_token.split(".")[1]
+        return float(json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return default if default is not None else time.time() + TOKEN_LIFETIME
+
+
+# --- Backends ---
+class AuthError(Exception):
+    pass
+
+
+class RestAuth:
+    # Identity Toolkit v1 REST calls with the same method names as pyrebase's Auth;
+    # used for the emulator, whose URLs pyrebase cannot be pointed at
+    def __init__(self, api_key, host):
+        self.api_key = api_key
+        self.identity_url = f"http://{host}/identitytoolkit.googleapis.com/v1/accounts:"
+        self.token_url = f"http://{host}/securetoken.googleapis.com/v1/token"
+
+    def _post(self, url, payload):
+        request = urllib.request.Request(
+            f"{url}?key={self.api_key}", data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as exc:
+            raise AuthError(exc.read().decode("utf-8", "replace")) from exc
+
+    def sign_in_with_email_and_password(self, email, password):
+        return self._post(self.identity_url + "signInWithPassword",
+                          {"email": email, "password": password, "returnSecureToken": True})
+
+    def create_user_with_email_and_password(self, email, password):
+        return self._post(self.identity_url + "signUp", {"email": email, "password": password, "returnSecureToken": True})
+
+    def refresh(self, refresh_token):
+        data = self._post(self.token_url, {"grantType": "refresh_token", "refreshToken": refresh_token})
+        return {"userId": data["user_id"], "idToken": data["id_token"], "refreshToken": data["refresh_token"]}
+
+    def get_account_info(self, id_token):
+        return self._post(self.identity_url + "lookup", {"idToken": id_token})
+
+
+# --- Sessions ---
+class AuthSessions:
+    def __init__(self, backend, refresh_margin=REFRESH_MARGIN, poll=REFRESH_POLL, idle=SESSION_IDLE):
+        self.backend = backend
+        self.refresh_margin = refresh_margin
+        self.poll = poll
+        self.idle = idle
+        self._lock = threading.Lock()
+        self._sessions = {}   # localId -> live user record (the dict kept in st.session_state.user)
+        self._verified = {}   # idToken -> (account info, expires_at)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._refresh_loop, name="auth-refresh", daemon=True)
+        self._thread.start()
+
+    def _call(self, op, fn, *args):
+        metrics.inc("auth_calls_total", op=op)
+        with metrics.span("firebase_" + op):
+            return fn(*args)
+
+    def sign_in(self, email, password):
+        data = self._call("sign_in", self.backend.sign_in_with_email_and_password, email, password)
+        account = self.verify(data["idToken"])
+        now = time.time()
+        user = {
+            "email": data.get("email", email),
+            "localId": data["localId"],
+            "idToken": data["idToken"],
+            "refreshToken": data["refreshToken"],
+            "expiresAt": token_expiry(data["idToken"], now + float(data.get("expiresIn", TOKEN_LIFETIME))),
+            "emailVerified": bool(account.get("emailVerified")),
+            "lastSeen": now,
+        }
+        with self._lock:
+            # A second tab for the same account shares (and refreshes) one record
+            self._sessions[user["localId"]] = user
+        return user
+
+    def sign_up(self, email, password):
+        return self._call("sign_up", self.backend.create_user_with_email_and_password, email, password)
+
+    def sign_out(self, user):
+        with self._lock:
+            self._sessions.pop((user or {}).get("localId"), None)
+            self._verified.pop((user or {}).get("idToken"), None)
+
+    def verify(self, id_token):
+        # Account info per token, fetched once and kept until the token expires
+        with self._lock:
+            cached = self._verified.get(id_token)
+        if cached and cached[1] > time.time():
+            return cached[0]
+        info = self._call("verify", self.backend.get_account_info, id_token)
+        users = info.get("users") or []
+        if not users:
+            raise AuthError("Token does not belong to an account")
+        with self._lock:
+            self._verified[id_token] = (users[0], token_expiry(id_token))
+        return users[0]
+
+    def current(self, user):
+        # Per-rerun check, no network: the session's record if its token is still valid
+        if not user or "localId" not in user:
+            return None
+        with self._lock:
+            live = self._sessions.get(user["localId"])
+            if live is None or live["expiresAt"] <= time.time():
+                return None
+            live["lastSeen"] = time.time()
+            return live
+
+    # --- Background refresh ---
+    def refresh_due(self):
+        now = time.time()
+        with self._lock:
+            for local_id in [k for k, u in self._sessions.items() if now - u["lastSeen"] > self.idle]:
+                del self._sessions[local_id]
+            self._verified = {token: entry for token, entry in self._verified.items() if entry[1] > now}
+            due = [u for u in self._sessions.values() if u["expiresAt"] - now <= self.refresh_margin]
+        refreshed = 0
+        for user in due:
+            try:
+                data = self._call("refresh", self.backend.refresh, user["refreshToken"])
+            except Exception:
+                # Revoked or disabled: leave it to expire, the next rerun shows the login form
+                metrics.inc("auth_refresh_failed_total")
+                continue
+            with self._lock:
+                user.update(idToken=data["idToken"], refreshToken=data["refreshToken"],
+                            expiresAt=token_expiry(data["idToken"]))
+            refreshed += 1
+        return refreshed
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.poll):
+            self.refresh_due()
+
+    def close(self):
+        self._stop.set()
+
+
+@st.cache_resource
 def init_firebase():
-    firebase_config = {
-        "apiKey": st.secrets["FIREBASE_API_KEY"],
-        "authDomain": st.secrets["FIREBASE_AUTH_DOMAIN"],
-        "projectId": st.secrets["FIREBASE_PROJECT_ID"],
-        "storageBucket": st.secrets["FIREBASE_STORAGE_BUCKET"],
-        "messagingSenderId": st.secrets["FIREBASE_MESSAGING_SENDER_ID"],
-        "appId": st.secrets["FIREBASE_APP_ID"],
-        "measurementId": st.secrets["FIREBASE_MEASUREMENT_ID"],
-        "databaseURL": ""
-    }
-    firebase = pyrebase.initialize_app(firebase_config)
-    return firebase.auth()
+    # Secrets are read and the backend built once per process
+    emulator = os.getenv("FIREBASE_AUTH_EMULATOR_HOST")
+    if emulator:
+        # The emulator accepts any API key, so no secrets are needed
+        return AuthSessions(RestAuth("emulator", emulator))
+    import pyrebase
+
+    config = {key: st.secrets[secret] for key, secret in SECRET_KEYS.items()}
+    config["databaseURL"] = ""
+    return AuthSessions(pyrebase.initialize_app(config).auth())
 
 def login_ui(auth):
     st.title("🔑 Login to AI Test Case Generator")
     choice = st.selectbox("Login or Signup", ["Login", "Sign up"])
     email = st.text_input("Email")
     password = st.text_input("Password", type="password")
-    
+
     if choice == "Login":
         if st.button("Login"):
             try:
-                user = auth.sign_in_with_email_and_password(email, password)
-                st.session_state.user = user
+                st.session_state.user = auth.sign_in(email, password)
                 st.session_state.login_error = False
-                st.rerun()
-            except:
+            except Exception:
                 st.session_state.login_error = True
-                st.rerun()
+            st.rerun()
     else:
         if st.button("Sign up"):
             try:
-                auth.create_user_with_email_and_password(email, password)
+                auth.sign_up(email, password)
                 st.success("Account created. Now log in.")
-            except:
-                st.error("Signup failed. Try different email or stronger password.")
\ No newline at end of file
+            except Exception:
+                st.error("Signup failed. Try different email or stronger password.")
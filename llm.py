@@ -0,0 +1,387 @@
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import metrics
+
+# Backend layer behind core.complete()/stream_complete(). LLMRouter has the same
+# client.chat.completions.create() surface as openai.OpenAI, so it drops in
+# wherever a client is passed, and adds:
+#   - backend choice: OpenAI, any OpenAI-compatible server (vLLM, Ollama,
+#     llama.cpp server, LM Studio) or an in-process llama.cpp model
+#   - per-request model routing by prompt size (LLM_ROUTES)
+#   - coalescing: identical requests already in flight share one upstream call
+#   - a hard timeout, a hedged second request for calls slower than usual, and retries
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")        # openai | local
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")                # OpenAI-compatible server, e.g. http://localhost:11434/v1
+LLM_MODEL_PATH = os.getenv("LLM_MODEL_PATH")            # GGUF file for LLM_BACKEND=local
+LLM_ROUTES = os.getenv("LLM_ROUTES", "")                # e.g. "gpt-4o-mini:3000,gpt-4o"
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 120))      # seconds per request once it runs (per chunk once streaming)
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", 60))  # hedge delay until latencies are known; 0 disables hedging
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", 0.95))  # then hedge calls slower than this quantile
+LLM_HEDGE_RATIO = float(os.getenv("LLM_HEDGE_RATIO", 0.1))        # at most this share of in-flight requests hedged
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", 1))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", 32))
+LATENCY_WINDOW = 200      # recent latencies kept per model
+LATENCY_MIN_SAMPLES = 20  # fewer than this and the hedge waits LLM_HEDGE_AFTER
+QUEUE_POLL = 0.05         # how often a queued or hedge-starved call looks again
+
+
+def parse_routes(spec):
+    # "small:3000,large" -> [(3000, "small"), (None, "large")]: prompts up to 3000
+    # tokens go to the first model, anything larger to the next one that fits
+    routes = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, sep, limit = item.rpartition(":")
+        if not (sep and limit.isdigit()):
+            model, limit = item, ""  # no size limit (or a tag such as llama3:8b)
+        routes.append((int(limit) if limit else None, model))
+    return routes
+
+
+# --- Backends ---
+def _namespace(value):
+    # llama.cpp returns OpenAI-shaped dicts; core reads attributes
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_namespace(v) for v in value]
+    return value
+
+
+class LocalModel:
+    # In-process model via llama-cpp-python (optional: pip install llama-cpp-python)
+    def __init__(self, model_path, n_ctx=8192):
+        try:
+            from llama_cpp import Llama
+        except ImportError as exc:
+            raise RuntimeError("LLM_BACKEND=local needs the llama-cpp-python package") from exc
+        self.llama = Llama(model_path=model_path, n_ctx=n_ctx, verbose=False)
+        self._lock = threading.Lock()  # one generation at a time per loaded model
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, temperature=None, stream=False, max_tokens=None, **kwargs):
+        options = {"messages": messages, "temperature": temperature if temperature is not None else 0.4,
+                   "max_tokens": max_tokens, "stream": stream}
+        if not stream:
+            with self._lock:
+                return _namespace(self.llama.create_chat_completion(**options))
+        return self._stream(options)
+
+    def _stream(self, options):
+        with self._lock:
+            for chunk in self.llama.create_chat_completion(**options):
+                yield _namespace(chunk)
+
+
+def make_backend(api_key=None):
+    if LLM_BACKEND == "local":
+        if not LLM_MODEL_PATH:
+            raise RuntimeError("LLM_BACKEND=local needs LLM_MODEL_PATH")
+        return LocalModel(LLM_MODEL_PATH)
+    from openai import OpenAI
+
+    # Retries and timeouts are handled by the router, not by the client
+    key = api_key or os.getenv("LLM_API_KEY") or os.getenv("OPENAI_API_KEY")
+    if LLM_BASE_URL and not key:
+        key = "local"  # local servers ignore the key but the client requires one
+    return OpenAI(api_key=key, base_url=LLM_BASE_URL, timeout=LLM_TIMEOUT, max_retries=0)
+
+
+# --- Streams shared between callers ---
+class _Pump:
+    # Reads an upstream iterator on its own thread so any number of subscribers can
+    # replay it, and a stalled or abandoned reader never blocks the others
+    def __init__(self, open_stream, signal=None, on_done=None):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self._cancelled = False
+        self._stream = None
+        self._cond = threading.Condition()
+        self._signal = signal
+        self._on_done = on_done
+        self.started = time.monotonic()
+        threading.Thread(target=self._run, args=(open_stream,), name="llm-stream", daemon=True).start()
+
+    def _run(self, open_stream):
+        try:
+            self._stream = open_stream()
+            for chunk in self._stream:
+                with self._cond:
+                    self.chunks.append(chunk)
+                    self._cond.notify_all()
+                if self._signal is not None:
+                    self._signal.set()
+                if self._cancelled:
+                    break
+        except Exception as exc:
+            self.error = exc
+        finally:
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+            if self._signal is not None:
+                self._signal.set()
+            if self._on_done is not None:
+                self._on_done()
+
+    def cancel(self):
+        self._cancelled = True
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                pass
+
+    def subscribe(self, idle_timeout=None):
+        index = 0
+        while True:
+            with self._cond:
+                if index >= len(self.chunks) and not self.done:
+                    self._cond.wait_for(lambda: index < len(self.chunks) or self.done, timeout=idle_timeout)
+                if index < len(self.chunks):
+                    chunk = self.chunks[index]
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    raise TimeoutError(f"No output from the model for {idle_timeout:g}s")
+            index += 1
+            yield chunk
+
+
+# --- Router ---
+class LLMRouter:
+    def __init__(self, backend, routes=None, timeout=LLM_TIMEOUT, hedge_after=LLM_HEDGE_AFTER, retries=LLM_RETRIES,
+                 workers=LLM_WORKERS, hedge_quantile=LLM_HEDGE_QUANTILE, hedge_ratio=LLM_HEDGE_RATIO):
+        self.backend = backend
+        self.routes = parse_routes(LLM_ROUTES) if routes is None else routes
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.hedge_quantile = hedge_quantile
+        self.hedge_ratio = hedge_ratio
+        self.retries = retries
+        self.workers = workers
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._latencies = {}  # (model, stream) -> recent seconds (to first chunk for streams)
+        self._busy = 0        # pool tasks queued or running
+        self._active = 0      # requests in flight after coalescing
+        self._hedges = 0      # hedged attempts in flight
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def route(self, messages, model):
+        if not self.routes:
+            return model
+        from prompts import count_tokens
+
+        tokens = sum(count_tokens(message.get("content") or "", model) for message in messages)
+        for limit, candidate in self.routes:
+            if limit is None or tokens <= limit:
+                return candidate
+        return self.routes[-1][1]
+
+    def _create(self, model, messages, stream=False, **kwargs):
+        request = {"model": self.route(messages, model), "messages": messages, "stream": stream, **kwargs}
+        metrics.inc("llm_routed_total", model=request["model"])
+        key = hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        if stream:
+            return self._coalesced_stream(key, request)
+        return self._coalesced(key, request)
+
+    def _upstream(self, request):
+        return self.backend.chat.completions.create(**request)
+
+    # --- Hedging policy ---
+    def _observe(self, model, stream, seconds):
+        with self._lock:
+            samples = self._latencies.get((model, stream))
+            if samples is None:
+                samples = self._latencies[(model, stream)] = collections.deque(maxlen=LATENCY_WINDOW)
+            samples.append(seconds)
+
+    def hedge_delay(self, model, stream=False):
+        # The hedge_quantile of this model's recent latencies, or hedge_after until
+        # enough have been seen; None when hedging is off
+        if not self.hedge_after:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies.get((model, stream), ()))
+        if len(samples) < LATENCY_MIN_SAMPLES:
+            return self.hedge_after
+        return samples[min(len(samples) - 1, int(len(samples) * self.hedge_quantile))]
+
+    def _claim_hedge(self, stream):
+        # A hedge never waits for a worker (streams run on their own threads), and
+        # hedges in flight stay under hedge_ratio of the requests in flight
+        with self._lock:
+            if not stream and self._busy >= self.workers:
+                return False
+            if self._hedges >= max(1, int(self._active * self.hedge_ratio)):
+                return False
+            self._hedges += 1
+            return True
+
+    def _release_hedge(self, *_):
+        with self._lock:
+            self._hedges -= 1
+
+    # --- Plain completions ---
+    def _coalesced(self, key, request):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = concurrent.futures.Future()
+                self._active += 1
+        if not leader:
+            metrics.inc("llm_coalesced_total", stream="false")
+            return future.result()
+        try:
+            future.set_result(self._hedged(request))
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                self._active -= 1
+        return future.result()
+
+    def _submit(self, request, hedge=False):
+        # Returns (future, attempt); attempt["started"] is set once a worker picks it up
+        attempt = {"started": None}
+
+        def run():
+            attempt["started"] = time.monotonic()
+            response = self._upstream(request)
+            self._observe(request["model"], False, time.monotonic() - attempt["started"])
+            return response
+
+        with self._lock:
+            self._busy += 1
+        future = self._pool.submit(run)
+        future.add_done_callback(self._task_done)
+        if hedge:
+            future.add_done_callback(self._release_hedge)
+        return future, attempt
+
+    def _task_done(self, _):
+        with self._lock:
+            self._busy -= 1
+
+    def _hedged(self, request):
+        # First success wins; failures are retried. The timeout and hedge clocks
+        # start when the first attempt starts running, not while it waits for a
+        # worker. A call slower than hedge_delay() gets a twin if _claim_hedge allows
+        # it. Losing calls finish in the background and are dropped.
+        future, attempt = self._submit(request)
+        attempts, pending = {future: attempt}, {future}
+        delay = self.hedge_delay(request["model"])
+        retries, hedged, error, start = self.retries, False, None, None
+        while pending:
+            if start is None:
+                start = min((a["started"] for a in attempts.values() if a["started"] is not None), default=None)
+            wait = QUEUE_POLL
+            if start is not None:
+                elapsed = time.monotonic() - start
+                if elapsed >= self.timeout:
+                    metrics.inc("llm_timeouts_total")
+                    raise TimeoutError(f"No response from {request['model']} within {self.timeout:g}s")
+                wait = self.timeout - elapsed
+                if delay is not None and not hedged:
+                    if elapsed < delay:
+                        wait = min(wait, delay - elapsed)
+                    elif self._claim_hedge(stream=False):
+                        hedged = True
+                        metrics.inc("llm_hedged_total", stream="false")
+                        future, attempt = self._submit(request, hedge=True)
+                        attempts[future] = attempt
+                        pending.add(future)
+                    else:
+                        wait = min(wait, QUEUE_POLL)  # look again as load drops
+            done, pending = concurrent.futures.wait(pending, timeout=max(wait, 0),
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+                if retries > 0:
+                    retries -= 1
+                    metrics.inc("llm_retries_total")
+                    future, attempt = self._submit(request)
+                    attempts[future] = attempt
+                    pending.add(future)
+        raise error
+
+    # --- Streams ---
+    def _coalesced_stream(self, key, request):
+        with self._lock:
+            pump = self._inflight.get(key)
+            if pump is None:
+                self._active += 1
+                pump = self._inflight[key] = _Pump(lambda: self._race_stream(request),
+                                                   on_done=lambda: self._release(key))
+            else:
+                metrics.inc("llm_coalesced_total", stream="true")
+        return pump.subscribe(self.timeout)
+
+    def _release(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._active -= 1
+
+    def _race_stream(self, request):
+        # Same policy as _hedged, decided on the first chunk: the first stream to
+        # produce output is replayed, the others are closed. Streams read on their
+        # own threads, so the clocks start right away.
+        signal = threading.Event()
+        start = time.monotonic()
+        delay = self.hedge_delay(request["model"], stream=True)
+        pumps = [_Pump(lambda: self._upstream(request), signal)]
+        retries, hedged, winner = self.retries, False, None
+        while winner is None:
+            signal.clear()
+            winner = next((p for p in pumps if p.chunks or (p.done and p.error is None)), None)
+            if winner is not None:
+                break
+            elapsed = time.monotonic() - start
+            if all(p.done for p in pumps):
+                if retries <= 0:
+                    raise pumps[-1].error
+                retries -= 1
+                metrics.inc("llm_retries_total")
+                pumps.append(_Pump(lambda: self._upstream(request), signal))
+                continue
+            if elapsed >= self.timeout:
+                for pump in pumps:
+                    pump.cancel()
+                metrics.inc("llm_timeouts_total")
+                raise TimeoutError(f"No output from {request['model']} within {self.timeout:g}s")
+            next_event = self.timeout - elapsed
+            if delay is not None and not hedged:
+                if elapsed < delay:
+                    next_event = min(next_event, delay - elapsed)
+                elif self._claim_hedge(stream=True):
+                    hedged = True
+                    metrics.inc("llm_hedged_total", stream="true")
+                    pumps.append(_Pump(lambda: self._upstream(request), signal, on_done=self._release_hedge))
+                    continue
+                else:
+                    next_event = min(next_event, QUEUE_POLL)
+            signal.wait(max(next_event, 0.001))
+        if winner.chunks:
+            self._observe(request["model"], True, time.monotonic() - winner.started)
+        for pump in pumps:
+            if pump is not winner:
+                pump.cancel()
+        yield from winner.subscribe(self.timeout)
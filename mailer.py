@@ -0,0 +1,127 @@
+import base64
+import itertools
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from email.message import EmailMessage
+
+import metrics
+from batch import call_with_backoff
+
+SCOPES = ['https://www.googleapis.com/auth/gmail.send']
+MAX_TRACKED_JOBS = 1000
+
+
+# --- Gmail API (google client libraries are only imported when mail is sent) ---
+def build_gmail_service(token_path='token.json', credentials_path='credentials.json'):
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
+    if os.path.exists(token_path):
+        creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+    else:
+        flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
+        creds = flow.run_local_server(port=0)
+        with open(token_path, 'w') as token:
+            token.write(creds.to_json())
+    return build('gmail', 'v1', credentials=creds, cache_discovery=False)
+
+def build_raw_message(to_email, subject, body_text, attachments=()):
+    # attachments: (filename, bytes) pairs built in memory, never written to disk
+    message = EmailMessage()
+    message.set_content(body_text)
+    message['To'] = to_email
+    message['From'] = "me"
+    message['Subject'] = subject
+    for file_name, file_data in attachments:
+        message.add_attachment(file_data, maintype='application', subtype='octet-stream', filename=file_name)
+    return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
+
+
+# --- Background send queue ---
+class MailQueue:
+    def __init__(self, service_factory=build_gmail_service, workers=2, max_retries=3, base_delay=1.0):
+        self._service_factory = service_factory
+        self._local = threading.local()  # one service per worker thread
+        self._service_lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        for n in range(workers):
+            threading.Thread(target=self._work, name=f"mail-queue-{n}", daemon=True).start()
+
+    def submit(self, to_email, subject, body_text, attachments=()):
+        job_id = next(self._ids)
+        job = {
+            "id": job_id, "to": to_email, "subject": subject,
+            "status": "queued", "error": None, "message_id": None,
+            "queued_at": time.time(), "finished_at": None,
+        }
+        with self._jobs_lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > MAX_TRACKED_JOBS:
+                self._jobs.popitem(last=False)
+        self._queue.put((job_id, to_email, subject, body_text, list(attachments)))
+        return job_id
+
+    def submit_many(self, messages):
+        # messages: iterable of dicts with to_email/subject/body_text/attachments
+        return [self.submit(**message) for message in messages]
+
+    def status(self, job_id):
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def statuses(self, job_ids):
+        return [job for job in (self.status(job_id) for job_id in job_ids) if job]
+
+    def wait(self, timeout=None):
+        # Blocks until everything submitted so far has been attempted (CLI/tests)
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _get_service(self):
+        # googleapiclient/httplib2 objects are not thread-safe, so each worker
+        # builds its own. Builds are serialised so only the first can run the
+        # OAuth flow; later ones read the token it saved.
+        service = getattr(self._local, "service", None)
+        if service is None:
+            with self._service_lock, metrics.span("gmail_service"):
+                service = self._local.service = self._service_factory()
+        return service
+
+    def _update(self, job_id, **fields):
+        with self._jobs_lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _work(self):
+        while True:
+            job_id, to_email, subject, body_text, attachments = self._queue.get()
+            try:
+                self._update(job_id, status="sending")
+                raw = build_raw_message(to_email, subject, body_text, attachments)
+                service = self._get_service()
+                with metrics.span("gmail_send"):
+                    result = call_with_backoff(
+                        lambda: service.users().messages().send(userId='me', body=raw).execute(),
+                        max_retries=self.max_retries, base_delay=self.base_delay,
+                    )
+                self._update(job_id, status="sent", message_id=(result or {}).get("id"), finished_at=time.time())
+                metrics.inc("mail_total", status="sent")
+            except Exception as exc:
+                self._update(job_id, status="failed", error=str(exc), finished_at=time.time())
+                metrics.inc("mail_total", status="failed")
+            finally:
+                self._queue.task_done()
@@ -1,16 +1,377 @@
+import contextlib
 import json
 import os
+import re
+import threading
+import zlib
 
-def load_vector_data(path="vector_data.json"):
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+import numpy as np
 
-def save_vector_data(data, path="vector_data.json"):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+import codec
+import metrics
 
-def append_vector_entry(vector_data, new_entry):
-    vector_data.append(new_entry)
-    save_vector_data(vector_data)
\ No newline at end of file
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOG_PATH = "vector_data.jsonl"
+LEGACY_PATH = "vector_data.json"
+VECTOR_PATH = "vector_data.vec"
+EMBED_DIM = 256
+NGRAM_SIZE = 3
+COMPACT_EVERY = 500
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+# --- Append-only JSONL log ---
+# One entry per line; a line only counts once its trailing newline is on disk,
+# so a crash mid-write leaves a torn tail that readers skip and the next writer
+# truncates. vector_data.vec holds one float32 row per complete line, in order.
+# Outputs are stored compressed as "output_z" (codec.py, base64); entries written
+# before that keep a plain "output", and entry_output() reads either.
+
+def pack_entry(entry, name=None):
+    output = entry.get("output")
+    if output is None:
+        return entry
+    packed = codec.encode_text(output, name)
+    if packed is None:
+        return entry
+    entry = {k: v for k, v in entry.items() if k != "output"}
+    entry["output_z"] = packed
+    return entry
+
+def entry_output(entry):
+    if "output_z" in entry:
+        return codec.decode_text(entry["output_z"])
+    return entry.get("output", "")
+
+class VectorLog(list):
+    # Entries read so far, plus where reading stopped so appends can catch up
+    # with writes from other sessions instead of re-reading the whole file.
+    # One log may be shared by sessions in a process; the lock keeps their
+    # catch-ups from applying the same lines twice (taken before the file lock).
+    def __init__(self, path, vector_path):
+        super().__init__()
+        self.path = path
+        self.vector_path = vector_path
+        self.offset = 0
+        self.generation = None
+        self.lock = threading.RLock()
+
+@contextlib.contextmanager
+def _locked(path):
+    # Yields the lock file, which also holds the log's generation counter
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    with os.fdopen(fd, "r+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield lock_file
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+# --- Generation counter ---
+# Replacing the log (compaction, recompression, save_vector_data) bumps the
+# counter once before and once after, so it is odd while a rewrite is under way.
+# Readers compare it with the generation they last read: offsets into a replaced
+# file are meaningless. File identity (inode) is not enough, because successive
+# replacements can reuse the same inodes.
+GENERATION_WIDTH = 20
+
+def _read_generation(lock_file):
+    lock_file.seek(0)
+    return int(lock_file.read(GENERATION_WIDTH) or 0)
+
+def _generation(path):
+    # Lock-free read; None when it cannot be trusted (torn write, locked on Windows)
+    try:
+        with open(path + ".lock", "rb") as f:
+            return int(f.read(GENERATION_WIDTH) or 0)
+    except FileNotFoundError:
+        return 0
+    except (OSError, ValueError):
+        return None
+
+def _bump_generation(lock_file):
+    generation = _read_generation(lock_file) + 1
+    lock_file.seek(0)
+    lock_file.write(b"%0*d" % (GENERATION_WIDTH, generation))
+    lock_file.flush()
+    return generation
+
+@contextlib.contextmanager
+def _rewriting(lock_file):
+    _bump_generation(lock_file)
+    try:
+        yield
+    finally:
+        _bump_generation(lock_file)
+
+def _read_from(path, offset):
+    # Yields (entry, end_offset) for complete lines after offset
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            offset += len(line)
+            try:
+                yield json.loads(line), offset
+            except ValueError:
+                continue
+
+def iter_vector_entries(path=LOG_PATH):
+    for entry, _ in _read_from(path, 0):
+        yield entry
+
+def _read_new(vector_data, generation):
+    # Lines past what vector_data holds, or the whole file if it was replaced since
+    start = vector_data.offset if generation == vector_data.generation else 0
+    return list(_read_from(vector_data.path, start))
+
+def _apply(vector_data, generation, new):
+    if generation != vector_data.generation:
+        del vector_data[:]
+        vector_data.offset = 0
+        vector_data.generation = generation
+    for entry, offset in new:
+        vector_data.append(entry)
+        vector_data.offset = offset
+
+def _catch_up(vector_data, lock_file=None):
+    with vector_data.lock:
+        if lock_file is not None:
+            generation = _read_generation(lock_file)
+            _apply(vector_data, generation, _read_new(vector_data, generation))
+            return
+        # Without the lock the read only counts if no rewrite started or finished
+        # around it; otherwise read again under the lock
+        generation = _generation(vector_data.path)
+        if generation is not None and generation % 2 == 0:
+            new = _read_new(vector_data, generation)
+            if _generation(vector_data.path) == generation:
+                _apply(vector_data, generation, new)
+                return
+        with _locked(vector_data.path) as lock_file:
+            _catch_up(vector_data, lock_file)
+
+def _migrate_legacy(path, legacy_path):
+    if os.path.exists(path) or not os.path.exists(legacy_path):
+        return
+    with open(legacy_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    _write_atomic(path, entries)
+
+def _write_atomic(path, entries):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _truncate_torn_tail(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Walk back to the last newline and drop the partial line after it
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            cut = chunk.rfind(b"\n")
+            if cut != -1:
+                f.truncate(pos - step + cut + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+@metrics.timed("memory_load")
+def load_vector_data(path=LOG_PATH, vector_path=VECTOR_PATH, legacy_path=LEGACY_PATH):
+    if legacy_path and not os.path.exists(path) and os.path.exists(legacy_path):
+        with _locked(path):
+            _migrate_legacy(path, legacy_path)
+    vector_data = VectorLog(path, vector_path)
+    _catch_up(vector_data)
+    return vector_data
+
+def refresh_vector_data(vector_data):
+    # Reads only what other sessions appended since the last call
+    _catch_up(vector_data)
+    return vector_data
+
+def save_vector_data(data, path=LOG_PATH, vector_path=VECTOR_PATH):
+    with _locked(path) as lock_file, _rewriting(lock_file):
+        _write_atomic(path, data)
+        if os.path.exists(vector_path):
+            os.remove(vector_path)
+
+@metrics.timed("memory_append")
+def append_vector_entry(vector_data, new_entry, path=None, vector_path=None):
+    if not isinstance(vector_data, VectorLog):
+        vector_data = load_vector_data(path or LOG_PATH, vector_path or VECTOR_PATH)
+    new_entry = pack_entry(new_entry)
+    line = json.dumps(new_entry, ensure_ascii=False).encode("utf-8") + b"\n"
+    with vector_data.lock, _locked(vector_data.path) as lock_file:
+        _truncate_torn_tail(vector_data.path)
+        _catch_up(vector_data, lock_file)
+        _sync_vectors(vector_data)
+        with open(vector_data.path, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(vector_data.vector_path, "ab") as f:
+            f.write(embed_text(entry_text(new_entry)).tobytes())
+        vector_data.append(new_entry)
+        vector_data.offset += len(line)
+        if len(vector_data) % COMPACT_EVERY == 0:
+            _compact(vector_data, lock_file)
+
+def recompress_vector_log(path=LOG_PATH, vector_path=VECTOR_PATH, name=None):
+    # Rewrites every entry with the given codec; vectors are unchanged
+    vector_data = load_vector_data(path, vector_path, legacy_path=None)
+    with _locked(path) as lock_file:
+        _catch_up(vector_data, lock_file)
+        entries = []
+        for entry in vector_data:
+            plain = {k: v for k, v in entry.items() if k != "output_z"}
+            plain["output"] = entry_output(entry)
+            entries.append(pack_entry(plain, name))
+        with _rewriting(lock_file):
+            _write_atomic(path, entries)
+    return len(entries)
+
+def compact_vector_log(path=LOG_PATH, vector_path=VECTOR_PATH):
+    vector_data = load_vector_data(path, vector_path)
+    with _locked(path) as lock_file:
+        return _compact(vector_data, lock_file)
+
+@metrics.timed("memory_compact")
+def _compact(vector_data, lock_file):
+    # Caller holds the lock. Re-reads the log from the top, since the caller's
+    # list may be missing other processes' appends, keeps the last write per
+    # (title, timestamp), and rewrites log + vectors with rows re-used.
+    vector_data.generation = None
+    _catch_up(vector_data, lock_file)
+    before = len(vector_data)
+    _sync_vectors(vector_data)
+    latest = {}
+    for index, entry in enumerate(vector_data):
+        latest[(entry.get("title"), entry.get("timestamp"))] = index
+    keep = sorted(latest.values())
+    vectors = np.fromfile(vector_data.vector_path, dtype=np.float32).reshape(-1, EMBED_DIM)[keep]
+    entries = [vector_data[i] for i in keep]
+
+    tmp_vec = f"{vector_data.vector_path}.tmp{os.getpid()}"
+    with open(tmp_vec, "wb") as f:
+        f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    with _rewriting(lock_file):
+        _write_atomic(vector_data.path, entries)
+        os.replace(tmp_vec, vector_data.vector_path)
+
+    vector_data[:] = entries
+    vector_data.offset = os.path.getsize(vector_data.path)
+    vector_data.generation = _read_generation(lock_file)
+    return before - len(entries)
+
+# --- Embeddings (hashed word + character n-grams, deterministic and offline) ---
+def entry_text(entry):
+    return f"{entry.get('title', '')}\n{entry_output(entry)}"
+
+def _bucket(feature, dim):
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, 1.0 if (h >> 31) & 1 else -1.0
+
+def embed_text(text, dim=EMBED_DIM):
+    vec = np.zeros(dim, dtype=np.float32)
+    for word in _TOKEN_RE.findall(text.lower()):
+        index, sign = _bucket("w:" + word, dim)
+        vec[index] += sign
+        padded = f"#{word}#"
+        for i in range(max(len(padded) - NGRAM_SIZE + 1, 1)):
+            index, sign = _bucket("c:" + padded[i:i + NGRAM_SIZE], dim)
+            vec[index] += 0.5 * sign
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+def embed_texts(texts, dim=EMBED_DIM):
+    if not texts:
+        return np.zeros((0, dim), dtype=np.float32)
+    return np.stack([embed_text(text, dim) for text in texts])
+
+# --- Vector matrix (raw float32 rows, memory-mapped) ---
+def _vector_rows(vector_path, dim=EMBED_DIM):
+    size = os.path.getsize(vector_path) if os.path.exists(vector_path) else 0
+    return size // (dim * np.dtype(np.float32).itemsize)
+
+def _sync_vectors(vector_data, dim=EMBED_DIM):
+    # Rows are appended in log order, so only missing tail rows need embedding
+    rows = _vector_rows(vector_data.vector_path, dim)
+    if rows > len(vector_data):
+        with open(vector_data.vector_path, "rb+") as f:
+            f.truncate(len(vector_data) * dim * np.dtype(np.float32).itemsize)
+    elif rows < len(vector_data):
+        missing = embed_texts([entry_text(entry) for entry in vector_data[rows:]], dim)
+        with open(vector_data.vector_path, "ab") as f:
+            f.write(missing.tobytes())
+
+def load_vectors(vector_data, dim=EMBED_DIM):
+    if not isinstance(vector_data, VectorLog):
+        return embed_texts([entry_text(entry) for entry in vector_data], dim)
+    if vector_data.generation != _generation(vector_data.path):
+        _catch_up(vector_data)
+    if _vector_rows(vector_data.vector_path, dim) < len(vector_data):
+        with vector_data.lock, _locked(vector_data.path) as lock_file:
+            # Sync against the current log, never a stale list, so rows stay aligned
+            _catch_up(vector_data, lock_file)
+            _sync_vectors(vector_data, dim)
+    if not vector_data:
+        return np.zeros((0, dim), dtype=np.float32)
+    # Other sessions may have appended more rows; this list is a prefix of them
+    return np.memmap(vector_data.vector_path, dtype=np.float32, mode="r", shape=(len(vector_data), dim))
+
+def search_vectors_batch(queries, vectors, top_k=10, candidates=None):
+    # Returns one list of (row, score) per query, best first
+    if candidates is not None:
+        candidates = np.asarray(candidates, dtype=np.int64)
+        vectors = vectors[candidates]
+    if len(vectors) == 0 or not queries:
+        return [[] for _ in queries]
+    scores = embed_texts(queries, vectors.shape[1]) @ np.asarray(vectors).T
+    k = min(top_k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    results = []
+    for q, rows in enumerate(top):
+        rows = rows[np.argsort(-scores[q, rows])]
+        ids = candidates[rows] if candidates is not None else rows
+        results.append([(int(i), float(scores[q, r])) for i, r in zip(ids, rows)])
+    return results
+
+@metrics.timed("memory_search")
+def search_vector_entries(vector_data, query, top_k=10, candidates=None):
+    vectors = load_vectors(vector_data)
+    hits = search_vectors_batch([query], vectors, top_k, candidates)[0]
+    return [(vector_data[row], score) for row, score in hits]
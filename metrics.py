@@ -0,0 +1,204 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# Process-wide timing spans and counters. Spans feed a Prometheus-style histogram
+# (tcg_stage_seconds{stage=...}); counters cover token usage, cache hits and mail.
+# Exported as Prometheus text (prometheus_text / the optional metrics server) and,
+# when METRICS_LOG is set, as one JSON line per span. Nothing here imports streamlit.
+
+PREFIX = "tcg_"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_LOG = os.getenv("METRICS_LOG")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")  # "0.0.0.0" exposes the endpoint on every interface
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+HELP = {
+    "stage_seconds": "Time spent in each instrumented stage",
+    "stage_errors_total": "Stages that raised",
+    "llm_requests_total": "Chat completion requests",
+    "llm_tokens_total": "Tokens reported by completion responses",
+    "llm_routed_total": "Upstream-bound requests by routed model",
+    "llm_coalesced_total": "Requests served by an identical request already in flight",
+    "llm_hedged_total": "Slow requests that were sent a second time",
+    "llm_retries_total": "Failed requests that were retried",
+    "llm_timeouts_total": "Requests that hit LLM_TIMEOUT",
+    "response_cache_total": "Response cache lookups",
+    "mail_total": "Gmail sends by outcome",
+    "auth_calls_total": "Firebase Auth requests by operation",
+    "auth_refresh_failed_total": "Background token refreshes that failed",
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_log_lock = threading.Lock()
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"buckets": [0] * len(BUCKETS), "count": 0, "sum": 0.0}
+        hist["count"] += 1
+        hist["sum"] += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+    if METRICS_LOG:
+        _log_event({"ts": time.time(), "metric": name, "seconds": round(seconds, 6), **labels})
+
+def _log_event(event):
+    line = json.dumps(event, separators=(",", ":")) + "\n"
+    with _log_lock, open(METRICS_LOG, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+# --- Spans ---
+@contextlib.contextmanager
+def span(stage, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as exc:
+        # st.stop()/st.rerun() raise to unwind the script; those are not failures
+        if isinstance(exc, Exception) and type(exc).__module__.split(".")[0] != "streamlit":
+            inc("stage_errors_total", stage=stage, **labels)
+        raise
+    finally:
+        observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+def timed(stage, **labels):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def timed_iter(stage, iterable, **labels):
+    # For generators (streamed completions): time from first pull to exhaustion
+    with span(stage, **labels):
+        yield from iterable
+
+def record_usage(usage, model):
+    # usage is the completion response's usage object (or None for backends without it)
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            inc("llm_tokens_total", tokens, kind=kind, model=model)
+
+
+# --- Export ---
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: {"buckets": list(h["buckets"]), "count": h["count"], "sum": h["sum"]}
+                      for key, h in _histograms.items()}
+    return counters, histograms
+
+def prometheus_text():
+    counters, histograms = snapshot()
+    lines = []
+    for name in sorted({key[0] for key in counters}):
+        lines += [f"# HELP {PREFIX}{name} {HELP.get(name, name)}", f"# TYPE {PREFIX}{name} counter"]
+        lines += [f"{PREFIX}{name}{_labels(labels)} {value}"
+                  for (n, labels), value in sorted(counters.items()) if n == name]
+    for name in sorted({key[0] for key in histograms}):
+        lines += [f"# HELP {PREFIX}{name} {HELP.get(name, name)}", f"# TYPE {PREFIX}{name} histogram"]
+        for (n, labels), hist in sorted(histograms.items()):
+            if n != name:
+                continue
+            for bound, count in zip(BUCKETS, hist["buckets"]):
+                lines.append(f"{PREFIX}{name}_bucket{_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{PREFIX}{name}_bucket{_labels(labels, [('le', '+Inf')])} {hist['count']}")
+            lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {hist['sum']:.6f}")
+            lines.append(f"{PREFIX}{name}_count{_labels(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+def json_lines():
+    # Current totals, one JSON object per series
+    counters, histograms = snapshot()
+    rows = [{"metric": name, "type": "counter", **dict(labels), "value": value}
+            for (name, labels), value in sorted(counters.items())]
+    rows += [{"metric": name, "type": "histogram", **dict(labels), "count": h["count"], "sum": round(h["sum"], 6)}
+             for (name, labels), h in sorted(histograms.items())]
+    return "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def start_server(port, host=METRICS_HOST):
+    # /metrics serves Prometheus text, /metrics.jsonl the JSON-lines form
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = prometheus_text(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.jsonl":
+                body, content_type = json_lines(), "application/x-ndjson"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+# --- Per-rerun profiling ---
+def start_profile():
+    # Profiles the calling thread only; returns None if another profiler is active
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+def stop_profile(profiler, directory=PROFILE_DIR, label="rerun"):
+    # Writes <directory>/<label>-<time>.prof (open with snakeviz or pstats)
+    profiler.disable()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1_000_000:06d}.prof")
+    profiler.dump_stats(path)
+    return path
@@ -0,0 +1,774 @@
+import difflib
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+
+import codec
+
+PROJECTS_DIR = "saved_projects"
+DB_PATH = os.path.join(PROJECTS_DIR, "projects.db")
+AUTHORS_DIR = os.path.join(PROJECTS_DIR, "authors")
+LEGACY_IMPORT_DB = os.path.join(PROJECTS_DIR, "legacy_import.db")
+MAX_OPEN_STORES = 64  # author databases ProjectShards keeps open
+
+# Listing columns never include user_story/output/parsed; those live in project_bodies
+# and blobs, compressed with codec.py, so listings never decompress anything
+META_FIELDS = [
+    "title", "author", "author_email", "timestamp",
+    "test_type", "format_type", "framework", "style",
+    "expected_result", "severity", "category",
+]
+# Filled in on save by comparing the output with the previous version of the same title
+VERSION_FIELDS = {"content_hash": "TEXT", "prev_key": "TEXT", "lines_added": "INTEGER", "lines_removed": "INTEGER"}
+LIST_FIELDS = META_FIELDS + list(VERSION_FIELDS)
+
+# Columns added after the first release; databases created before them are upgraded on open
+ADDED_COLUMNS = {
+    "project_bodies": {"parsed": "TEXT", "output_blob": "INTEGER REFERENCES blobs(id)"},
+    "projects": VERSION_FIELDS,
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    {", ".join(f"{field} TEXT" for field in META_FIELDS)},
+    {", ".join(f"{name} {kind}" for name, kind in VERSION_FIELDS.items())}
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    id INTEGER PRIMARY KEY,
+    hash TEXT UNIQUE NOT NULL,
+    base_id INTEGER REFERENCES blobs(id),
+    data TEXT NOT NULL,
+    simhash INTEGER,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS project_bodies (
+    project_id INTEGER PRIMARY KEY REFERENCES projects(id) ON DELETE CASCADE,
+    user_story TEXT,
+    output TEXT,
+    parsed TEXT,
+    output_blob INTEGER REFERENCES blobs(id)
+);
+CREATE INDEX IF NOT EXISTS idx_projects_author_title_ts
+    ON projects (author_email, title, timestamp);
+CREATE INDEX IF NOT EXISTS idx_projects_author_ts
+    ON projects (author_email, timestamp);
+CREATE INDEX IF NOT EXISTS idx_projects_author_type_ts
+    ON projects (author_email, test_type, timestamp);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, project_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_project ON postings (project_id);
+CREATE TABLE IF NOT EXISTS doc_lengths (
+    project_id INTEGER PRIMARY KEY REFERENCES projects(id) ON DELETE CASCADE,
+    length INTEGER NOT NULL
+);
+"""
+
+# --- Keyword index (BM25 over title + story + output, updated on every save) ---
+_TOKEN_RE = re.compile(r"\w+")
+TITLE_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if 1 < len(t) <= 40]
+
+def index_terms(project_data):
+    terms = Counter(tokenize(project_data.get("user_story")) + tokenize(project_data.get("output")))
+    for term in tokenize(project_data.get("title")):
+        terms[term] += TITLE_WEIGHT
+    return terms
+
+
+# --- Output versions (content hash, SimHash, line deltas) ---
+# Outputs are stored once per distinct content in `blobs`. A new output whose
+# SimHash is within NEAR_DUPLICATE_BITS of a full-text version of the same title
+# is stored as a line delta against it; deltas only ever point at full texts, so
+# reading any version is at most one delta application.
+NEAR_DUPLICATE_BITS = 12
+DELTA_MAX_RATIO = 0.6
+SHINGLE_SIZE = 3
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+# Byte -> its 8 bits spread into 32-bit lanes, so adding spread digests counts the
+# set bits of every position at once (plain ints: no numpy import on the save path)
+_SPREAD = [sum(((byte >> bit) & 1) << (32 * bit) for bit in range(8)) for byte in range(256)]
+
+def simhash(text):
+    # 64-bit SimHash over word 3-shingles, as a signed integer so SQLite can store it
+    words = tokenize(text)
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(len(words) - SHINGLE_SIZE + 1, 1))}
+    lanes = [0] * 8
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        for i, byte in enumerate(reversed(digest)):
+            lanes[i] += _SPREAD[byte]
+    value = 0
+    for i, counts in enumerate(lanes):
+        for bit in range(8):
+            if ((counts >> (32 * bit)) & 0xFFFFFFFF) * 2 > len(shingles):
+                value |= 1 << (8 * i + bit)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def hamming(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+def line_delta(base, text):
+    # [[start, end], "literal line", ...]: copy base lines start:end, or insert the literal
+    base_lines = base.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, base_lines, lines, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        else:
+            ops.extend(lines[j1:j2])
+    return ops
+
+def apply_delta(base, ops):
+    base_lines = base.splitlines(keepends=True)
+    return "".join("".join(base_lines[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+def line_changes(before, after):
+    # (lines added, lines removed) going from one version to the next
+    matcher = difflib.SequenceMatcher(None, before.splitlines(), after.splitlines(), autojunk=False)
+    added = removed = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            added += j2 - j1
+            removed += i2 - i1
+    return added, removed
+
+
+def project_key(project_data):
+    # Same stem the JSON files used, so anchors and download names stay stable
+    return f"{project_data['title']}_{project_data['timestamp']}"
+
+
+class ProjectStore:
+    def __init__(self, path=DB_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._indexed = False
+        self._db = None
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            if self._missing_columns():
+                self._upgrade()
+
+    def _missing_columns(self):
+        missing = []
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            missing += [(table, name, kind) for name, kind in columns.items() if name not in existing]
+        return missing
+
+    def _upgrade(self):
+        # Caller holds the lock. BEGIN IMMEDIATE serialises processes opening the
+        # same old database; the columns are re-checked once the write lock is held
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table, name, kind in self._missing_columns():
+                try:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+                except sqlite3.OperationalError as exc:
+                    if "duplicate column" not in str(exc):
+                        raise
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    @property
+    def _conn(self):
+        # Callers hold the lock. A closed store (e.g. evicted by ProjectShards while
+        # a session still holds it) reconnects on next use instead of failing
+        if self._db is None:
+            # timeout doubles as busy_timeout for writers in other processes
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA foreign_keys=ON")
+        return self._db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # --- Writes ---
+    def save(self, project_data, key=None):
+        key = key or project_key(project_data)
+        meta = [project_data.get(field, "") for field in META_FIELDS]
+        parsed = project_data.get("parsed")
+        output = project_data.get("output") or ""
+        version = self._plan_version(key, project_data, output)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO projects (key, {', '.join(META_FIELDS)}) "
+                f"VALUES (?, {', '.join('?' for _ in META_FIELDS)}) "
+                f"ON CONFLICT(key) DO UPDATE SET "
+                f"{', '.join(f'{field} = excluded.{field}' for field in META_FIELDS)}",
+                [key] + meta,
+            )
+            project_id = self._conn.execute(
+                "SELECT id FROM projects WHERE key = ?", (key,)
+            ).fetchone()[0]
+            blob_id = self._store_version(project_id, key, project_data, output, version)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO project_bodies (project_id, user_story, output, parsed, output_blob) "
+                "VALUES (?, ?, NULL, ?, ?)",
+                (
+                    project_id, codec.encode(project_data.get("user_story", "")),
+                    codec.encode(json.dumps(parsed, separators=(",", ":"))) if parsed is not None else None, blob_id,
+                ),
+            )
+            self._index(project_id, project_data)
+        return key
+
+    def _previous_version(self, key, project_data):
+        # Caller holds the lock. Latest other version of the same title saved no later than this one
+        return self._conn.execute(
+            "SELECT p.key, p.content_hash, b.output, b.output_blob FROM projects p "
+            "JOIN project_bodies b ON b.project_id = p.id "
+            "WHERE p.author_email = ? AND p.title = ? AND p.key != ? AND p.timestamp <= ? "
+            "ORDER BY p.timestamp DESC, p.id DESC LIMIT 1",
+            (project_data.get("author_email", ""), project_data.get("title", ""), key,
+             project_data.get("timestamp", "")),
+        ).fetchone()
+
+    def _plan_version(self, key, project_data, output):
+        # Hashing, SimHash, the delta and the line diff are computed here, before
+        # the write transaction, so writers in other processes never wait on them.
+        # _store_version re-checks anything another writer may have changed since.
+        digest = content_hash(output)
+        with self._lock:
+            known = self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is not None
+            candidates = [] if known else self._conn.execute(
+                "SELECT DISTINCT bl.id, bl.simhash, bl.data FROM blobs bl "
+                "JOIN project_bodies b ON b.output_blob = bl.id JOIN projects p ON p.id = b.project_id "
+                "WHERE p.author_email = ? AND p.title = ? AND bl.base_id IS NULL AND bl.simhash IS NOT NULL",
+                (project_data.get("author_email", ""), project_data.get("title", "")),
+            ).fetchall()
+            previous = self._previous_version(key, project_data)
+            previous_text = None
+            if previous is not None and previous["content_hash"] != digest:
+                previous_text = self._output_text(previous)
+
+        version = {"digest": digest, "base_id": None, "data": output, "simhash": None,
+                   "prev_key": previous["key"] if previous else None, "changes": (None, None)}
+        if not known:
+            fingerprint = version["simhash"] = simhash(output)
+            nearest = min(candidates, key=lambda c: hamming(c["simhash"], fingerprint), default=None)
+            if nearest is not None and hamming(nearest["simhash"], fingerprint) <= NEAR_DUPLICATE_BITS:
+                delta = json.dumps(line_delta(codec.decode(nearest["data"]), output), separators=(",", ":"))
+                if len(delta) < DELTA_MAX_RATIO * len(output):
+                    version["base_id"], version["data"] = nearest["id"], delta
+        if previous is not None:
+            version["changes"] = (0, 0) if previous_text is None else line_changes(previous_text, output)
+        return version
+
+    def _store_version(self, project_id, key, project_data, output, version):
+        # Caller holds the lock and transaction. Returns the blob id for output and
+        # records how it differs from the previous version of the same title.
+        digest = version["digest"]
+        row = self._conn.execute("SELECT id FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is not None:
+            blob_id = row[0]
+        else:
+            base_id, data, fingerprint = version["base_id"], version["data"], version["simhash"]
+            if fingerprint is None:
+                # Planned as a known blob that has since disappeared
+                fingerprint = simhash(output)
+            if base_id is not None and self._conn.execute(
+                "SELECT 1 FROM blobs WHERE id = ? AND base_id IS NULL", (base_id,)
+            ).fetchone() is None:
+                base_id, data = None, output
+            blob_id = self._conn.execute(
+                "INSERT INTO blobs (hash, base_id, data, simhash, size) VALUES (?, ?, ?, ?, ?)",
+                (digest, base_id, codec.encode(data), fingerprint, len(output)),
+            ).lastrowid
+
+        previous = self._previous_version(key, project_data)
+        added, removed = None, None
+        if previous is not None:
+            if previous["content_hash"] == digest:
+                added = removed = 0
+            elif previous["key"] == version["prev_key"]:
+                added, removed = version["changes"]
+            else:
+                # Another writer saved a version of this title since _plan_version
+                added, removed = line_changes(self._output_text(previous), output)
+        self._conn.execute(
+            "UPDATE projects SET content_hash = ?, prev_key = ?, lines_added = ?, lines_removed = ? WHERE id = ?",
+            (digest, previous["key"] if previous else None, added, removed, project_id),
+        )
+        return blob_id
+
+    def _blob_text(self, blob_id):
+        row = self._conn.execute("SELECT base_id, data FROM blobs WHERE id = ?", (blob_id,)).fetchone()
+        if row is None:
+            return None
+        if row["base_id"] is None:
+            return codec.decode(row["data"])
+        base = self._conn.execute("SELECT data FROM blobs WHERE id = ?", (row["base_id"],)).fetchone()[0]
+        return apply_delta(codec.decode(base), json.loads(codec.decode(row["data"])))
+
+    def _output_text(self, row):
+        # row has output/output_blob from project_bodies; rows saved before blobs keep inline output
+        if row["output_blob"] is not None:
+            return self._blob_text(row["output_blob"])
+        return codec.decode(row["output"])
+
+    def _index(self, project_id, project_data):
+        # Caller holds the lock and transaction
+        terms = index_terms(project_data)
+        self._conn.execute("DELETE FROM postings WHERE project_id = ?", (project_id,))
+        self._conn.executemany(
+            "INSERT INTO postings (term, project_id, tf) VALUES (?, ?, ?)",
+            [(term, project_id, tf) for term, tf in terms.items()],
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO doc_lengths (project_id, length) VALUES (?, ?)",
+            (project_id, sum(terms.values())),
+        )
+
+    def _backfill_index(self):
+        # Projects saved before the keyword index existed are indexed on first search
+        if self._indexed:
+            return
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.id, p.title, b.user_story, b.output, b.output_blob FROM projects p "
+                "LEFT JOIN project_bodies b ON b.project_id = p.id "
+                "WHERE p.id NOT IN (SELECT project_id FROM doc_lengths)"
+            ).fetchall()
+            with self._conn:
+                for row in rows:
+                    self._index(row["id"], {
+                        **dict(row), "user_story": codec.decode(row["user_story"]), "output": self._output_text(row),
+                    })
+            self._indexed = True
+
+    # --- Reads (metadata only) ---
+    def count(self, author_email):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM projects WHERE author_email = ?", (author_email,)
+            ).fetchone()
+        return row[0]
+
+    def list_projects(self, author_email, limit=None, offset=0):
+        sql = (
+            f"SELECT key, {', '.join(LIST_FIELDS)} FROM projects "
+            "WHERE author_email = ? ORDER BY timestamp DESC, id DESC"
+        )
+        params = [author_email]
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def position(self, author_email, key):
+        # Zero-based index of key in list_projects order, for jumping to its page
+        with self._lock:
+            target = self._conn.execute(
+                "SELECT id, timestamp FROM projects WHERE key = ? AND author_email = ?", (key, author_email)
+            ).fetchone()
+            if target is None:
+                return None
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM projects WHERE author_email = ? "
+                "AND (timestamp > ? OR (timestamp = ? AND id > ?))",
+                (author_email, target["timestamp"], target["timestamp"], target["id"]),
+            ).fetchone()
+        return row[0]
+
+    def group_by_title(self, author_email):
+        groups = {}
+        for meta in self.list_projects(author_email):
+            groups.setdefault(meta["title"], []).append(meta)
+        return dict(sorted(groups.items()))
+
+    def facets(self, author_email):
+        # {"title": [(value, count), ...], "test_type": [...]}, served from the covering indexes
+        facets = {}
+        with self._lock:
+            for field in ("title", "test_type"):
+                facets[field] = [tuple(row) for row in self._conn.execute(
+                    f"SELECT {field}, COUNT(*) FROM projects WHERE author_email = ? AND {field} != '' "
+                    f"GROUP BY {field} ORDER BY {field}",
+                    (author_email,),
+                )]
+        return facets
+
+    # --- Search (keyword index + facets) ---
+    def search(self, author_email, query="", title="", test_type="", limit=10, offset=0):
+        # Returns (total_hits, page). With a query, hits are ranked by BM25 and the
+        # last word also matches as a prefix (search-as-you-type); without one,
+        # facet matches are listed newest first. Each hit is listing metadata + score.
+        where = "p.author_email = ?"
+        params = [author_email]
+        if title:
+            where += " AND p.title = ?"
+            params.append(title)
+        if test_type:
+            where += " AND p.test_type = ?"
+            params.append(test_type)
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            with self._lock:
+                total = self._conn.execute(f"SELECT COUNT(*) FROM projects p WHERE {where}", params).fetchone()[0]
+                rows = self._conn.execute(
+                    f"SELECT p.key, {', '.join('p.' + f for f in META_FIELDS)} FROM projects p WHERE {where} "
+                    "ORDER BY p.timestamp DESC, p.id DESC LIMIT ? OFFSET ?",
+                    params + [limit, offset],
+                ).fetchall()
+            return total, [dict(row, score=None) for row in rows]
+
+        self._backfill_index()
+        scores = {}
+        with self._lock:
+            docs, avg_length = self._conn.execute(
+                "SELECT COUNT(*), AVG(d.length) FROM doc_lengths d JOIN projects p ON p.id = d.project_id "
+                "WHERE p.author_email = ?",
+                (author_email,),
+            ).fetchone()
+            for n, term in enumerate(terms):
+                if n == len(terms) - 1:
+                    match, term_params = "po.term >= ? AND po.term < ?", [term, term + "\uffff"]
+                else:
+                    match, term_params = "po.term = ?", [term]
+                rows = self._conn.execute(
+                    f"SELECT po.project_id, SUM(po.tf), d.length FROM postings po "
+                    f"JOIN projects p ON p.id = po.project_id JOIN doc_lengths d ON d.project_id = po.project_id "
+                    f"WHERE {match} AND {where} GROUP BY po.project_id",
+                    term_params + params,
+                ).fetchall()
+                idf = math.log(1 + (docs - len(rows) + 0.5) / (len(rows) + 0.5))
+                for project_id, tf, length in rows:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (avg_length or 1))
+                    scores[project_id] = scores.get(project_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[offset:offset + limit]
+            if not ranked:
+                return len(scores), []
+            rows = self._conn.execute(
+                f"SELECT id, key, {', '.join(META_FIELDS)} FROM projects "
+                f"WHERE id IN ({', '.join('?' for _ in ranked)})",
+                [project_id for project_id, _ in ranked],
+            ).fetchall()
+        by_id = {row["id"]: row for row in rows}
+        page = []
+        for project_id, score in ranked:
+            hit = dict(by_id[project_id])
+            del hit["id"]
+            hit["score"] = score
+            page.append(hit)
+        return len(scores), page
+
+    # --- Reads (full record) ---
+    def get_project(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT p.key, {', '.join('p.' + f for f in LIST_FIELDS)}, b.user_story, b.output, b.output_blob, "
+                "b.parsed FROM projects p LEFT JOIN project_bodies b ON b.project_id = p.id WHERE p.key = ?",
+                (key,),
+            ).fetchone()
+            if not row:
+                return None
+            project = dict(row)
+            project["output"] = self._output_text(row)
+        del project["output_blob"]
+        project["user_story"] = codec.decode(project["user_story"])
+        project["parsed"] = json.loads(codec.decode(project["parsed"])) if project["parsed"] else None
+        return project
+
+    def get_output(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT b.output, b.output_blob FROM projects p JOIN project_bodies b ON b.project_id = p.id "
+                "WHERE p.key = ?",
+                (key,),
+            ).fetchone()
+            return self._output_text(row) if row else None
+
+    def version_info(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(VERSION_FIELDS)} FROM projects WHERE key = ?", (key,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    # --- Storage ---
+    def dedupe_bodies(self):
+        # Moves outputs stored inline (saved before blobs existed) into blobs, oldest first
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.id, p.key, p.title, p.author_email, p.timestamp, b.output FROM projects p "
+                "JOIN project_bodies b ON b.project_id = p.id WHERE b.output_blob IS NULL "
+                "ORDER BY p.timestamp, p.id"
+            ).fetchall()
+        for row in rows:
+            output = codec.decode(row["output"]) or ""
+            version = self._plan_version(row["key"], dict(row), output)
+            with self._lock, self._conn:
+                blob_id = self._store_version(row["id"], row["key"], dict(row), output, version)
+                self._conn.execute(
+                    "UPDATE project_bodies SET output = NULL, output_blob = ? WHERE project_id = ?",
+                    (blob_id, row["id"]),
+                )
+        return len(rows)
+
+    def recompress(self, name=None, vacuum=True):
+        # Re-encodes every stored body with the given codec ("none" stores plain text)
+        name = codec.resolve(name)
+        changed = 0
+        with self._lock:
+            with self._conn:
+                for table, id_column, columns in (
+                    ("blobs", "id", ["data"]),
+                    ("project_bodies", "project_id", ["user_story", "output", "parsed"]),
+                ):
+                    for row in self._conn.execute(f"SELECT {id_column}, {', '.join(columns)} FROM {table}").fetchall():
+                        values = [codec.encode(codec.decode(row[column]), name) for column in columns]
+                        if values != [row[column] for column in columns]:
+                            changed += 1
+                            self._conn.execute(
+                                f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in columns)} WHERE {id_column} = ?",
+                                values + [row[0]],
+                            )
+            if vacuum:
+                self._conn.execute("VACUUM")
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return changed
+
+    def storage_stats(self):
+        with self._lock:
+            versions, text_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(COALESCE(bl.size, LENGTH(b.output))), 0) FROM project_bodies b "
+                "LEFT JOIN blobs bl ON bl.id = b.output_blob"
+            ).fetchone()
+            blobs, deltas, stored_bytes = self._conn.execute(
+                "SELECT COUNT(*), COUNT(base_id), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+            ).fetchone()
+            inline_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(output)), 0) FROM project_bodies WHERE output_blob IS NULL"
+            ).fetchone()[0]
+        return {
+            "versions": versions, "blobs": blobs, "delta_blobs": deltas,
+            "output_bytes": text_bytes, "stored_bytes": stored_bytes + inline_bytes,
+            "file_bytes": sum(os.path.getsize(self.path + suffix) for suffix in ("", "-wal") if os.path.exists(self.path + suffix)),
+        }
+
+
+# --- Per-author shards ---
+# Each author gets saved_projects/authors/<shard>/ with their own projects.db and
+# vector memory, so listing or searching history only touches that author's data
+# and writers for different authors never contend for the same file.
+
+def author_shard(author_email):
+    email = (author_email or "").strip().lower()
+    slug = re.sub(r"[^a-z0-9]+", "_", email).strip("_")[:40] or "anonymous"
+    return f"{slug}_{hashlib.sha1(email.encode('utf-8')).hexdigest()[:10]}"
+
+
+class ProjectShards:
+    def __init__(self, root=AUTHORS_DIR, max_open=MAX_OPEN_STORES):
+        self.root = root
+        self.max_open = max_open
+        self._stores = OrderedDict()  # shard -> ProjectStore, least recently used first
+        self._memories = {}  # shard -> VectorLog, kept so later loads only read new lines
+        self._lock = threading.Lock()
+
+    def author_dir(self, author_email):
+        return os.path.join(self.root, author_shard(author_email))
+
+    def for_author(self, author_email):
+        shard = author_shard(author_email)
+        with self._lock:
+            store = self._stores.get(shard)
+            if store is None:
+                store = self._stores[shard] = ProjectStore(os.path.join(self.root, shard, "projects.db"))
+            self._stores.move_to_end(shard)
+            while len(self._stores) > self.max_open:
+                evicted, old = self._stores.popitem(last=False)
+                self._memories.pop(evicted, None)
+                old.close()
+        return store
+
+    def save(self, project_data, key=None):
+        return self.for_author(project_data.get("author_email", "")).save(project_data, key=key)
+
+    def existing_shards(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.exists(os.path.join(self.root, name, "projects.db")))
+
+    def dedupe(self):
+        # Converts inline outputs in every shard to deduplicated blobs; returns summed storage stats
+        totals = {}
+        for shard in self.existing_shards():
+            store = ProjectStore(os.path.join(self.root, shard, "projects.db"))
+            store.dedupe_bodies()
+            for name, value in store.storage_stats().items():
+                totals[name] = totals.get(name, 0) + value
+            store.close()
+        return totals
+
+    def recompress(self, name=None):
+        # Re-encodes every shard and its memory log; returns (bytes_before, bytes_after, memory_entries)
+        from memory import recompress_vector_log
+
+        before = after = entries = 0
+        for shard in self.existing_shards():
+            directory = os.path.join(self.root, shard)
+            store = ProjectStore(os.path.join(directory, "projects.db"))
+            before += store.storage_stats()["file_bytes"]
+            store.recompress(name)
+            after += store.storage_stats()["file_bytes"]
+            store.close()
+            log_path = os.path.join(directory, "vector_data.jsonl")
+            if os.path.exists(log_path):
+                entries += recompress_vector_log(log_path, os.path.join(directory, "vector_data.vec"), name)
+        return before, after, entries
+
+    def memory_paths(self, author_email):
+        directory = self.author_dir(author_email)
+        return os.path.join(directory, "vector_data.jsonl"), os.path.join(directory, "vector_data.vec")
+
+    def project_owners(self):
+        # key -> author_email for every project already in a shard
+        owners = {}
+        for shard in self.existing_shards():
+            store = ProjectStore(os.path.join(self.root, shard, "projects.db"))
+            with store._lock:
+                owners.update(store._conn.execute("SELECT key, author_email FROM projects").fetchall())
+            store.close()
+        return owners
+
+    def load_memory(self, author_email):
+        # The author's log, shared by every caller in this process and caught up
+        # with other processes' appends from where it last stopped
+        from memory import load_vector_data, refresh_vector_data
+
+        shard = author_shard(author_email)
+        with self._lock:
+            vector_data = self._memories.get(shard)
+        if vector_data is not None:
+            return refresh_vector_data(vector_data)
+        log_path, vector_path = self.memory_paths(author_email)
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        vector_data = load_vector_data(log_path, vector_path, legacy_path=None)
+        with self._lock:
+            return self._memories.setdefault(shard, vector_data)
+
+    # --- Migration from the shared layout ---
+    def migrate_legacy(self, directory=PROJECTS_DIR, legacy_memory="vector_data.jsonl", legacy_json="vector_data.json"):
+        # Routes saved_projects/*.json, a shared projects.db and shared vector
+        # memory (vector_data.json or its log) into author shards. JSON files are
+        # recorded once imported, so later runs only parse files that are new.
+        imported = 0
+
+        os.makedirs(directory, exist_ok=True)  # a fresh checkout has no saved_projects/ yet
+        import_log = sqlite3.connect(os.path.join(directory, os.path.basename(LEGACY_IMPORT_DB)), timeout=30)
+        with import_log:
+            import_log.execute("CREATE TABLE IF NOT EXISTS imported (filename TEXT PRIMARY KEY)")
+        done = {row[0] for row in import_log.execute("SELECT filename FROM imported")}
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".json") or filename in done:
+                continue
+            try:
+                with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if isinstance(data, dict) and "title" in data and "timestamp" in data:
+                key = filename[: -len(".json")]
+                self.save(data, key=key)
+                imported += 1
+            with import_log:
+                import_log.execute("INSERT OR IGNORE INTO imported (filename) VALUES (?)", (filename,))
+
+        shared_db = os.path.join(directory, os.path.basename(DB_PATH))
+        if os.path.exists(shared_db):
+            shared = ProjectStore(shared_db)
+            with shared._lock:
+                keys = [row[0] for row in shared._conn.execute("SELECT key FROM projects")]
+            for key in keys:
+                data = shared.get_project(key)
+                self.save(data, key=key)
+                imported += 1
+            shared.close()
+            try:
+                os.replace(shared_db, shared_db + ".migrated")
+            except FileNotFoundError:
+                pass  # another process finished the same (idempotent) migration
+
+        # Entries left unmatched can only find an owner among projects imported
+        # later, so the memory pass runs once and then only after new imports
+        marker = f"memory:{os.path.abspath(legacy_memory)}" if legacy_memory else None
+        if marker and (imported or marker not in done) and (
+                os.path.exists(legacy_memory) or legacy_json and os.path.exists(legacy_json)):
+            self._migrate_memory(legacy_memory, legacy_json)
+            with import_log:
+                import_log.execute("INSERT OR IGNORE INTO imported (filename) VALUES (?)", (marker,))
+        import_log.close()
+        return imported
+
+    def _migrate_memory(self, legacy_memory, legacy_json):
+        # Shared memory entries have no author; match them by key to projects in
+        # any shard, including ones imported by earlier runs. Unmatched entries
+        # stay in the shared log for a later run.
+        from memory import append_vector_entry, load_vector_data, save_vector_data
+
+        vector_path = os.path.splitext(legacy_memory)[0] + ".vec"
+        entries = load_vector_data(legacy_memory, vector_path, legacy_path=legacy_json)
+        if not entries:
+            return
+        owners = self.project_owners()
+        unmatched = []
+        shards = {}
+        for entry in entries:
+            owner = owners.get(f"{entry.get('title')}_{entry.get('timestamp')}")
+            if owner is None:
+                unmatched.append(entry)
+                continue
+            if owner not in shards:
+                shards[owner] = self.load_memory(owner)
+            append_vector_entry(shards[owner], {**entry, "author_email": owner})
+        if shards:
+            save_vector_data(unmatched, legacy_memory, vector_path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else PROJECTS_DIR
+    shards = ProjectShards(os.path.join(directory, "authors"))
+    print(f"Imported {shards.migrate_legacy(directory)} project(s) into {shards.root}")
+    stats = shards.dedupe()
+    if stats:
+        print(f"{stats['versions']} version(s) in {stats['blobs']} distinct output(s), {stats['delta_blobs']} stored as deltas: "
+              f"{stats['stored_bytes']:,} of {stats['output_bytes']:,} bytes")
@@ -1,67 +1,178 @@
-from playwright.sync_api import sync_playwright
+import functools
+import math
 
-def get_prompt(user_story, test_type, format_type, expected_result="", severity="", category="", framework="", style=""):
-    instructions = "You are a senior QA engineer. Based on the user story below, generate "
+# Prompts are compiled once per (variant, test_type, format_type, framework, style).
+# Everything that depends only on those options is rendered into a static prefix;
+# the story text and its optional fields are appended after it. Requests for the
+# same options then share an identical leading prompt, which providers with prompt
+# caching can reuse, and the prefix's token count is known before a story is added.
+
+PROMPT_VERSION = "2"  # bump when template wording changes; part of the response cache key
+
+BDD = "BDD (Gherkin)"
+MANUAL = "Manual Only"
+
+FRAMEWORK_NOTES = {
+    ("Robot Framework", True): (
+        "- Use *** Settings *** and *** Test Cases *** sections.\n"
+        "- Format each test case with Given / When / Then keywords.\n"
+        "- Use keywords like 'Input Text', 'Click Button', and 'Element Should Be Visible'.\n"
+        "- Include setup and teardown if necessary.\n"
+    ),
+    ("Cypress", True): (
+        "- Use Cucumber-style syntax.\n"
+        "- Provide both .feature file and step definitions in JavaScript.\n"
+        "- Step definitions should use Cypress commands like cy.visit, cy.get, cy.type, etc.\n"
+    ),
+    ("Playwright", False): (
+        "- Use Playwright's sync Python API.\n"
+        "- Implement setup, actions, and assertions.\n"
+        "- Each test function should correspond to one scenario.\n"
+    ),
+}
+
+
+# --- Token counting ---
+@functools.lru_cache(maxsize=8)
+def _encoding(model):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    # Exact with tiktoken installed, otherwise ~4 characters per token
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+# --- Compiled templates ---
+class PromptTemplate:
+    def __init__(self, prefix, story_open, story_close, fields, suffix=""):
+        self.prefix = prefix
+        self.story_open = story_open
+        self.story_close = story_close
+        self.fields = fields  # [(story field, text before the value, text after it)]
+        self.suffix = suffix
+        self._prefix_tokens = {}
+
+    def dynamic(self, story):
+        parts = [self.story_open, story.get("user_story", ""), self.story_close]
+        for field, before, after in self.fields:
+            if story.get(field):
+                parts += [before, story[field], after]
+        parts.append(self.suffix)
+        return "".join(parts)
+
+    def render(self, story):
+        return self.prefix + self.dynamic(story)
+
+    def prefix_tokens(self, model="gpt-3.5-turbo"):
+        if model not in self._prefix_tokens:
+            self._prefix_tokens[model] = count_tokens(self.prefix, model)
+        return self._prefix_tokens[model]
+
+    def tokens(self, story, model="gpt-3.5-turbo"):
+        # Prefix count is cached; only the story part is counted per call
+        return self.prefix_tokens(model) + count_tokens(self.dynamic(story), model)
+
+
+def _compile_simple(test_type, format_type, framework, style):
+    prefix = f"""You are an expert software tester.
+
+Generate {test_type.lower()} test cases for the feature below.
 
-    if format_type == "Manual Only":
+Output Format:
+{format_type}
+"""
+    if format_type != MANUAL:
+        prefix += f"""
+Preferred Automation Framework:
+{framework}
+
+Preferred Automation Style:
+{style}
+"""
+    prefix += """
+Respond with clearly labeled sections.
+If format is 'Manual Only', do not include any code.
+If automation is included, use code blocks with appropriate labels.
+"""
+    fields = [
+        ("expected_result", "\nExpected Result:\n", "\n"),
+        ("severity", "\nSeverity: ", "\n"),
+        ("category", "\nCategory: ", "\n"),
+    ]
+    return PromptTemplate(prefix, "\nFeature/User Story:\n", "\n", fields)
+
+def _compile_detailed(test_type, format_type, framework, style):
+    instructions = "You are a senior QA engineer. Based on the user story below, generate "
+    if format_type == MANUAL:
         instructions += "manual test cases"
     elif format_type == "Automation Only":
         instructions += f"automation test scripts using {framework}"
-    elif format_type == "Both":
+    else:
         instructions += f"manual test cases and automation test scripts using {framework}"
-
-    if test_type == "BDD (Gherkin)":
+    if test_type == BDD:
         instructions += " in BDD style"
 
-    instructions += ".\n\n"
-
     style_instructions = ""
-    if format_type != "Manual Only" and style:
-        style_instructions += f"Use the {style} testing approach in the automation code.\n"
-
-    extras = ""
-    if expected_result:
-        extras += f"Expected Result: {expected_result}\n"
-    if severity:
-        extras += f"Severity: {severity}\n"
-    if category:
-        extras += f"Test Category: {category}\n"
-
-    framework_notes = ""
-    if framework == "Robot Framework" and test_type == "BDD (Gherkin)":
-        framework_notes += (
-            "- Use *** Settings *** and *** Test Cases *** sections.\n"
-            "- Format each test case with Given / When / Then keywords.\n"
-            "- Use keywords like 'Input Text', 'Click Button', and 'Element Should Be Visible'.\n"
-            "- Include setup and teardown if necessary.\n"
-        )
-    elif framework == "Cypress" and test_type == "BDD (Gherkin)":
-        framework_notes += (
-            "- Use Cucumber-style syntax.\n"
-            "- Provide both .feature file and step definitions in JavaScript.\n"
-            "- Step definitions should use Cypress commands like cy.visit, cy.get, cy.type, etc.\n"
-        )
-    elif framework == "Playwright" and format_type != "Manual Only":
-        framework_notes += (
-            "- Use Playwright's sync Python API.\n"
-            "- Implement setup, actions, and assertions.\n"
-            "- Each test function should correspond to one scenario.\n"
-        )
-
-    return f"""{instructions}
-User Story:
-\"\"\"
-{user_story}
-\"\"\"
-
-{extras}{style_instructions}
-Instructions:
+    if format_type != MANUAL and style:
+        style_instructions = f"Use the {style} testing approach in the automation code.\n"
+    framework_notes = FRAMEWORK_NOTES.get((framework, True), "") if test_type == BDD else ""
+    if format_type != MANUAL:
+        framework_notes = framework_notes or FRAMEWORK_NOTES.get((framework, False), "")
+
+    prefix = f"""{instructions}.
+
+{style_instructions}Instructions:
 - Number all manual test cases.
 - For automation, include clean, working code for at least 2 key test cases.
 - For BDD, follow Given-When-Then format.
 - Use best practices for the selected framework.
 {framework_notes}
 """
+    fields = [
+        ("expected_result", "Expected Result: ", "\n"),
+        ("severity", "Severity: ", "\n"),
+        ("category", "Test Category: ", "\n"),
+    ]
+    return PromptTemplate(prefix, 'User Story:\n"""\n', '\n"""\n\n', fields)
+
+VARIANTS = {
+    "simple": _compile_simple,
+    "detailed": _compile_detailed,
+}
+
+
+@functools.lru_cache(maxsize=256)
+def compile_prompt(variant, test_type, format_type, framework="", style=""):
+    if format_type == MANUAL:
+        # Framework and style only shape automation output; share one template
+        framework = style = ""
+    return VARIANTS[variant](test_type, format_type, framework, style)
+
+def template_for(story, variant="simple"):
+    return compile_prompt(
+        variant, story.get("test_type", "Functional"), story.get("format_type", MANUAL),
+        story.get("framework", ""), story.get("style", ""),
+    )
+
+
+# --- Call-style wrappers ---
+def get_simple_prompt(user_story, test_type, format_type, expected_result="", severity="", category="", framework="", style=""):
+    story = {"user_story": user_story, "expected_result": expected_result, "severity": severity, "category": category}
+    return compile_prompt("simple", test_type, format_type, framework, style).render(story)
+
+def get_prompt(user_story, test_type, format_type, expected_result="", severity="", category="", framework="", style=""):
+    story = {"user_story": user_story, "expected_result": expected_result, "severity": severity, "category": category}
+    return compile_prompt("detailed", test_type, format_type, framework, style).render(story)
 
 def build_playwright_python_prompt(description, style="default", test_data=None, metadata=None):
     return f"""
@@ -0,0 +1,251 @@
+import re
+from dataclasses import dataclass, field
+
+# Structured form of the LLM markdown. Parsed once when a project is saved and
+# stored next to `output`, so exports and rendering never re-scan the raw text.
+
+FRAMEWORK_BY_LANG = {
+    "robotframework": "Robot Framework",
+    "robot": "Robot Framework",
+    "gherkin": "Cucumber",
+    "feature": "Cucumber",
+    "cucumber": "Cucumber",
+}
+
+_HEADER_RE = re.compile(
+    r"^\s*(?:#{1,6}\s*)?(?:\*\*)?\s*(?:test\s*case|tc)\s*(?:id\s*)?[#:]?\s*(?:\*\*)?\s*"
+    r"(?P<id>[A-Za-z_-]*\d+)\s*(?:\*\*)?\s*[:.)\-–]?\s*(?:\*\*)?\s*(?P<title>.*?)\s*(?:\*\*)?\s*$",
+    re.IGNORECASE,
+)
+_NUMBERED_RE = re.compile(r"^(?:#{1,6}\s*)?(?:\*\*)?(?P<id>\d+)[.)]\s+(?P<title>.+?)(?:\*\*)?\s*$")
+_ITEM_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+(?P<text>.+)$")
+_LABEL_RE = re.compile(
+    r"^\s*(?:[-*]\s*)?(?:\*\*)?(?P<label>test steps|steps?|expected results?|expected outcome|preconditions?|title)"
+    r"\s*(?:\*\*)?\s*:\s*(?:\*\*)?\s*(?P<rest>.*)$",
+    re.IGNORECASE,
+)
+_GHERKIN_SCENARIO_RE = re.compile(r"^\s*Scenario(?: Outline)?:\s*(?P<title>.+)$")
+_GHERKIN_STEP_RE = re.compile(r"^\s*(?P<kw>Given|When|Then|And|But)\s+(?P<text>.+)$")
+
+
+@dataclass(slots=True)
+class CodeBlock:
+    language: str
+    framework: str
+    code: str
+
+    def to_dict(self):
+        return {"language": self.language, "framework": self.framework, "code": self.code}
+
+
+@dataclass(slots=True)
+class TestCase:
+    id: str
+    title: str
+    preconditions: list = field(default_factory=list)
+    steps: list = field(default_factory=list)
+    expected_results: list = field(default_factory=list)
+    code_blocks: list = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "preconditions": self.preconditions,
+            "steps": self.steps,
+            "expected_results": self.expected_results,
+            "code_blocks": self.code_blocks,
+        }
+
+
+@dataclass(slots=True)
+class ParsedOutput:
+    test_cases: list = field(default_factory=list)
+    code_blocks: list = field(default_factory=list)
+
+    def to_dict(self):
+        # Test cases reference code blocks by index to avoid storing code twice
+        return {
+            "test_cases": [tc.to_dict() for tc in self.test_cases],
+            "code_blocks": [block.to_dict() for block in self.code_blocks],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            test_cases=[TestCase(**tc) for tc in data.get("test_cases", [])],
+            code_blocks=[CodeBlock(**block) for block in data.get("code_blocks", [])],
+        )
+
+
+def detect_framework(language, code, default=""):
+    language = (language or "").lower()
+    if language in FRAMEWORK_BY_LANG:
+        return FRAMEWORK_BY_LANG[language]
+    if "cy." in code:
+        return "Cypress"
+    if "playwright" in code or "page.goto" in code:
+        return "Playwright"
+    if "*** Test Cases ***" in code or "*** Settings ***" in code:
+        return "Robot Framework"
+    if _GHERKIN_SCENARIO_RE.search(code):
+        return "Cucumber"
+    return default
+
+
+class TestCaseParser:
+    # Single pass, line at a time; feed() accepts arbitrary stream chunks.
+    def __init__(self, default_framework=""):
+        self.default_framework = default_framework
+        self.result = ParsedOutput()
+        self._pending = ""
+        self._current = None
+        self._section = None
+        self._section_numbers = 0
+        self._explicit_headers = False
+        self._code_lang = None
+        self._code_lines = None
+
+    def feed(self, chunk):
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._line(line)
+
+    def close(self):
+        if self._pending:
+            self._line(self._pending)
+            self._pending = ""
+        if self._code_lines is not None:
+            self._finish_code()
+        return self.result
+
+    # --- Line handling ---
+    def _line(self, line):
+        fence = line.strip()
+        if self._code_lines is not None:
+            if fence == "```":
+                self._finish_code()
+            else:
+                self._code_lines.append(line)
+            return
+        if fence.startswith("```"):
+            lang = fence[3:].split()
+            self._code_lang = lang[0] if lang else "text"
+            self._code_lines = []
+            return
+        if not fence:
+            return
+
+        header = _HEADER_RE.match(line)
+        if header:
+            self._explicit_headers = True
+            current = self._current
+            if current is not None and not (current.title or current.steps or current.expected_results or current.code_blocks):
+                # "### Test Case 1" followed by "**Test Case ID:** TC_001" is one case
+                current.id, current.title = header.group("id"), header.group("title").strip("*: ")
+                return
+            self._start(header.group("id"), header.group("title"))
+            return
+        numbered = _NUMBERED_RE.match(line)
+        if numbered and not self._explicit_headers:
+            # Unindented "N." lines are test cases unless they continue the
+            # numbering of a steps/expected list that is currently open
+            if self._section and int(numbered.group("id")) == self._section_numbers + 1:
+                self._section_numbers += 1
+                getattr(self._current, self._section).append(numbered.group("title").strip())
+            else:
+                self._start(numbered.group("id"), numbered.group("title"))
+            return
+
+        label = _LABEL_RE.match(line)
+        if label and self._current is not None:
+            name = label.group("label").lower()
+            self._section_numbers = 0
+            if name == "title":
+                self._current.title = label.group("rest").strip("* ") or self._current.title
+                self._section = None
+                return
+            if name.startswith("expected"):
+                self._section = "expected_results"
+            elif name.startswith("precondition"):
+                self._section = "preconditions"
+            else:
+                self._section = "steps"
+            if label.group("rest"):
+                getattr(self._current, self._section).append(label.group("rest").strip("* "))
+            return
+
+        if self._current is None:
+            return
+        item = _ITEM_RE.match(line)
+        text = (item.group("text") if item else fence).strip()
+        if item and self._section is None:
+            self._section = "steps"
+        if self._section:
+            getattr(self._current, self._section).append(text)
+
+    def _start(self, case_id, title):
+        self._current = TestCase(id=str(case_id or len(self.result.test_cases) + 1), title=title.strip("*: "))
+        self._section = None
+        self._section_numbers = 0
+        self.result.test_cases.append(self._current)
+
+    def _finish_code(self):
+        code = "\n".join(self._code_lines).strip("\n")
+        block = CodeBlock(self._code_lang, detect_framework(self._code_lang, code, self.default_framework), code)
+        self.result.code_blocks.append(block)
+        index = len(self.result.code_blocks) - 1
+        if self._current is not None:
+            self._current.code_blocks.append(index)
+        elif not self._explicit_headers:
+            self._cases_from_code(block, index)
+        self._code_lang = self._code_lines = None
+
+    def _cases_from_code(self, block, index):
+        # Automation-only output has no manual headers; derive cases from the code
+        case = None
+        in_robot_cases = False
+        for line in block.code.split("\n"):
+            scenario = _GHERKIN_SCENARIO_RE.match(line)
+            if scenario:
+                case = TestCase(id=str(len(self.result.test_cases) + 1), title=scenario.group("title").strip())
+                case.code_blocks.append(index)
+                self.result.test_cases.append(case)
+                continue
+            step = _GHERKIN_STEP_RE.match(line)
+            if step and case is not None:
+                target = case.expected_results if step.group("kw") == "Then" else case.steps
+                target.append(f"{step.group('kw')} {step.group('text').strip()}")
+                continue
+            if line.startswith("***"):
+                in_robot_cases = "test case" in line.lower()
+                continue
+            if in_robot_cases and line.strip():
+                if not line[0].isspace():
+                    case = TestCase(id=str(len(self.result.test_cases) + 1), title=line.strip())
+                    case.code_blocks.append(index)
+                    self.result.test_cases.append(case)
+                elif case is not None and not line.strip().startswith("["):
+                    case.steps.append(" ".join(line.split()))
+
+
+def parse_output(output, default_framework=""):
+    parser = TestCaseParser(default_framework)
+    parser.feed(output)
+    return parser.close()
+
+
+CSV_HEADER = ["ID", "Title", "Preconditions", "Steps", "Expected Result", "Framework"]
+
+def csv_rows(parsed):
+    for tc in parsed.test_cases:
+        frameworks = sorted({parsed.code_blocks[i].framework for i in tc.code_blocks if parsed.code_blocks[i].framework})
+        yield [
+            tc.id,
+            tc.title,
+            "\n".join(tc.preconditions),
+            "\n".join(f"{n}. {step}" for n, step in enumerate(tc.steps, start=1)),
+            "\n".join(tc.expected_results),
+            ", ".join(frameworks),
+        ]
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from benchmarks.fake_auth import FakeAuthBackend, start_server
+from firebase_auth import AuthError, AuthSessions, RestAuth
+
+# AuthSessions over RestAuth against the emulator stand-in, with ID tokens that
+# live a few seconds so refresh and expiry happen within a test.
+
+
+@pytest.fixture
+def emulator():
+    def start(token_lifetime=3600, **options):
+        backend = FakeAuthBackend(token_lifetime)
+        server, host = start_server(backend)
+        sessions = AuthSessions(RestAuth("emulator", host), **options)
+        sessions.sign_up("qa@example.com", "secret-password")
+        started.append((server, sessions))
+        return backend, sessions
+
+    started = []
+    yield start
+    for server, sessions in started:
+        sessions.close()
+        server.shutdown()
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_sign_in_returns_a_live_session(emulator):
+    backend, sessions = emulator()
+    user = sessions.sign_in("qa@example.com", "secret-password")
+    assert user["email"] == "qa@example.com"
+    assert user["idToken"] and user["refreshToken"]
+    assert 3500 < user["expiresAt"] - time.time() <= 3600
+    assert backend.calls["signInWithPassword"] == 1
+    assert backend.calls["lookup"] == 1
+    with pytest.raises(AuthError):
+        sessions.sign_in("qa@example.com", "wrong-password")
+
+
+def test_current_makes_no_network_calls(emulator):
+    backend, sessions = emulator()
+    user = sessions.sign_in("qa@example.com", "secret-password")
+    before = backend.total_calls()
+    for _ in range(100):
+        assert sessions.current(user) is user
+        sessions.verify(user["idToken"])
+    assert backend.total_calls() == before
+
+
+def test_tokens_are_refreshed_in_the_background(emulator):
+    backend, sessions = emulator(token_lifetime=3, refresh_margin=2.5, poll=0.05)
+    user = sessions.sign_in("qa@example.com", "secret-password")
+    first_token, first_expiry = user["idToken"], user["expiresAt"]
+    assert _wait_for(lambda: user["idToken"] != first_token)
+    assert backend.calls["token"] >= 1
+    # Past the first token's lifetime the session is still valid
+    time.sleep(max(0, first_expiry - time.time()) + 0.1)
+    assert sessions.current(user) is user
+
+
+def test_failed_refresh_lets_the_session_expire(emulator):
+    backend, sessions = emulator(token_lifetime=1, refresh_margin=0.9, poll=0.05)
+    user = sessions.sign_in("qa@example.com", "secret-password")
+    backend.refresh_tokens.clear()  # revoked
+    assert sessions.current(user) is user
+    assert _wait_for(lambda: sessions.current(user) is None)
+    assert backend.calls["token"] >= 1
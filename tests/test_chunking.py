@@ -0,0 +1,66 @@
+from chunking import merge_outputs
+from testcases import parse_output
+
+
+def _case(number, title, steps, expected="It works"):
+    return (f"### Test Case {number}: {title}\n**Steps:**\n"
+            + "".join(f"{n}. {step}\n" for n, step in enumerate(steps, start=1))
+            + f"**Expected Result:** {expected}\n")
+
+
+def _gherkin(*scenarios):
+    body = "".join(f"  Scenario: {title}\n    Given {given}\n    Then {then}\n" for title, given, then in scenarios)
+    return f"```gherkin\nFeature: Login\n{body}```\n"
+
+
+def test_parts_are_renumbered_in_order():
+    first = _case(1, "Valid login", ["Open login", "Sign in"]) + _case(2, "Logout", ["Open menu", "Log out"])
+    second = _case(1, "Reset password", ["Open reset", "Submit email"])
+    merged, duplicates = merge_outputs([first, second])
+    parsed = parse_output(merged)
+    assert duplicates == 0
+    assert [(tc.id, tc.title) for tc in parsed.test_cases] == [("1", "Valid login"), ("2", "Logout"), ("3", "Reset password")]
+    assert parsed.test_cases[2].steps == ["Open reset", "Submit email"]
+
+
+def test_repeated_cases_are_dropped():
+    first = _case(1, "Valid login", ["Open login", "Sign in"])
+    second = (_case(1, "Valid Login!", ["open login", "sign in"])            # same title and steps, other casing
+              + _case(2, "Sign in with valid account", ["Open login", "Sign in"])  # same steps, other title
+              + _case(3, "Valid login", ["Open login", "Use SSO"])           # same title, different steps: kept
+              + _case(4, "Locked account", ["Lock account", "Sign in"]))
+    merged, duplicates = merge_outputs([first, second])
+    assert duplicates == 2
+    assert [(tc.title, tc.steps) for tc in parse_output(merged).test_cases] == [
+        ("Valid login", ["Open login", "Sign in"]),
+        ("Valid login", ["Open login", "Use SSO"]),
+        ("Locked account", ["Lock account", "Sign in"]),
+    ]
+
+
+def test_code_only_outputs_merge_by_scenario():
+    first = _gherkin(("Valid login", "I am on the login page", "I see the dashboard"),
+                     ("Wrong password", "I enter a wrong password", "I see an error"))
+    second = _gherkin(("Wrong password", "I enter a wrong password", "I see an error"),
+                      ("Locked account", "my account is locked", "I see a lockout message"))
+    merged, duplicates = merge_outputs([first, second])
+    parsed = parse_output(merged)
+    assert duplicates == 1
+    assert [tc.title for tc in parsed.test_cases] == ["Valid login", "Wrong password", "Locked account"]
+    # Each part's code is kept once, next to the first case it produced
+    assert len(parsed.code_blocks) == 2
+    assert [tc.code_blocks for tc in parsed.test_cases] == [[0], [], [1]]
+    assert all(block.framework == "Cucumber" for block in parsed.code_blocks)
+
+
+def test_shared_code_block_is_kept_once():
+    code = "```python\ndef test_login(page):\n    page.goto('/login')\n```\n"
+    first = _case(1, "Valid login", ["Open login"]) + code
+    second = _case(1, "Logout", ["Log out"]) + code
+    parsed = parse_output(merge_outputs([first, second])[0])
+    assert len(parsed.code_blocks) == 1
+
+
+def test_free_form_parts_are_kept_verbatim():
+    merged, duplicates = merge_outputs(["Check the login page loads.\n", "  Check logout works."])
+    assert (merged, duplicates) == ("Check the login page loads.\n\nCheck logout works.", 0)
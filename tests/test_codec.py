@@ -0,0 +1,51 @@
+import pytest
+
+import codec
+
+TEXT = "### Test Case 1: Valid login\n**Steps:**\n1. Open the login page\n" * 20
+
+
+def test_gzip_round_trip_with_header():
+    value = codec.encode(TEXT, "gzip")
+    assert value.startswith(b"TC1g") and len(value) < len(TEXT)
+    assert codec.codec_of(value) == "gzip"
+    assert codec.decode(value) == TEXT
+    assert codec.decode(memoryview(value)) == TEXT  # as sqlite3 may hand it back
+
+
+def test_zstd_round_trip_with_header():
+    pytest.importorskip("zstandard")
+    value = codec.encode(TEXT, "zstd")
+    assert value.startswith(b"TC1z") and codec.codec_of(value) == "zstd"
+    assert codec.decode(value) == TEXT
+
+
+def test_zstd_falls_back_to_gzip_without_the_package(monkeypatch):
+    monkeypatch.setattr(codec, "_zstd", lambda: None)
+    assert codec.resolve("zstd") == "gzip"
+    assert codec.codec_of(codec.encode(TEXT, "zstd")) == "gzip"
+    with pytest.raises(RuntimeError):
+        codec.decode(b"TC1z" + b"\x28\xb5\x2f\xfd")
+
+
+def test_legacy_and_plain_values_are_read_as_is():
+    assert codec.decode(TEXT) == TEXT                      # rows stored as TEXT before compression
+    assert codec.decode(TEXT.encode("utf-8")) == TEXT      # or as a BLOB without a header
+    assert codec.decode(None) is None
+    assert codec.codec_of(TEXT) == codec.codec_of(TEXT.encode("utf-8")) == "none"
+    assert codec.encode(TEXT, "none") == TEXT
+    assert codec.encode("short", "gzip") == "short"        # below MIN_SIZE the header costs more than it saves
+
+
+def test_unknown_codecs_are_rejected():
+    with pytest.raises(ValueError):
+        codec.resolve("lz4")
+    with pytest.raises(ValueError):
+        codec.decode(b"TC1q" + b"payload")
+
+
+def test_text_form_for_json_records():
+    packed = codec.encode_text(TEXT, "gzip")
+    assert isinstance(packed, str)
+    assert codec.decode_text(packed) == TEXT
+    assert codec.encode_text("short", "gzip") is None  # caller keeps the plain field
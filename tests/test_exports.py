@@ -0,0 +1,98 @@
+import csv
+import io
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+
+import pytest
+
+import exports
+
+OUTPUT = """### Test Case 1: Valid login
+**Preconditions:** User account exists
+**Steps:**
+1. Open the login page
+2. Sign in
+**Expected Result:** The dashboard is shown
+
+```javascript
+cy.visit('/login')
+```
+
+### Test Case 2: Wrong password & "quotes"
+**Steps:**
+1. Enter a wrong password
+**Expected Result:** An error <b>is</b> shown
+
+```javascript
+cy.get('#error').should('be.visible')
+```
+"""
+
+
+def _project(title="Login", timestamp="2024-01-01_10-00-00", **fields):
+    return {"title": title, "timestamp": timestamp, "output": OUTPUT, "test_type": "Functional", **fields}
+
+
+def _text(fmt, projects, **options):
+    return exports.export_bytes(fmt, projects, **options).decode("utf-8")
+
+
+def test_csv_rows_per_case():
+    rows = list(csv.reader(io.StringIO(_text("csv", [_project(), _project("Signup")], with_project=True))))
+    assert rows[0] == ["Project", "Timestamp", "ID", "Title", "Preconditions", "Steps", "Expected Result", "Framework"]
+    assert len(rows) == 5
+    assert rows[1] == ["Login", "2024-01-01_10-00-00", "1", "Valid login", "User account exists",
+                       "1. Open the login page\n2. Sign in", "The dashboard is shown", "Cypress"]
+    assert rows[4][:4] == ["Signup", "2024-01-01_10-00-00", "2", 'Wrong password & "quotes"']
+
+
+def test_junit_is_valid_xml_with_one_suite_per_project():
+    root = ET.fromstring(_text("junit", [_project(), _project("Signup")]))
+    suites = root.findall("testsuite")
+    assert [(suite.get("name"), suite.get("tests")) for suite in suites] == [("Login", "2"), ("Signup", "2")]
+    cases = suites[0].findall("testcase")
+    assert cases[0].get("classname") == "Login_2024-01-01_10-00-00"
+    assert cases[1].get("name") == '2: Wrong password & "quotes"'
+    assert "Expected:\nAn error <b>is</b> shown" in cases[1].find("system-out").text
+
+
+def test_xlsx_has_a_row_per_case():
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.load_workbook(io.BytesIO(exports.export_bytes("xlsx", [_project()])))
+    rows = list(workbook["Test cases"].iter_rows(values_only=True))
+    assert rows[0][:4] == ("Project", "Timestamp", "ID", "Title")
+    assert [row[3] for row in rows[1:]] == ["Valid login", 'Wrong password & "quotes"']
+
+
+def test_framework_file_names_are_deduplicated():
+    files = list(exports.framework_files(_project("Log in/out")))
+    assert [name for name, _ in files] == ["Log_in_out.cy.js", "Log_in_out_2.cy.js"]
+    assert files[1][1] == "cy.get('#error').should('be.visible')\n"
+
+
+def test_bdd_projects_get_a_derived_feature_file():
+    manual = re.sub(r"```.*?```\n", "", OUTPUT, flags=re.S)
+    project = _project(output=manual, test_type="BDD (Gherkin)")
+    (name, feature), = exports.framework_files(project)
+    assert name == "Login.feature"
+    assert feature.splitlines()[:6] == ["Feature: Login", "", "  Scenario: Valid login",
+                                        "    Given User account exists", "    When Open the login page", "    And Sign in"]
+
+
+def test_bundle_has_a_folder_per_project():
+    projects = [_project(), _project("Signup", "2024-01-02_09-00-00")]
+    with zipfile.ZipFile(io.BytesIO(exports.export_bytes("bundle", projects))) as bundle:
+        names = bundle.namelist()
+        assert names[:5] == ["Login_2024-01-01_10-00-00/output.md", "Login_2024-01-01_10-00-00/test_cases.csv",
+                             "Login_2024-01-01_10-00-00/junit.xml", "Login_2024-01-01_10-00-00/Login.cy.js",
+                             "Login_2024-01-01_10-00-00/Login_2.cy.js"]
+        assert len(names) == 10
+        assert bundle.read("Signup_2024-01-02_09-00-00/output.md").decode("utf-8") == OUTPUT
+        assert len(list(csv.reader(io.StringIO(bundle.read("Signup_2024-01-02_09-00-00/test_cases.csv").decode())))) == 3
+        ET.fromstring(bundle.read("Signup_2024-01-02_09-00-00/junit.xml"))
+
+
+def test_framework_zip_holds_only_code():
+    with zipfile.ZipFile(io.BytesIO(exports.export_bytes("frameworks", [_project()]))) as bundle:
+        assert bundle.namelist() == ["Login_2024-01-01_10-00-00/Login.cy.js", "Login_2024-01-01_10-00-00/Login_2.cy.js"]
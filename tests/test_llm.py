@@ -0,0 +1,82 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import llm
+from llm import LLMRouter
+
+# A stand-in upstream whose calls sleep for delay(n) seconds (n counts calls from 0)
+# and that records how many calls ran at once.
+
+
+class SlowBackend:
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        with self._lock:
+            n = self.calls
+            self.calls += 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(self.delay(n))
+        finally:
+            with self._lock:
+                self.running -= 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=messages[0]["content"]))])
+
+
+def _ask(router, prompt):
+    response = router.chat.completions.create(model="m", messages=[{"role": "user", "content": prompt}])
+    return response.choices[0].message.content
+
+
+def _ask_all(router, count):
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(lambda n: _ask(router, f"story {n}"), range(count)))
+
+
+def test_saturated_pool_neither_times_out_nor_hedges():
+    # 24 calls of 0.2s on 8 workers queue for up to 0.4s: longer than the timeout,
+    # but no call runs for longer than it. Hedges wait for idle workers, which only
+    # appear as the last round drains
+    backend = SlowBackend(lambda n: 0.2)
+    router = LLMRouter(backend, routes=[], timeout=0.35, hedge_after=0.05, workers=8, hedge_ratio=1)
+    assert _ask_all(router, 24) == [f"story {n}" for n in range(24)]
+    assert backend.peak == 8
+    assert backend.calls <= 24 + 8
+
+
+def test_hedges_are_capped_to_a_share_of_inflight_requests():
+    backend = SlowBackend(lambda n: 0.3)
+    router = LLMRouter(backend, routes=[], hedge_after=0.02, workers=100, hedge_ratio=0.1)
+    assert _ask_all(router, 40) == [f"story {n}" for n in range(40)]
+    assert backend.calls <= 40 + 4
+
+
+def test_hedge_delay_follows_observed_latency():
+    # After LATENCY_MIN_SAMPLES fast calls a straggler is hedged near their p95,
+    # long before the 60s fallback
+    backend = SlowBackend(lambda n: 0.01 if n < llm.LATENCY_MIN_SAMPLES else (5 if n == llm.LATENCY_MIN_SAMPLES else 0.01))
+    router = LLMRouter(backend, routes=[], hedge_after=60, workers=4)
+    assert router.hedge_delay("m") == 60
+    for n in range(llm.LATENCY_MIN_SAMPLES):
+        _ask(router, f"warm {n}")
+    assert router.hedge_delay("m") < 0.1
+
+    start = time.monotonic()
+    assert _ask(router, "straggler") == "straggler"
+    assert time.monotonic() - start < 1
+    assert backend.calls == llm.LATENCY_MIN_SAMPLES + 2
+
+
+def test_hedge_delay_is_none_when_disabled():
+    router = LLMRouter(SlowBackend(lambda n: 0), routes=[], hedge_after=0)
+    assert router.hedge_delay("m") is None
@@ -0,0 +1,120 @@
+import base64
+import builtins
+import email
+import threading
+
+import pytest
+
+from mailer import MailQueue
+
+# A stand-in for the Gmail API client: service.users().messages().send(...).execute()
+# records the raw MIME and sending thread of every attempt and can fail the first few with a 503.
+
+
+class TransientError(Exception):
+    status_code = 503
+
+
+class FakeGmail:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.attempts = []
+        self.sent = []
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def send(self, userId, body):
+        return _Request(self, body["raw"])
+
+
+class _Request:
+    def __init__(self, service, raw):
+        self.service = service
+        self.raw = raw
+
+    def execute(self):
+        service = self.service
+        with service._lock:
+            service.attempts.append(self.raw)
+            service.threads.add(threading.get_ident())
+            if service.failures:
+                service.failures -= 1
+                raise TransientError("backend unavailable")
+            service.sent.append(email.message_from_bytes(base64.urlsafe_b64decode(self.raw)))
+            return {"id": f"msg-{len(service.sent)}"}
+
+
+@pytest.fixture
+def no_file_reads(monkeypatch):
+    def refuse(*args, **kwargs):
+        raise AssertionError(f"unexpected file access: {args[0] if args else kwargs}")
+
+    monkeypatch.setattr(builtins, "open", refuse)
+
+
+def test_attachment_bytes_are_sent_from_memory(no_file_reads):
+    gmail = FakeGmail()
+    mail = MailQueue(lambda: gmail, workers=1)
+    payload = bytes(range(256)) * 4
+    job_id = mail.submit("qa@example.com", "Test cases", "See attached.", [("cases.txt", payload)])
+    assert mail.wait(timeout=5)
+
+    job = mail.status(job_id)
+    assert job["status"] == "sent"
+    assert job["message_id"] == "msg-1"
+    message = gmail.sent[0]
+    assert message["To"] == "qa@example.com"
+    assert message["Subject"] == "Test cases"
+    attachments = [part for part in message.walk() if part.get_filename()]
+    assert [part.get_filename() for part in attachments] == ["cases.txt"]
+    assert attachments[0].get_payload(decode=True) == payload
+
+
+def test_transient_error_is_retried(no_file_reads):
+    gmail = FakeGmail(failures=2)
+    mail = MailQueue(lambda: gmail, workers=1, max_retries=3, base_delay=0.001)
+    job_id = mail.submit("qa@example.com", "Retry", "body", [("a.txt", b"abc")])
+    assert mail.wait(timeout=5)
+
+    assert mail.status(job_id)["status"] == "sent"
+    assert len(gmail.attempts) == 3
+    assert len(gmail.sent) == 1
+    assert gmail.sent[0].get_payload()[1].get_payload(decode=True) == b"abc"
+
+
+def test_gives_up_after_max_retries(no_file_reads):
+    gmail = FakeGmail(failures=10)
+    mail = MailQueue(lambda: gmail, workers=1, max_retries=2, base_delay=0.001)
+    job_id = mail.submit("qa@example.com", "Down", "body")
+    assert mail.wait(timeout=5)
+
+    job = mail.status(job_id)
+    assert job["status"] == "failed"
+    assert "backend unavailable" in job["error"]
+    assert len(gmail.attempts) == 3
+
+
+def test_each_worker_sends_through_its_own_service():
+    # Gmail client objects are not thread-safe: no service may be used by two threads
+    services = []
+    services_lock = threading.Lock()
+
+    def build():
+        gmail = FakeGmail()
+        with services_lock:
+            services.append(gmail)
+        return gmail
+
+    mail = MailQueue(build, workers=2)
+    mail.submit_many({"to_email": f"u{n}@example.com", "subject": "s", "body_text": "b"} for n in range(20))
+    assert mail.wait(timeout=5)
+
+    assert 1 <= len(services) <= 2
+    assert all(len(gmail.threads) == 1 for gmail in services)
+    assert sum(len(gmail.sent) for gmail in services) == 20
@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+
+import numpy as np
+
+import memory
+
+# Several processes append to one log while compaction keeps firing; every entry
+# must survive and the .vec rows must stay aligned with the log lines.
+
+
+def _append_entries(path, vector_path, writer, count, compact_every):
+    memory.COMPACT_EVERY = compact_every
+    vector_data = memory.load_vector_data(path, vector_path, legacy_path=None)
+    for n in range(count):
+        entry = {"title": f"writer {writer} story {n}", "timestamp": f"{writer}-{n}",
+                 "output": f"Test case {n} for writer {writer}: login, logout, reset password {n * writer}"}
+        memory.append_vector_entry(vector_data, entry)
+
+
+def _assert_consistent(path, vector_path, expected_titles):
+    vector_data = memory.load_vector_data(path, vector_path, legacy_path=None)
+    assert sorted(entry["title"] for entry in vector_data) == sorted(expected_titles)
+    vectors = np.asarray(memory.load_vectors(vector_data))
+    assert os.path.getsize(vector_path) == len(vector_data) * memory.EMBED_DIM * 4
+    expected = memory.embed_texts([memory.entry_text(entry) for entry in vector_data])
+    assert np.allclose(vectors, expected)
+
+
+def test_concurrent_appends_with_compaction(tmp_path):
+    path, vector_path = str(tmp_path / "vector_data.jsonl"), str(tmp_path / "vector_data.vec")
+    writers, count = 6, 60
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_append_entries, args=(path, vector_path, writer, count, 3))
+        for writer in range(writers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(120)
+        assert process.exitcode == 0
+
+    titles = [f"writer {w} story {n}" for w in range(writers) for n in range(count)]
+    _assert_consistent(path, vector_path, titles)
+
+
+def test_stale_reader_sees_replaced_log(tmp_path):
+    # Two compactions between a reader's catch-ups: on most filesystems the second
+    # rewrite lands on the inode the reader last saw, so only the generation tells
+    path, vector_path = str(tmp_path / "vector_data.jsonl"), str(tmp_path / "vector_data.vec")
+    writer = memory.load_vector_data(path, vector_path, legacy_path=None)
+    for n in range(4):
+        memory.append_vector_entry(writer, {"title": f"story {n}", "timestamp": "t", "output": "x" * 40})
+    memory.compact_vector_log(path, vector_path)
+    reader = memory.load_vector_data(path, vector_path, legacy_path=None)
+    memory.append_vector_entry(writer, {"title": "story 0", "timestamp": "t", "output": "newer"})
+    memory.compact_vector_log(path, vector_path)
+    memory.append_vector_entry(writer, {"title": "story 4", "timestamp": "t", "output": "y"})
+    memory.compact_vector_log(path, vector_path)
+
+    memory.append_vector_entry(reader, {"title": "story 5", "timestamp": "t", "output": "z"})
+    assert [entry["title"] for entry in reader] == ["story 1", "story 2", "story 3", "story 0", "story 4", "story 5"]
+    assert memory.entry_output(reader[3]) == "newer"
+    _assert_consistent(path, vector_path, [f"story {n}" for n in range(6)])
+
+
+def test_shards_keep_one_log_per_author_and_read_only_new_lines(tmp_path, monkeypatch):
+    from project_store import ProjectShards
+
+    shards = ProjectShards(str(tmp_path / "authors"))
+    log = shards.load_memory("qa@example.com")
+    memory.append_vector_entry(log, {"title": "first", "timestamp": "t", "output": "x"})
+    # Another process appends to the same author's log
+    other = memory.load_vector_data(*shards.memory_paths("qa@example.com"), legacy_path=None)
+    memory.append_vector_entry(other, {"title": "second", "timestamp": "t", "output": "y"})
+
+    reads = []
+    read_from = memory._read_from
+    monkeypatch.setattr(memory, "_read_from", lambda path, offset: reads.append(offset) or read_from(path, offset))
+    assert shards.load_memory("qa@example.com") is log
+    assert [entry["title"] for entry in log] == ["first", "second"]
+    assert reads and all(offset > 0 for offset in reads)
@@ -0,0 +1,16 @@
+import urllib.request
+
+import metrics
+
+
+def test_server_listens_on_loopback_by_default():
+    server = metrics.start_server(0)
+    try:
+        host, port = server.server_address
+        assert host == "127.0.0.1"
+        metrics.inc("llm_routed_total", model="m")
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert 'llm_routed_total{model="m"}' in response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
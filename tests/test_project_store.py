@@ -0,0 +1,149 @@
+import json
+import os
+
+import memory
+import project_store
+from project_store import ProjectShards, ProjectStore
+
+
+def test_migrate_legacy_from_an_empty_directory(tmp_path):
+    # Fresh checkout: no saved_projects/, no shared memory
+    directory = tmp_path / "saved_projects"
+    shards = ProjectShards(str(directory / "authors"))
+    assert shards.migrate_legacy(str(directory), legacy_memory=str(tmp_path / "vector_data.jsonl"),
+                                 legacy_json=str(tmp_path / "vector_data.json")) == 0
+    assert os.path.isdir(directory)
+    assert shards.existing_shards() == []
+
+
+def _project(title, timestamp, author="qa@example.com", **fields):
+    return {"title": title, "timestamp": timestamp, "author_email": author, "author": "QA",
+            "user_story": f"As a user I want {title}", "test_type": "Functional", "format_type": "Manual Only",
+            "output": f"### Test Case 1: {title}\n**Steps:**\n1. Open the page\n", **fields}
+
+
+def test_memory_migration_runs_once_until_new_projects_arrive(tmp_path, monkeypatch):
+    directory = tmp_path / "saved_projects"
+    legacy_json = tmp_path / "vector_data.json"
+    legacy_json.write_text(json.dumps([{"title": "Orphan", "timestamp": "2024-01-01_00-00-00", "output": "x"}]))
+    shards = ProjectShards(str(directory / "authors"))
+    passes = []
+    migrate_memory = shards._migrate_memory
+    monkeypatch.setattr(shards, "_migrate_memory", lambda *args: passes.append(1) or migrate_memory(*args))
+
+    def migrate():
+        return shards.migrate_legacy(str(directory), legacy_memory=str(tmp_path / "vector_data.jsonl"),
+                                     legacy_json=str(legacy_json))
+
+    migrate()
+    migrate()
+    assert len(passes) == 1
+    assert memory.load_vector_data(str(tmp_path / "vector_data.jsonl"), legacy_path=None)[0]["title"] == "Orphan"
+
+    # The owning project turns up later: the next run moves the entry into its shard
+    (directory / "Orphan_2024-01-01_00-00-00.json").write_text(json.dumps(_project("Orphan", "2024-01-01_00-00-00")))
+    assert migrate() == 1
+    assert len(passes) == 2
+    assert [entry["title"] for entry in shards.load_memory("qa@example.com")] == ["Orphan"]
+
+
+def test_least_recently_used_store_is_closed_and_reopens_on_use(tmp_path):
+    shards = ProjectShards(str(tmp_path / "authors"), max_open=2)
+    first = shards.for_author("a@example.com")
+    first.save(_project("Login", "1", author="a@example.com"))
+    shards.for_author("b@example.com")
+    shards.for_author("a@example.com")
+    shards.for_author("c@example.com")
+    assert len(shards._stores) == 2
+    evicted = shards.for_author("d@example.com")  # a was used after b, so b goes first, then a
+    assert first._db is None and evicted is not first
+    # A session still holding the evicted store keeps working
+    assert [meta["title"] for meta in first.list_projects("a@example.com")] == ["Login"]
+
+
+def _search_store(tmp_path):
+    store = ProjectStore(str(tmp_path / "projects.db"))
+    store.save(_project("Password reset", "2024-01-01", user_story="Reset a forgotten password from the email link"))
+    store.save(_project("Login", "2024-01-02", user_story="Log in with email and password"))
+    store.save(_project("Checkout", "2024-01-03", user_story="Pay for the cart", test_type="Performance"))
+    store.save(_project("Login", "2024-01-04", user_story="Log in with a magic link"))
+    store.save(_project("Password policy", "2024-01-05", author="other@example.com",
+                        user_story="Reject a weak password"))
+    return store
+
+
+def test_search_ranks_with_bm25_and_title_weight(tmp_path):
+    store = _search_store(tmp_path)
+    total, hits = store.search("qa@example.com", "password")
+    assert total == 2  # the other author's project is never searched
+    assert [hit["key"] for hit in hits] == ["Password reset_2024-01-01", "Login_2024-01-02"]
+    assert hits[0]["score"] > hits[1]["score"] > 0
+    # The rarer term decides between the two Login versions
+    assert store.search("qa@example.com", "login magic")[1][0]["key"] == "Login_2024-01-04"
+
+
+def test_last_word_matches_as_prefix(tmp_path):
+    store = _search_store(tmp_path)
+    assert store.search("qa@example.com", "passw")[0] == 2
+    assert store.search("qa@example.com", "forgotten passw")[1][0]["title"] == "Password reset"
+    # Only the last word is a prefix
+    assert store.search("qa@example.com", "passw link")[0] == 2
+    assert store.search("qa@example.com", "passw zzz")[0] == 0
+
+
+def test_facets_count_titles_and_test_types(tmp_path):
+    store = _search_store(tmp_path)
+    assert store.facets("qa@example.com") == {
+        "title": [("Checkout", 1), ("Login", 2), ("Password reset", 1)],
+        "test_type": [("Functional", 3), ("Performance", 1)],
+    }
+
+
+def test_facets_filter_search_and_listing(tmp_path):
+    store = _search_store(tmp_path)
+    assert [hit["key"] for hit in store.search("qa@example.com", "password", title="Login")[1]] == ["Login_2024-01-02"]
+    total, hits = store.search("qa@example.com", test_type="Performance")
+    assert total == 1 and hits[0]["title"] == "Checkout" and hits[0]["score"] is None
+    total, page = store.search("qa@example.com", limit=2, offset=2)
+    assert total == 4
+    assert [hit["key"] for hit in page] == ["Login_2024-01-02", "Password reset_2024-01-01"]
+
+
+def _cases(count, changed=()):
+    return "".join(f"### Test Case {n}: Scenario {n}\n**Steps:**\n1. Open page {n}\n2. Submit form {n}\n"
+                   f"**Expected Result:** {'Changed result' if n in changed else 'Result'} {n}\n"
+                   for n in range(1, count + 1))
+
+
+def test_line_delta_round_trip():
+    base = "a\nb\nc\nd"
+    for text in ("a\nb\nc\nd", "a\nB\nc\nd\ne", "x\n", "", "a\nb\nc\nd\n"):
+        assert project_store.apply_delta(base, project_store.line_delta(base, text)) == text
+
+
+def test_versions_round_trip_through_deltas(tmp_path):
+    store = ProjectStore(str(tmp_path / "projects.db"))
+    outputs = [_cases(30), _cases(30, changed={4}), _cases(30, changed={4, 17}), _cases(31, changed={9})]
+    for n, output in enumerate(outputs):
+        store.save(_project("Signup", f"2024-01-0{n + 1}", output=output))
+
+    stats = store.storage_stats()
+    assert (stats["versions"], stats["blobs"], stats["delta_blobs"]) == (4, 4, 3)
+    assert stats["stored_bytes"] < stats["output_bytes"] / 2
+    for n, output in enumerate(outputs):
+        assert store.get_output(f"Signup_2024-01-0{n + 1}") == output
+    info = store.version_info("Signup_2024-01-02")
+    assert (info["prev_key"], info["lines_added"], info["lines_removed"]) == ("Signup_2024-01-01", 1, 1)
+
+
+def test_identical_regeneration_stores_nothing_new(tmp_path):
+    store = ProjectStore(str(tmp_path / "projects.db"))
+    store.save(_project("Signup", "2024-01-01", output=_cases(10)))
+    before = store.storage_stats()
+    store.save(_project("Signup", "2024-01-02", output=_cases(10)))
+    after = store.storage_stats()
+    assert after["versions"] == 2
+    assert (after["blobs"], after["stored_bytes"]) == (before["blobs"], before["stored_bytes"])
+    info = store.version_info("Signup_2024-01-02")
+    assert (info["lines_added"], info["lines_removed"]) == (0, 0)
+    assert store.get_output("Signup_2024-01-02") == _cases(10)
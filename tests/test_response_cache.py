@@ -0,0 +1,68 @@
+from response_cache import ResponseCache, cache_key
+
+# Cache behaviour on a clock the test advances by hand.
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _cache(tmp_path, clock, **limits):
+    return ResponseCache(str(tmp_path / "cache.db"), clock=clock, **{"ttl": 0, "max_entries": 0, "max_bytes": 0, **limits})
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    clock = Clock()
+    cache = _cache(tmp_path, clock, ttl=60)
+    cache.put("a", "first")
+    clock.now += 59
+    assert cache.get("a") == "first"
+    clock.now += 2  # reads do not extend the lifetime
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_put_drops_expired_entries(tmp_path):
+    clock = Clock()
+    cache = _cache(tmp_path, clock, ttl=60)
+    cache.put("old", "x")
+    clock.now += 61
+    cache.put("new", "y")
+    assert cache.stats()["entries"] == 1
+    assert cache.get("new") == "y"
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    clock = Clock()
+    cache = _cache(tmp_path, clock, max_entries=2)
+    cache.put("a", "1")
+    clock.now += 1
+    cache.put("b", "2")
+    clock.now += 1
+    assert cache.get("a") == "1"  # a is now more recent than b
+    clock.now += 1
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+
+def test_byte_limit_evicts_oldest_first(tmp_path):
+    clock = Clock()
+    cache = _cache(tmp_path, clock, max_bytes=25)
+    for n, key in enumerate("abc"):
+        clock.now += 1
+        cache.put(key, key * 10)
+    assert cache.get("a") is None
+    assert cache.stats() == {"entries": 2, "bytes": 20}
+
+
+def test_key_ignores_whitespace_but_not_settings():
+    story = {"user_story": "As a user\r\n  I want   to log in ", "test_type": "Functional"}
+    same = {"user_story": "As a user\nI want to log in", "test_type": "Functional"}
+    assert cache_key(story, "gpt-4o", 0.2, "v1") == cache_key(same, "gpt-4o", 0.2, "v1")
+    assert cache_key(story, "gpt-4o", 0.2, "v1") != cache_key(story, "gpt-4o", 0.7, "v1")
+    assert cache_key(story, "gpt-4o", 0.2, "v1") != cache_key(story, "gpt-4o", 0.2, "v2")
@@ -0,0 +1,111 @@
+import testcases
+from core import FencedBlockParser
+from testcases import ParsedOutput, csv_rows, parse_output
+
+MARKDOWN = """Here are the test cases for the login story.
+
+### Test Case 1: Valid login
+**Preconditions:** User account exists
+**Steps:**
+1. Open the login page
+2. Enter a valid email and password
+3. Click Sign in
+**Expected Result:** The dashboard is shown
+
+```python
+def test_valid_login(page):
+    page.goto("/login")
+```
+
+### Test Case 2: Wrong password
+**Steps:**
+- Open the login page
+- Enter a wrong password
+**Expected Results:**
+- An error message is displayed
+- The user stays on the login page
+
+```gherkin
+Feature: Login
+  Scenario: Wrong password
+    Given I am on the login page
+    When I enter a wrong password
+    Then I see an error
+```
+"""
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_typical_markdown():
+    parsed = parse_output(MARKDOWN)
+    first, second = parsed.test_cases
+    assert (first.id, first.title) == ("1", "Valid login")
+    assert first.preconditions == ["User account exists"]
+    assert first.steps == ["Open the login page", "Enter a valid email and password", "Click Sign in"]
+    assert first.expected_results == ["The dashboard is shown"]
+    assert (second.id, second.title) == ("2", "Wrong password")
+    assert second.steps == ["Open the login page", "Enter a wrong password"]
+    assert second.expected_results == ["An error message is displayed", "The user stays on the login page"]
+
+
+def test_code_blocks_attach_to_the_case_above_them():
+    parsed = parse_output(MARKDOWN)
+    assert [tc.code_blocks for tc in parsed.test_cases] == [[0], [1]]
+    python, gherkin = parsed.code_blocks
+    assert python.language == "python" and python.framework == "Playwright"
+    assert python.code.startswith("def test_valid_login")
+    assert gherkin.framework == "Cucumber"
+    assert list(csv_rows(parsed))[1][-1] == "Cucumber"
+
+
+def test_chunk_boundaries_do_not_change_the_result():
+    whole = parse_output(MARKDOWN).to_dict()
+    for size in (1, 2, 3, 7, 64):
+        parser = testcases.TestCaseParser()  # imported via the module so pytest does not collect it
+        for chunk in _chunks(MARKDOWN, size):
+            parser.feed(chunk)
+        assert parser.close().to_dict() == whole
+
+
+def test_case_id_line_after_header_is_one_case():
+    parsed = parse_output("### Test Case 1\n**Test Case ID:** TC_001 Checkout\n**Steps:**\n1. Pay\n")
+    assert [(tc.id, tc.title, tc.steps) for tc in parsed.test_cases] == [("TC_001", "Checkout", ["Pay"])]
+
+
+def test_automation_only_output_derives_cases_from_code():
+    output = ("```robotframework\n*** Test Cases ***\nValid Login\n    [Tags]    smoke\n    Open Browser    /login\n"
+              "    Click Button    Sign in\n```\n")
+    parsed = parse_output(output)
+    assert [(tc.title, tc.steps, tc.code_blocks) for tc in parsed.test_cases] == [
+        ("Valid Login", ["Open Browser /login", "Click Button Sign in"], [0])]
+    assert parsed.code_blocks[0].framework == "Robot Framework"
+
+
+def test_parsed_output_round_trips_through_dict():
+    parsed = parse_output(MARKDOWN)
+    assert ParsedOutput.from_dict(parsed.to_dict()).to_dict() == parsed.to_dict()
+
+
+def test_fenced_blocks_split_across_chunks():
+    text = "Intro line\n```python\nprint(1)\nprint(2)\n```\nOutro\n"
+    parser = FencedBlockParser()
+    for chunk in _chunks(text, 3):
+        parser.feed(chunk)
+    parser.close()
+    assert [(block["kind"], block["lang"]) for block in parser.blocks] == [("text", None), ("code", "python"), ("text", None)]
+    assert parser.block_text(1) == "print(1)\nprint(2)"
+    assert parser.block_text(2) == "Outro"
+
+
+def test_open_block_shows_its_partial_line_but_not_a_partial_fence():
+    parser = FencedBlockParser()
+    touched = parser.feed("```js\ncy.visit('/')\ncy.get")
+    assert touched == {0}
+    assert parser.block_text(0) == "cy.visit('/')\ncy.get"
+    parser.feed("('#a')\n``")
+    assert parser.block_text(0) == "cy.visit('/')\ncy.get('#a')"
+    parser.feed("`\n")
+    assert not parser.in_code
@@ -1,42 +1,77 @@
 import streamlit as st
-import re
-import os
-import base64
-from email.message import EmailMessage
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+import time
+import metrics
+from core import FencedBlockParser
+from mailer import MailQueue, build_gmail_service
 
-def render_output(output):
-    pattern = re.compile(r"```(\w+)?\n(.*?)```", re.DOTALL)
-    for match in pattern.finditer(output):
-        lang = match.group(1) or "text"
-        code = match.group(2).strip()
-        st.code(code, language=lang)
+@metrics.timed("render")
+def render_parsed(parsed):
+    # parsed is ParsedOutput.to_dict(); code blocks are shown under the case that owns them
+    blocks = parsed["code_blocks"]
+    shown = set()
+    for tc in parsed["test_cases"]:
+        lines = [f"**{tc['id']}. {tc['title']}**"]
+        if tc["preconditions"]:
+            lines.append("*Preconditions:* " + "; ".join(tc["preconditions"]))
+        lines += [f"{n}. {step}" for n, step in enumerate(tc["steps"], start=1)]
+        if tc["expected_results"]:
+            lines.append("*Expected:* " + "; ".join(tc["expected_results"]))
+        st.markdown("\n".join(lines))
+        for index in tc["code_blocks"]:
+            if index not in shown:
+                shown.add(index)
+                st.code(blocks[index]["code"], language=blocks[index]["language"])
+    for index, block in enumerate(blocks):
+        if index not in shown:
+            st.code(block["code"], language=block["language"])
 
-def send_email_with_attachment(to_email, subject, body_text, file_path):
-    SCOPES = ['https://www.googleapis.com/auth/gmail.send']
-    creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    else:
-        flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-        creds = flow.run_local_server(port=0)
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-    
-    service = build('gmail', 'v1', credentials=creds)
-    message = EmailMessage()
-    message.set_content(body_text)
-    message['To'] = to_email
-    message['From'] = "me"
-    message['Subject'] = subject
+# --- Streaming output ---
+@metrics.timed("render_stream")
+def render_stream(chunks, min_interval=0.05):
+    parser = FencedBlockParser()
+    placeholders = []
+    pieces = []
+    dirty = set()
+    last_flush = 0.0
 
-    with open(file_path, 'rb') as f:
-        file_data = f.read()
-        file_name = os.path.basename(file_path)
+    def flush():
+        for index in sorted(dirty):
+            while len(placeholders) <= index:
+                placeholders.append(st.empty())
+            block = parser.blocks[index]
+            text = parser.block_text(index)
+            if block["kind"] == "code":
+                placeholders[index].code(text, language=block["lang"])
+            elif text.strip():
+                placeholders[index].markdown(text)
+        dirty.clear()
 
-    message.add_attachment(file_data, maintype='application', subtype='octet-stream', filename=file_name)
-    encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    create_message = {'raw': encoded_message}
-    service.users().messages().send(userId='me', body=create_message).execute()
\ No newline at end of file
+    for chunk in chunks:
+        pieces.append(chunk)
+        dirty.update(parser.feed(chunk))
+        if parser.blocks and parser.pending:
+            dirty.add(len(parser.blocks) - 1)
+        now = time.monotonic()
+        if now - last_flush >= min_interval:
+            flush()
+            last_flush = now
+    dirty.update(parser.close())
+    flush()
+    return "".join(pieces)
+
+# --- Gmail (one authorized service and send queue per process) ---
+@st.cache_resource
+def get_mail_queue():
+    return MailQueue(build_gmail_service)
+
+MAIL_STATUS_ICONS = {"queued": "⏳", "sending": "📨", "sent": "✅", "failed": "❌"}
+MAIL_PENDING = ("queued", "sending")
+
+def render_mail_status(job_ids):
+    jobs = get_mail_queue().statuses(job_ids)
+    for job in jobs:
+        line = f"{MAIL_STATUS_ICONS.get(job['status'], '')} **{job['subject']}** → {job['to']}: {job['status']}"
+        if job["error"]:
+            line += f" ({job['error']})"
+        st.markdown(line)
+    return jobs